@@ -1,15 +1,32 @@
+import hashlib
+import json
+import os
 import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
 from functools import partial
-from typing import Iterable, List, Optional, Union
-
-from PySpice.Spice.Netlist import Circuit, SubCircuit
+from itertools import chain, islice
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from PySpice.Spice.Netlist import Circuit, Netlist, SubCircuit
 from PySpice.Unit import *
 from webgme_bindings import PluginBase
 
-# The labels for the components are grabbed from the following source
-# https://pyspice.fabrice-salvaire.fr/releases/v1.4/api/PySpice/Spice/BasicElement.html#module-PySpice.Spice.BasicElement
-component_counts = {chr(j): 0 for j in range(65, 65 + 26)}
-
 SKIP_NODES = [
     "VariableResistor",
     "VariableConductor",
@@ -25,251 +42,1624 @@ SKIP_NODES = [
 ]
 
 
-def get_next_label_for(component: str, component_name: str) -> str:
-    assert component in component_counts
-    component_counts[component] = component_counts[component] + 1
-    return f"{component_name}_{component_counts[component]}"
-
-
 class PySpiceConversionError(Exception):
     """Error to be raised when there's an error in PySpice conversion"""
 
 
+class ElementLabeler:
+    """Labels the elements of a PySpice Circuit (or SubCircuit), numbered per prefix
+
+    A labeler is owned by a single conversion (and a single circuit), so the labels
+    only depend on the elements added to that circuit, in that order (and it is never
+    shared between threads).
+    """
+
+    # The labels for the components are grabbed from the following source
+    # https://pyspice.fabrice-salvaire.fr/releases/v1.4/api/PySpice/Spice/BasicElement.html#module-PySpice.Spice.BasicElement
+    PREFIXES = [chr(j) for j in range(65, 65 + 26)]
+
+    def __init__(self) -> None:
+        self._counts = {prefix: 0 for prefix in self.PREFIXES}
+
+    def next_label(self, component: str, component_name: str) -> str:
+        """Returns the next label for an element of type `component`"""
+        assert component in self._counts
+        self._counts[component] = self._counts[component] + 1
+        return f"{component_name}_{self._counts[component]}"
+
+
+class BatchResult:
+    """Placeholder for the value of a queued core call, set on `CoreBatch.flush`"""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = None
+
+
+class CoreBatch:
+    """Queues independent core reads and sends them as one multi-call request
+
+    The calls are executed by `PythonPluginBase.executeCoreBatch` against the root
+    of the plugin's commit, so a batch is only meant to read the committed state of
+    the project. Queued calls are sent in chunks of `max_calls` per round-trip.
+    """
+
+    NODE_RESULTS = {"getParent", "getBase", "getMetaType", "loadPointer", "loadByPath"}
+    NODE_LIST_RESULTS = {"loadChildren", "loadOwnChildren", "loadSubTree"}
+
+    def __init__(self, plugin: PluginBase, max_calls: int = 1000) -> None:
+        self.plugin = plugin
+        self.max_calls = max_calls
+        self.round_trips = 0
+        self._queued = []
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def queue(self, method: str, node: dict, *args) -> BatchResult:
+        """Queue `core.<method>(node, *args)` and return the placeholder for its value"""
+        result = BatchResult()
+        self._queued.append((_to_camel_case(method), [node, *args], result))
+        return result
+
+    def flush(self) -> None:
+        """Send the queued calls to the core and set the values of their placeholders"""
+        queued, self._queued = self._queued, []
+        for start in range(0, len(queued), self.max_calls):
+            end = start + self.max_calls
+            chunk = queued[start:end]
+            values = self.plugin._send(
+                {
+                    "name": "executeCoreBatch",
+                    "args": [[[method, *args] for (method, args, _) in chunk]],
+                }
+            )
+            self.round_trips += 1
+
+            for (method, args, result), value in zip(chunk, values):
+                root_id = args[0]["rootId"]
+                if method in self.NODE_RESULTS:
+                    value = self._to_node(value, root_id)
+                elif method in self.NODE_LIST_RESULTS:
+                    value = [self._to_node(path, root_id) for path in value]
+                result.value = value
+
+    @staticmethod
+    def _to_node(path: Optional[str], root_id: str) -> Optional[dict]:
+        return {"rootId": root_id, "nodePath": path} if path is not None else None
+
+
+class BlobFileWriter:
+    """A text file which is uploaded to the blob storage in chunks, as it is written
+
+    The chunks are appended to a temporary file by `PythonPluginBase` and streamed to
+    the blob storage on `close`, so neither side holds the whole file in memory. As
+    with `add_file`, the uploaded file is added to the plugin result, unless
+    `add_to_result` is False (e.g. for the files of an artifact, see `save_artifact`).
+    When used as a context manager, the upload is discarded if an exception is raised.
+    """
+
+    def __init__(
+        self,
+        plugin: PluginBase,
+        name: str,
+        chunk_size: int = 1024 * 1024,
+        add_to_result: bool = True,
+    ) -> None:
+        self.plugin = plugin
+        self.name = name
+        self.chunk_size = chunk_size
+        self.hash = None
+        self._chunk = []
+        self._chunk_length = 0
+        self._upload_id = self._call("startFileUpload", name, add_to_result)
+
+    def __enter__(self) -> "BlobFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._call("discardFileUpload", self._upload_id)
+
+    def write(self, text: str) -> int:
+        self._chunk.append(text)
+        self._chunk_length += len(text)
+        if self._chunk_length >= self.chunk_size:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._chunk:
+            self._call("appendFileUpload", self._upload_id, "".join(self._chunk))
+            self._chunk = []
+            self._chunk_length = 0
+
+    def close(self) -> str:
+        """Upload the file to the blob storage and return its (metadata) hash"""
+        if self.hash is None:
+            self.flush()
+            self.hash = self._call("finishFileUpload", self._upload_id)
+        return self.hash
+
+    def _call(self, method: str, *args):
+        return self.plugin._send({"name": method, "args": list(args)})
+
+
+def save_artifact(plugin: PluginBase, name: str, files: Dict[str, str]) -> str:
+    """Bundle files already in the blob storage as an artifact of the plugin result
+
+    `files` maps the file names in the artifact to the (metadata) hashes of the files,
+    e.g. as uploaded by `BlobFileWriter`. Unlike `add_artifact`, the contents of the
+    files are not sent again. Returns the (metadata) hash of the artifact.
+    """
+    return plugin._send({"name": "saveArtifact", "args": [name, files]})
+
+
+def write_netlist(circuit: Circuit, file: TextIO) -> None:
+    """Write the netlist of `circuit` to `file`, one line (or sub-circuit) at a time
+
+    The output is the same as `file.write(str(circuit))`, without building the whole
+    netlist as a single string.
+    """
+
+    def write_lines(items: Iterable) -> None:
+        for i, item in enumerate(items):
+            if i:
+                file.write(os.linesep)
+            file.write(str(item))
+
+    file.write(circuit._str_title())
+    file.write(circuit._str_includes())
+    file.write(circuit._str_globals())
+    file.write(circuit._str_parameters())
+    file.write(circuit._str_raw_spice())
+    write_lines(circuit.subcircuits)
+    write_lines(element for element in circuit.elements if element.enabled)
+    file.write(os.linesep)
+    if circuit._models:
+        write_lines(circuit.models)
+        file.write(os.linesep)
+
+
+def _to_camel_case(string: str) -> str:
+    """Convert a snake case `snake_case` string to camel case (snakeCase)"""
+    head, *tail = string.split("_")
+    return head + "".join(word.capitalize() for word in tail)
+
+
+class SnapshotNode:
+    """A compact, local copy of a GME node (as loaded by `CircuitSnapshot`)
+
+    Along with its own hash, a node holds the paths and hashes of its bases (nearest
+    first, up to the META), since the hash of a node doesn't change with the data it
+    inherits.
+    """
+
+    __slots__ = (
+        "path",
+        "meta",
+        "hash",
+        "bases",
+        "attributes",
+        "valid_attributes",
+        "pointers",
+        "parent",
+        "children",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        meta: Optional[str],
+        attributes: dict,
+        valid_attributes: List[str],
+        pointers: dict,
+        parent: Optional[str],
+        hash: Optional[str] = None,
+        bases: Tuple[Tuple[str, str], ...] = (),
+    ) -> None:
+        self.path = path
+        self.meta = meta
+        self.hash = hash
+        self.bases = bases
+        self.attributes = attributes
+        self.valid_attributes = valid_attributes
+        self.pointers = pointers
+        self.parent = parent
+        self.children = []
+
+    def __repr__(self) -> str:
+        return f"SnapshotNode({self.path}, {self.meta})"
+
+
+class CircuitSnapshot:
+    """A local, in-memory model of the subtree of a GME node
+
+    The subtree is loaded level by level, reading the children, META types, hashes,
+    attributes and pointers of the nodes of a level with `CoreBatch` (two round-trips
+    per level, pipelined with the next level). The nodes (`SnapshotNode`) are keyed
+    by path and refer to their parent, children and pointer targets by path as well,
+    so that the snapshot can be read without the core.
+    """
+
+    def __init__(self, root_id: str, root_path: str) -> None:
+        self.root_id = root_id
+        self.root_path = root_path
+        self.nodes = {}
+        self.bases = {}
+        self.meta_paths = set()
+        self.round_trips = 0
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.nodes
+
+    def __getitem__(self, path: str) -> SnapshotNode:
+        return self.nodes[path]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def root(self) -> SnapshotNode:
+        return self.nodes[self.root_path]
+
+    def get(self, path: Optional[str]) -> Optional[SnapshotNode]:
+        """Returns the node at `path`, if it's a part of the snapshot"""
+        return self.nodes.get(path)
+
+    def is_in_meta(self, path: str) -> bool:
+        """Returns if the node at `path` is a META node or inside one"""
+        while path:
+            if path in self.meta_paths:
+                return True
+            path = path.rsplit("/", 1)[0]
+        return False
+
+    def add(self, node: SnapshotNode) -> SnapshotNode:
+        """Add a node to the snapshot, as a child of its parent"""
+        self.nodes[node.path] = node
+        parent = self.nodes.get(node.parent)
+        if node.path != self.root_path and parent is not None:
+            parent.children.append(node.path)
+        return node
+
+    def to_gme_node(self, node: SnapshotNode) -> dict:
+        """Returns the GME node (dict), for the calls which need to go to the core"""
+        return {"rootId": self.root_id, "nodePath": node.path}
+
+    @classmethod
+    def load(
+        cls,
+        plugin: PluginBase,
+        node: dict,
+        meta_names: dict,
+        prune: Callable[[List[SnapshotNode]], Set[str]] = None,
+        max_calls: int = 1000,
+    ) -> "CircuitSnapshot":
+        """Load the subtree of `node`
+
+        Parameters
+        ----------
+        plugin: PluginBase
+            The plugin whose core is used to load the nodes
+        node: dict
+            The GME node, root of the subtree
+        meta_names: dict
+            A mapping from the paths of the META nodes to their names
+        prune: Callable[[List[SnapshotNode]], Set[str]], default=None
+            If provided, it is called with the (non-root) nodes of every level and the
+            children of the nodes whose paths it returns are not loaded
+        max_calls: int, default=1000
+            The maximum number of core calls per round-trip
+        """
+        snapshot = cls(node["rootId"], node["nodePath"])
+        snapshot.meta_paths = set(meta_names)
+        batch = CoreBatch(plugin, max_calls)
+        level, loaded = [node], []
+        while level or loaded:
+            reads = [
+                (
+                    gme_node,
+                    batch.queue("get_meta_type", gme_node),
+                    batch.queue("get_hash", gme_node),
+                    batch.queue("get_base", gme_node),
+                    batch.queue("load_children", gme_node),
+                    batch.queue("get_attribute_names", gme_node),
+                    batch.queue("get_valid_attribute_names", gme_node),
+                    batch.queue("get_pointer_names", gme_node),
+                )
+                for gme_node in level
+            ]
+            values = [
+                (
+                    {
+                        name: batch.queue("get_attribute", gme_node, name)
+                        for name in set(attribute_names).union(valid_names)
+                    },
+                    {
+                        name: batch.queue("get_pointer_path", gme_node, name)
+                        for name in pointer_names
+                    },
+                )
+                for (gme_node, _, attribute_names, valid_names, pointer_names) in loaded
+            ]
+            batch.flush()
+            snapshot._load_bases(
+                batch, [base.value for (_, _, _, base, *_) in reads if base.value]
+            )
+
+            for (_, snapshot_node, *_), (attributes, pointers) in zip(loaded, values):
+                snapshot_node.attributes = {
+                    name: value.value for name, value in attributes.items()
+                }
+                snapshot_node.pointers = {
+                    name: value.value for name, value in pointers.items()
+                }
+
+            level, loaded, added = [], [], []
+            for gme_node, meta_type, hash_, base, children, *names in reads:
+                attribute_names, valid_names, pointer_names = names
+                path = gme_node["nodePath"]
+                snapshot_node = snapshot.add(
+                    SnapshotNode(
+                        path=path,
+                        meta=meta_names.get(meta_type.value["nodePath"])
+                        if meta_type.value
+                        else None,
+                        attributes={},
+                        valid_attributes=valid_names.value,
+                        pointers={},
+                        parent=path.rsplit("/", 1)[0] if path else None,
+                        hash=hash_.value,
+                        bases=snapshot.bases.get(base.value["nodePath"], ())
+                        if base.value
+                        else (),
+                    )
+                )
+                loaded.append(
+                    (
+                        gme_node,
+                        snapshot_node,
+                        attribute_names.value,
+                        valid_names.value,
+                        pointer_names.value,
+                    )
+                )
+                added.append((snapshot_node, children.value))
+
+            pruned = set()
+            if prune:
+                pruned = prune(
+                    [node for node, _ in added if node.path != snapshot.root_path]
+                )
+            for snapshot_node, children in added:
+                if snapshot_node.path not in pruned:
+                    level.extend(children)
+
+        snapshot.round_trips = batch.round_trips
+        return snapshot
+
+    def _load_bases(self, batch: CoreBatch, nodes: List[dict]) -> None:
+        """Load the hashes of the (not yet loaded) base nodes and of their own bases
+
+        The META nodes (and the nodes inside them) are left out, as they are covered
+        by the hash of the META. One round-trip is needed per level of inheritance of
+        the other bases, which are loaded once per snapshot.
+        """
+        loaded = dict()
+        while nodes:
+            pending = {
+                node["nodePath"]: node
+                for node in nodes
+                if node["nodePath"] not in self.bases
+                and node["nodePath"] not in loaded
+                and not self.is_in_meta(node["nodePath"])
+            }
+            reads = [
+                (path, batch.queue("get_hash", node), batch.queue("get_base", node))
+                for path, node in pending.items()
+            ]
+            batch.flush()
+            for path, hash_, base in reads:
+                loaded[path] = (hash_.value, base.value)
+            nodes = [base.value for (_, _, base) in reads if base.value]
+
+        for path in loaded:
+            self._add_base(path, loaded)
+
+    def _add_base(self, path: str, loaded: dict) -> Tuple[Tuple[str, str], ...]:
+        if path not in self.bases:
+            hash_, base = loaded[path]
+            base_path = base["nodePath"] if base else None
+            inherited = base_path in loaded or base_path in self.bases
+            self.bases[path] = (
+                (path, hash_),
+                *(self._add_base(base_path, loaded) if inherited else ()),
+            )
+        return self.bases[path]
+
+
+class DisjointSet:
+    """A disjoint-set (union-find) over the integer ids 0..n-1
+
+    Uses union by size and path halving, so that a sequence of `union` and `find`
+    operations runs in (nearly) linear time.
+    """
+
+    __slots__ = ("parents", "sizes")
+
+    def __init__(self) -> None:
+        self.parents = []
+        self.sizes = []
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def add(self) -> int:
+        """Add a new singleton set and return its id"""
+        self.parents.append(len(self.parents))
+        self.sizes.append(1)
+        return len(self.parents) - 1
+
+    def find(self, x: int) -> int:
+        """Returns the id of the representative of the set containing x"""
+        parents = self.parents
+        while parents[x] != x:
+            parents[x] = parents[parents[x]]
+            x = parents[x]
+        return x
+
+    def union(self, x: int, y: int) -> int:
+        """Merge the sets containing x and y and return the representative"""
+        x, y = self.find(x), self.find(y)
+        if x != y:
+            if self.sizes[x] < self.sizes[y]:
+                x, y = y, x
+            self.parents[y] = x
+            self.sizes[x] += self.sizes[y]
+        return x
+
+
+class SubCircuitNetlist:
+    """The netlist (`.subckt` definition) of a Circuit node, as stored in `NetlistCache`
+
+    It stands in for a PySpice `SubCircuit` when added to a netlist, which only needs
+    its name and its text, and keeps the elements of the definition as a `CircuitGraph`
+    for the analyses. The external nodes (`ports`) are given as the relative ids of the
+    Circuit's pins, since the same netlist can be used by many Circuit nodes. `bases`
+    holds the hashes of the bases of the nodes inside the Circuit (by path), with
+    which a cached netlist is checked to be up to date.
+    """
+
+    __slots__ = (
+        "key",
+        "name",
+        "text",
+        "graph",
+        "ports",
+        "grounded_pins",
+        "dependencies",
+        "bases",
+    )
+
+    def __init__(
+        self,
+        key: str,
+        name: str,
+        text: str,
+        graph: "CircuitGraph",
+        ports: List[List[str]],
+        grounded_pins: List[str],
+        dependencies: List[str],
+        bases: Dict[str, str],
+    ) -> None:
+        self.key = key
+        self.name = name
+        self.text = text
+        self.graph = graph
+        self.ports = ports
+        self.grounded_pins = grounded_pins
+        self.dependencies = dependencies
+        self.bases = bases
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class NetlistCache:
+    """A (thread-safe) LRU cache of sub-circuit netlists, keyed by the hash of their node
+
+    A netlist is only returned along with the netlists of the sub-circuits it
+    instantiates (its dependencies), so a lookup misses if any of them was evicted.
+    """
+
+    def __init__(self, max_size: int = 4096) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._netlists = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._netlists)
+
+    def get(self, key: str) -> Optional[List[SubCircuitNetlist]]:
+        """Returns the netlist for `key` preceded by its dependencies, if cached"""
+        with self._lock:
+            netlists = self._collect(key, [], set())
+            if netlists is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return netlists
+
+    def put(self, netlist: SubCircuitNetlist) -> None:
+        """Add a netlist to the cache, evicting the least recently used ones if full"""
+        with self._lock:
+            self._netlists[netlist.key] = netlist
+            self._netlists.move_to_end(netlist.key)
+            while len(self._netlists) > self.max_size:
+                self._netlists.popitem(last=False)
+
+    def _collect(self, key: str, netlists: list, visited: set) -> Optional[list]:
+        if key not in visited:
+            visited.add(key)
+            netlist = self._netlists.get(key)
+            if netlist is None:
+                return None
+
+            self._netlists.move_to_end(key)
+            for dependency in netlist.dependencies:
+                if self._collect(dependency, netlists, visited) is None:
+                    return None
+            netlists.append(netlist)
+
+        return netlists
+
+
+class DiskCache:
+    """An on-disk LRU cache of JSON serializable values
+
+    Every entry is a file named after the SHA-256 of its key (and of the `VERSION` of
+    the cache), which holds its value as compressed JSON. Reading an entry updates its
+    modification time and, when the size of the cache exceeds `max_size` (in bytes),
+    the least recently used entries are removed until it is below 90% of `max_size`.
+    The entries are written atomically, so the cache can be shared by concurrent
+    processes. Subclasses define how the keys are named (`_get_name`) and how the
+    values are stored (`_dump` and `_load`).
+    """
+
+    # Bump when the format of the values changes, to invalidate the cache
+    VERSION = 1
+    SUFFIX = ".json.z"
+
+    def __init__(self, directory: str, max_size: float) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Return the cached value for `key`, if any"""
+        entry_path = self._get_path(key)
+        try:
+            value = self._load(
+                key, json.loads(zlib.decompress(entry_path.read_bytes()))
+            )
+            os.utime(entry_path)
+        except (OSError, ValueError, LookupError, TypeError, zlib.error):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """Cache the value for `key`, evicting the least recently used entries"""
+        data = zlib.compress(
+            json.dumps(self._dump(key, value), separators=(",", ":")).encode()
+        )
+        if len(data) > self.max_size:
+            return
+
+        entry_path = self._get_path(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, entry_path)
+
+        if self._size is None:
+            self._size = sum(size for (_, size, _) in self._get_entries())
+        else:
+            self._size += len(data)
+
+        if self._size > self.max_size:
+            self._evict(0.9 * self.max_size)
+
+    def _get_name(self, key: Any) -> str:
+        """Returns the text of a key, which names its entry"""
+        return key
+
+    def _dump(self, key: Any, value: Any) -> Any:
+        """Returns the (JSON serializable) form of a value to store"""
+        return value
+
+    def _load(self, key: Any, value: Any) -> Any:
+        """Returns a value from its stored form"""
+        return value
+
+    def _evict(self, target_size: float) -> None:
+        entries = sorted(self._get_entries())
+        self._size = sum(size for (_, size, _) in entries)
+        for (_, size, entry_path) in entries:
+            if self._size <= target_size:
+                break
+            try:
+                entry_path.unlink()
+            except OSError:
+                pass
+            self._size -= size
+
+    def _get_entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for entry_path in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = entry_path.stat()
+            except OSError:  # Removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries
+
+    def _get_path(self, key: Any) -> Path:
+        name = f"{self.VERSION}\n{self._get_name(key)}"
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return self.directory / f"{digest}{self.SUFFIX}"
+
+
+def _rank(signatures: List[tuple]) -> List[int]:
+    """Number the signatures by their order (equal signatures get the same number)"""
+    ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures)))}
+    return [ranks[signature] for signature in signatures]
+
+
+def get_canonical_form(
+    circuit: Union[Circuit, SubCircuit], max_leaves: int = 1024
+) -> Tuple[str, Dict[str, str]]:
+    """Returns a canonical form of a (sub-)circuit's elements and (internal) nodes
+
+    The elements and nodes are colored by their type, parameters and (external) name,
+    and the colors are refined by those of their neighbors until they are stable. The
+    elements are then sorted by their color, and the nodes and elements renamed in that
+    order (keeping the external nodes and the ground). Where elements still tie (e.g.
+    in symmetric sub-circuits), each of them is tried first in turn, refining again,
+    and the smallest of the resulting forms is kept. So, the forms of two sub-circuits
+    are equal if and only if they are structurally identical, regardless of their
+    labels and element order, unless more than `max_leaves` orders have to be tried:
+    the smallest of the first `max_leaves` is used then. The canonical names of the
+    nodes are returned along with the form. Sub-circuits are only referred to by name
+    (which is canonical for the ones defined by `CircuitToPySpiceBase`).
+    """
+    ports = getattr(circuit, "external_nodes", ())
+    external_nodes = {"0": "0", **{node: f"P{i}" for i, node in enumerate(ports)}}
+    elements = [
+        (
+            element.__prefix__,
+            element.name,
+            element.node_names,
+            element.format_spice_parameters().split(),
+        )
+        for element in circuit.elements
+    ]
+    indices = {name: i for i, (_, name, _, _) in enumerate(elements)}
+    references = [
+        [indices[param] for param in params if param in indices]
+        for (_, _, _, params) in elements
+    ]
+    referenced_by = [[] for _ in elements]
+    for i, referenced in enumerate(references):
+        for j in referenced:
+            referenced_by[j].append(i)
+
+    node_indices = {}
+    pins = [
+        [node_indices.setdefault(node, len(node_indices)) for node in element_nodes]
+        for (_, _, element_nodes, _) in elements
+    ]
+    incident = [[] for _ in node_indices]
+    for i, element_pins in enumerate(pins):
+        for pin, node in enumerate(element_pins):
+            incident[node].append((i, pin))
+
+    def refine(element_colors, node_colors):
+        num_colors = (len(set(element_colors)), len(set(node_colors)))
+        while True:
+            element_colors = _rank(
+                [
+                    (
+                        color,
+                        tuple(node_colors[node] for node in pins[i]),
+                        tuple(element_colors[j] for j in references[i]),
+                        tuple(sorted(element_colors[j] for j in referenced_by[i])),
+                    )
+                    for i, color in enumerate(element_colors)
+                ]
+            )
+            node_colors = _rank(
+                [
+                    (
+                        color,
+                        tuple(sorted((element_colors[i], pin) for i, pin in node_pins)),
+                    )
+                    for color, node_pins in zip(node_colors, incident)
+                ]
+            )
+            previous_num_colors = num_colors
+            num_colors = (len(set(element_colors)), len(set(node_colors)))
+            if num_colors == previous_num_colors:
+                return element_colors, node_colors
+
+    def get_orders(element_colors, node_colors):
+        element_colors, node_colors = refine(element_colors, node_colors)
+        counts = Counter(element_colors)
+        tied = min(
+            (color for color, count in counts.items() if count > 1), default=None
+        )
+        if tied is None:
+            yield sorted(range(len(elements)), key=element_colors.__getitem__)
+            return
+        twins = set()
+        for i, color in enumerate(element_colors):
+            if color != tied:
+                continue
+            # Swapping identical elements (which no other element refers to) doesn't
+            # change the circuit, so only one of them is tried first
+            _, _, element_nodes, params = elements[i]
+            twin = (tuple(element_nodes), tuple(params))
+            if not referenced_by[i]:
+                if twin in twins:
+                    continue
+                twins.add(twin)
+            individualized = _rank(
+                [(color, j != i) for j, color in enumerate(element_colors)]
+            )
+            yield from get_orders(individualized, node_colors)
+
+    def get_form(order):
+        nodes = dict(external_nodes)
+        for i in order:
+            for node in elements[i][2]:
+                nodes.setdefault(node, f"N{len(nodes)}")
+        names = {
+            elements[i][1]: f"{elements[i][0]}{rank}" for rank, i in enumerate(order)
+        }
+        form = os.linesep.join(
+            [
+                f"{len(ports)}",
+                *(
+                    " ".join(
+                        [
+                            names[elements[i][1]],
+                            *(nodes[node] for node in elements[i][2]),
+                            *(names.get(param, param) for param in elements[i][3]),
+                        ]
+                    )
+                    for i in order
+                ),
+            ]
+        )
+        return form, nodes
+
+    element_colors = _rank(
+        [
+            (prefix, tuple("" if param in indices else param for param in params))
+            for (prefix, _, _, params) in elements
+        ]
+    )
+    node_colors = _rank(
+        [
+            (node not in external_nodes, external_nodes.get(node, ""))
+            for node in node_indices
+        ]
+    )
+    orders = islice(get_orders(element_colors, node_colors), max_leaves)
+    return min((get_form(order) for order in orders), key=lambda form: form[0])
+
+
+class ElementRecord:
+    """An element of a `CircuitGraph`, with its name and its SPICE parameters"""
+
+    __slots__ = ("name", "parameters")
+
+    def __init__(self, name: str, parameters: str = "") -> None:
+        self.name = name
+        self.parameters = parameters
+
+    def __repr__(self) -> str:
+        return f"ElementRecord({self.name})"
+
+
+class CircuitGraph:
+    """A compact, array-backed representation of the elements and nets of a circuit
+
+    The element types and pin names are interned (stored once, in `types` and
+    `pin_names`) and the connectivity is held in flat NumPy arrays, in compressed sparse
+    row (CSR) form: the pins of the element `i` are `pin_offsets[i]:pin_offsets[i + 1]`
+    and `pin_name_ids` and `pin_nets` hold the name and the net of every pin. Nets are
+    numbered in the order they are first seen and named in `net_names`. Sub-circuit
+    definitions are graphs of their own (in `subcircuits`), with the nets of their
+    external nodes in `ports`, and their instances are elements of type `INSTANCE_TYPE`
+    with the name of their definition as parameters.
+
+    It is produced by the conversions (from PySpice circuits or from the elements of an
+    imported netlist) and read by the analyses, so that these run over a few arrays
+    instead of many small Python objects.
+    """
+
+    INSTANCE_TYPE = "SubCircuitElement"
+
+    __slots__ = (
+        "name",
+        "types",
+        "pin_names",
+        "net_names",
+        "elements",
+        "element_types",
+        "pin_offsets",
+        "pin_name_ids",
+        "pin_nets",
+        "ports",
+        "subcircuits",
+        "_net_pins",
+    )
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.types = []
+        self.pin_names = []
+        self.net_names = []
+        self.elements = []
+        self.element_types = np.zeros(0, dtype=np.int32)
+        self.pin_offsets = np.zeros(1, dtype=np.int64)
+        self.pin_name_ids = np.zeros(0, dtype=np.int32)
+        self.pin_nets = np.zeros(0, dtype=np.int32)
+        self.ports = np.zeros(0, dtype=np.int32)
+        self.subcircuits = []
+        self._net_pins = None
+
+    def __repr__(self) -> str:
+        return (
+            f"CircuitGraph({self.name}, elements={self.num_elements}, "
+            f"pins={self.num_pins}, nets={self.num_nets})"
+        )
+
+    @property
+    def num_elements(self) -> int:
+        return len(self.elements)
+
+    @property
+    def num_pins(self) -> int:
+        return len(self.pin_nets)
+
+    @property
+    def num_nets(self) -> int:
+        return len(self.net_names)
+
+    @classmethod
+    def from_elements(
+        cls,
+        name: str,
+        elements: Iterable[Tuple[str, str, Iterable[Tuple[str, str]], str]],
+        ports: Iterable[str] = (),
+    ) -> "CircuitGraph":
+        """Build a graph from its elements
+
+        Parameters
+        ----------
+        name: str
+            The name of the circuit
+        elements: Iterable[Tuple[str, str, Iterable[Tuple[str, str]], str]]
+            The name, type, pins (as pairs of pin name and net name) and SPICE
+            parameters of every element
+        ports: Iterable[str], default=()
+            The names of the nets of the external nodes (of a sub-circuit)
+        """
+        types, pin_names, nets = {}, {}, {}
+        records, element_types = [], []
+        pin_offsets, pin_name_ids, pin_nets = [0], [], []
+        for (element_name, type_name, pins, parameters) in elements:
+            records.append(ElementRecord(element_name, parameters))
+            element_types.append(types.setdefault(type_name, len(types)))
+            for (pin_name, net_name) in pins:
+                pin_name_ids.append(pin_names.setdefault(pin_name, len(pin_names)))
+                pin_nets.append(nets.setdefault(str(net_name), len(nets)))
+            pin_offsets.append(len(pin_nets))
+        ports = [nets.setdefault(str(net_name), len(nets)) for net_name in ports]
+
+        graph = cls(name)
+        graph.types = list(types)
+        graph.pin_names = list(pin_names)
+        graph.net_names = list(nets)
+        graph.elements = records
+        graph.element_types = np.array(element_types, dtype=np.int32)
+        graph.pin_offsets = np.array(pin_offsets, dtype=np.int64)
+        graph.pin_name_ids = np.array(pin_name_ids, dtype=np.int32)
+        graph.pin_nets = np.array(pin_nets, dtype=np.int32)
+        graph.ports = np.array(ports, dtype=np.int32)
+        return graph
+
+    @classmethod
+    def from_pyspice(cls, circuit: Union[Circuit, SubCircuit]) -> "CircuitGraph":
+        """Build the graph of a PySpice Circuit (or SubCircuit)
+
+        The elements are typed by their PySpice class and their unnamed pins (those of
+        sub-circuit instances) are named p1, p2, ... The sub-circuit definitions which
+        are only available as text (`SubCircuitNetlist`) use the graph they were
+        defined with.
+        """
+        graph = cls.from_elements(
+            circuit.name if isinstance(circuit, SubCircuit) else circuit.title,
+            (
+                (
+                    element.name,
+                    type(element).__name__,
+                    [
+                        (pin.name or f"p{index + 1}", pin.node.name)
+                        for index, pin in enumerate(element.pins)
+                    ],
+                    element.format_spice_parameters(),
+                )
+                for element in circuit.elements
+            ),
+            ports=getattr(circuit, "external_nodes", ()),
+        )
+        graph.subcircuits = [
+            subckt.graph
+            if isinstance(subckt, SubCircuitNetlist)
+            else cls.from_pyspice(subckt)
+            for subckt in circuit.subcircuits
+        ]
+        return graph
+
+    @classmethod
+    def from_dict(cls, graph_dict: dict) -> "CircuitGraph":
+        """Build a graph from its `to_dict` form"""
+        graph = cls(graph_dict["name"])
+        graph.types = graph_dict["types"]
+        graph.pin_names = graph_dict["pin_names"]
+        graph.net_names = graph_dict["net_names"]
+        graph.elements = [
+            ElementRecord(name, parameters)
+            for name, parameters in zip(
+                graph_dict["element_names"], graph_dict["element_parameters"]
+            )
+        ]
+        graph.element_types = np.array(graph_dict["element_types"], dtype=np.int32)
+        graph.pin_offsets = np.array(graph_dict["pin_offsets"], dtype=np.int64)
+        graph.pin_name_ids = np.array(graph_dict["pin_name_ids"], dtype=np.int32)
+        graph.pin_nets = np.array(graph_dict["pin_nets"], dtype=np.int32)
+        graph.ports = np.array(graph_dict["ports"], dtype=np.int32)
+        graph.subcircuits = [
+            cls.from_dict(subckt) for subckt in graph_dict["subcircuits"]
+        ]
+        return graph
+
+    def to_dict(self) -> dict:
+        """Returns the graph as a dict of (JSON serializable) lists"""
+        return {
+            "name": self.name,
+            "types": self.types,
+            "pin_names": self.pin_names,
+            "net_names": self.net_names,
+            "element_names": [element.name for element in self.elements],
+            "element_parameters": [element.parameters for element in self.elements],
+            "element_types": self.element_types.tolist(),
+            "pin_offsets": self.pin_offsets.tolist(),
+            "pin_name_ids": self.pin_name_ids.tolist(),
+            "pin_nets": self.pin_nets.tolist(),
+            "ports": self.ports.tolist(),
+            "subcircuits": [subckt.to_dict() for subckt in self.subcircuits],
+        }
+
+    def iter_elements(self) -> Iterator[Tuple[str, str, List[Tuple[str, str]], str]]:
+        """Yields the elements in the form taken by `from_elements`"""
+        pin_names = np.array(self.pin_names, dtype=object)[self.pin_name_ids]
+        net_names = np.array(self.net_names, dtype=object)[self.pin_nets]
+        for index, element in enumerate(self.elements):
+            start, end = self.pin_offsets[index], self.pin_offsets[index + 1]
+            yield (
+                element.name,
+                self.types[self.element_types[index]],
+                list(zip(pin_names[start:end], net_names[start:end])),
+                element.parameters,
+            )
+
+    @property
+    def pin_elements(self) -> np.ndarray:
+        """The element of every pin"""
+        return np.repeat(
+            np.arange(self.num_elements, dtype=np.int32), np.diff(self.pin_offsets)
+        )
+
+    def net_pins(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The pins of every net, in CSR form (offsets and pins, ordered by net)"""
+        if self._net_pins is None:
+            offsets = np.zeros(self.num_nets + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(self.pin_nets, minlength=self.num_nets), out=offsets[1:]
+            )
+            self._net_pins = (offsets, np.argsort(self.pin_nets, kind="stable"))
+        return self._net_pins
+
+    def adjacency(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The adjacency of the (bipartite) graph of elements and nets, in CSR form
+
+        The elements are the vertices 0..num_elements-1 and the nets the following
+        num_nets vertices. Every pin is an (undirected) edge between its element and
+        its net, so an element with many pins on a net is connected to it many times.
+        """
+        num_vertices = self.num_elements + self.num_nets
+        pin_elements = self.pin_elements.astype(np.int64)
+        pin_nets = self.pin_nets.astype(np.int64) + self.num_elements
+        rows = np.concatenate([pin_elements, pin_nets])
+        columns = np.concatenate([pin_nets, pin_elements])
+        offsets = np.zeros(num_vertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_vertices), out=offsets[1:])
+        return offsets, columns[np.argsort(rows, kind="stable")]
+
+    def type_counts(self) -> Dict[str, int]:
+        """Returns the number of elements of every type"""
+        counts = np.bincount(self.element_types, minlength=len(self.types))
+        return dict(zip(self.types, counts.tolist()))
+
+    def expanded_type_counts(self) -> Dict[str, int]:
+        """Returns the number of elements of every type, counting the elements of the
+        sub-circuits once per instance (`SubCircuitElement`) instead of the instances
+
+        The definitions are looked up by name in the sub-circuits of the graph (and in
+        theirs). The instances of unknown definitions are counted as they are.
+        """
+        definitions, graphs = {}, [self]
+        while graphs:
+            graph = graphs.pop()
+            for subckt in graph.subcircuits:
+                definitions.setdefault(subckt.name, subckt)
+            graphs.extend(graph.subcircuits)
+
+        counts = self._expanded_type_counts(definitions, {})
+        return {type_name: count for type_name, count in counts.items() if count}
+
+    def _expanded_type_counts(self, definitions: dict, expanded: dict) -> Counter:
+        counts = Counter(self.type_counts())
+        if self.INSTANCE_TYPE in self.types:
+            type_id = self.types.index(self.INSTANCE_TYPE)
+            for index in np.flatnonzero(self.element_types == type_id):
+                name = self.elements[index].parameters
+                if name in definitions:
+                    if name not in expanded:
+                        expanded[name] = definitions[name]._expanded_type_counts(
+                            definitions, expanded
+                        )
+                    counts[self.INSTANCE_TYPE] -= 1
+                    counts.update(expanded[name])
+        return counts
+
+
 class CircuitToPySpiceBase(PluginBase):
     """Converts WebGME node of type Circuit to its equivalent PySpice Circuit"""
 
     def main(self) -> None:
         raise NotImplementedError
 
-    def convert_to_pyspice(self, circuit: dict) -> None:
-        """Convert the webgme circuit to PySpice Circuit"""
+    @property
+    def core_address(self) -> str:
+        """The address of the CoreZMQ server of this run, for other connections to it
+
+        E.g. those of worker processes. `webgme_bindings` doesn't expose it publicly.
+        """
+        return self._webgme._address
+
+    def convert_to_pyspice(
+        self, circuit: dict, cache: Optional[NetlistCache] = None
+    ) -> None:
+        """Convert the webgme circuit to PySpice Circuit
+
+        The (nested) child Circuits are converted to sub-circuit definitions, which are
+        instantiated in their parents. The definitions are cached in `cache`, keyed by
+        the hash of the Circuit node, so that a conversion only converts (and loads)
+        the Circuits which changed since a previous conversion with the same cache.
+        """
+        self.core_round_trips = 0
+        self.netlist_cache = cache if cache is not None else NetlistCache()
         self._assign_meta_functions()
         pyspice_circuit = None
-        if not self.is_circuit(node=circuit):
+        if not self.core.is_type_of(circuit, self.META["Circuit"]):
             err_msg = (
-                f"Node ({self.core.get_path(node=self.active_node)}) "
-                f"is not of type Circuit"
+                f"Node ({self.core.get_path(node=circuit)}) " f"is not of type Circuit"
             )
             self._log_error(err_msg)
             self.result_set_success(False)
             self.result_set_error(err_msg)
         else:
-            circuit = self.active_node
-            self._initialize(circuit)
-            self._identify_pins(circuit)
-            self._expand_junction_adjacency()
-            self._assign_spice_node_labels_to_pins()
-            circuit_name = self.core.get_attribute(circuit, "name")
+            circuit = self._load_snapshot(circuit)
+            self._sub_circuit_netlists = OrderedDict()
+            sub_circuits = self._define_sub_circuits(circuit)
+            self._identify_nets(circuit, sub_circuits)
+            circuit_name = self._get_attribute(circuit, "name")
             pyspice_circuit = Circuit(circuit_name)
-            self._populate_circuit(circuit, pyspice_circuit)
+            self._populate_circuit(circuit, sub_circuits, pyspice_circuit)
+            for netlist in self._sub_circuit_netlists.values():
+                pyspice_circuit.subcircuit(netlist)
+            self._log_info(
+                f"Defined {len(self._sub_circuit_netlists)} sub-circuits, "
+                f"netlist cache hits: {self.netlist_cache.hits}, "
+                f"misses: {self.netlist_cache.misses}"
+            )
         return pyspice_circuit
 
+    def convert_to_circuit_graph(
+        self, circuit: dict, cache: Optional[NetlistCache] = None
+    ) -> Optional[CircuitGraph]:
+        """Convert the webgme circuit to a `CircuitGraph` (see `convert_to_pyspice`)"""
+        pyspice_circuit = self.convert_to_pyspice(circuit, cache=cache)
+        if pyspice_circuit is not None:
+            return CircuitGraph.from_pyspice(pyspice_circuit)
+
+    def get_selected_circuit_paths(self) -> List[str]:
+        """Returns the paths of the circuits to process in bulk (if any)
+
+        These are the Circuits in an active ElectricCircuitsFolder (and its sub-folders)
+        or the Circuits of the active selection, when more than one node is selected.
+        """
+        if self.core.is_type_of(self.active_node, self.META["ElectricCircuitsFolder"]):
+            nodes, folders = [], [self.active_node]
+            while folders:
+                batch = CoreBatch(self)
+                children = [batch.queue("load_children", folder) for folder in folders]
+                batch.flush()
+                children = [child for result in children for child in result.value]
+                folders = self._filter_by_type(children, "ElectricCircuitsFolder")
+                nodes.extend(child for child in children if child not in folders)
+        elif len(self.active_selection) > 1:
+            nodes = self.active_selection
+        else:
+            return []
+
+        return [node["nodePath"] for node in self._filter_by_type(nodes, "Circuit")]
+
+    def _filter_by_type(self, nodes: List[dict], type_name: str) -> List[dict]:
+        batch = CoreBatch(self)
+        is_type = [
+            batch.queue("is_type_of", node, self.META[type_name]) for node in nodes
+        ]
+        batch.flush()
+        return [node for node, result in zip(nodes, is_type) if result.value]
+
+    def _load_snapshot(self, circuit: dict) -> SnapshotNode:
+        """Load the subtree of the circuit, on which the rest of the conversion runs
+
+        The subtrees of the Circuits whose netlists are cached are not loaded.
+        """
+        self._cached_netlists = dict()
+        self._base_hashes = dict()
+        self._root_id = circuit["rootId"]
+        self.snapshot = CircuitSnapshot.load(
+            self, circuit, self._meta_names, prune=self._get_cached_circuits
+        )
+        self.core_round_trips += self.snapshot.round_trips
+        self._log_info(
+            f"Loaded {len(self.snapshot)} nodes of the circuit {circuit['nodePath']} "
+            f"in {self.snapshot.round_trips} round-trips"
+        )
+        return self.snapshot.root
+
+    def _get_cached_circuits(self, nodes: List[SnapshotNode]) -> Set[str]:
+        """Returns the paths of the nodes which are Circuits whose netlists are cached
+
+        The bases of the nodes inside all the cached Circuits are checked at once.
+        """
+        keys = {
+            node.path: self._get_netlist_key(node)
+            for node in nodes
+            if self.is_circuit(node=node)
+        }
+        candidates = {}
+        for key in keys.values():
+            if key not in self._cached_netlists and key not in candidates:
+                netlists = self.netlist_cache.get(key)
+                if netlists is not None:
+                    candidates[key] = netlists
+
+        self._load_base_hashes([netlists[-1] for netlists in candidates.values()])
+        for key, netlists in candidates.items():
+            if self._has_current_bases(netlists[-1]):
+                self._cached_netlists[key] = netlists
+        return {path for path, key in keys.items() if key in self._cached_netlists}
+
+    def _get_netlist_key(self, circuit: SnapshotNode) -> str:
+        """Returns the cache key for the netlist of a Circuit (and the META it uses)
+
+        The hash of a node doesn't cover what it inherits, so the hashes of the bases
+        of the Circuit are a part of the key as well.
+        """
+        hashes = [self._meta_hash, circuit.hash, *(hash_ for _, hash_ in circuit.bases)]
+        return hashlib.sha1("".join(hashes).encode()).hexdigest()
+
+    def _get_inner_bases(
+        self,
+        circuit: SnapshotNode,
+        sub_circuits: List[Tuple[SnapshotNode, SubCircuitNetlist]],
+    ) -> Dict[str, str]:
+        """Returns the hashes of the bases of the nodes inside a Circuit, by path
+
+        These are not covered by the key of the Circuit's netlist. The nodes inside the
+        child Circuits are covered by the bases of their own netlists.
+        """
+        bases = dict()
+        for _, netlist in sub_circuits:
+            bases.update(netlist.bases)
+
+        nodes = self._get_children(circuit)
+        while nodes:
+            node = nodes.pop()
+            bases.update(node.bases)
+            if not self.is_circuit(node=node):
+                nodes.extend(self._get_children(node))
+        return bases
+
+    def _load_base_hashes(self, netlists: List[SubCircuitNetlist]) -> None:
+        """Load the current hashes of the bases of cached netlists, in a single batch"""
+        paths = [
+            path
+            for path in dict.fromkeys(chain.from_iterable(n.bases for n in netlists))
+            if path not in self._base_hashes
+        ]
+        if paths:
+            batch = CoreBatch(self)
+            hashes = [
+                batch.queue("get_hash", {"rootId": self._root_id, "nodePath": path})
+                for path in paths
+            ]
+            self._flush(batch)
+            self._base_hashes.update(
+                (path, hash_.value) for path, hash_ in zip(paths, hashes)
+            )
+
+    def _has_current_bases(self, netlist: SubCircuitNetlist) -> bool:
+        """Returns if the bases of the nodes inside a cached Circuit are unchanged
+
+        Their current hashes must be loaded (by `_load_base_hashes`) first.
+        """
+        return all(
+            self._base_hashes[path] == hash_ for path, hash_ in netlist.bases.items()
+        )
+
     def _assign_meta_functions(self) -> None:
-        """Assign is_* function for easier meta type checks"""
-        for name, meta_node in self.META.items():
-            p = partial(self.core.is_type_of, node=None, type_node_or_path=meta_node)
+        """Assign is_* function for easier meta type checks
+
+        The meta type checks are resolved locally, from the base types of the META nodes
+        (loaded in a single batch) and the meta type of the (snapshot) node in question.
+        """
+        self._meta_names = {
+            meta_node["nodePath"]: name for name, meta_node in self.META.items()
+        }
+        batch = CoreBatch(self)
+        bases = {
+            name: batch.queue("get_base", meta_node)
+            for name, meta_node in self.META.items()
+        }
+        hashes = [
+            batch.queue("get_hash", self.META[name]) for name in sorted(self.META)
+        ]
+        self._flush(batch)
+        self._meta_hash = hashlib.sha1(
+            "".join(hash_.value for hash_ in hashes).encode()
+        ).hexdigest()
+
+        self._meta_type_closure = dict()
+        for name in self.META:
+            self._meta_type_closure[name] = set()
+            type_name = name
+            while type_name is not None:
+                self._meta_type_closure[name].add(type_name)
+                base = bases[type_name].value
+                type_name = self._meta_names.get(base["nodePath"]) if base else None
+
+        for name in self.META:
+            p = partial(self._is_type_of, node=None, type_name=name)
             setattr(self, f"is_{self._to_snake_case(name)}", p)
         self._log_debug(
             f"Assigned meta type classification functions to {self.__class__.__name__}"
         )
 
-    def _initialize(self, circuit: dict) -> None:
+    def _is_type_of(self, node: SnapshotNode, type_name: str) -> bool:
+        """Returns if the node is of (or derived from) the META type `type_name`"""
+        return type_name in self._meta_type_closure.get(self._get_meta_name(node), ())
+
+    def _initialize(self, circuit: SnapshotNode) -> None:
         """Initialize an empty PySpice Circuit and the necessary data-structures for conversion
 
         Parameters
         ----------
-        circuit: dict
-            A gme node of type Circuit
+        circuit: SnapshotNode
+            A (snapshot) node of type Circuit
         """
-        self._adj_list = dict()
+        self._pin_ids = dict()
+        self._pin_nets = DisjointSet()
+        self._junctions = set()
         self._junction_pin_ids = set()
         self._ground_pins = set()
         self.nodes_count = 0
         self.pin_labels = dict()
 
-    def _identify_pins(self, circuit: dict) -> None:
-        """Identify the pins and build adjacency list for pins
+    def _identify_pins(self, circuit: SnapshotNode) -> None:
+        """Identify the pins and merge the connected pins into nets
 
-        This method(recursively) identifies all the connected pins
-        and builds an adjacency list for individual pin.
+        This method identifies all the pins connected by the wires of the circuit
+        and merges them into nets (sets of pins with the same SPICE node).
         There are three possible situations to handle:
             1. The Pin is contained inside a normal component node
             2. The Pin is a ground Pin (Special Case for SPICE labeled '0')
-            3. The Pin is contained in a Junction node
+            3. The Pin is contained in a Junction node, which connects all of its pins
 
         Parameters:
         ----------
-        circuit: dict
-            A gme node of type Circuit
+        circuit: SnapshotNode
+            A (snapshot) node of type Circuit
         """
-        sub_circuits = self._get_children_of_type(circuit, "Circuit")
-        self._log_info(
-            f'Identifying pins for {self.core.get_attribute(circuit, "name")}. '
-            f"Number of SubCircuits {len(sub_circuits)}"
-        )
-
-        for sub_circuit in sub_circuits:
-            self._identify_pins(sub_circuit)
+        self._log_info(f'Identifying pins for {self._get_attribute(circuit, "name")}.')
 
         wires = sorted(
             self._get_children_of_type(circuit, "Wire"),
-            key=lambda x: self.core.get_path(x),
+            key=lambda x: self._get_path(x),
         )
 
         for wire in wires:
-            src_pin = self.core.load_pointer(wire, "src")
-            dst_pin = self.core.load_pointer(wire, "dst")
-
-            src_pin_id = self.core.get_path(src_pin)
-            dst_pin_id = self.core.get_path(dst_pin)
+            src_pin = self._get_pointer(wire, "src")
+            dst_pin = self._get_pointer(wire, "dst")
             self._log_debug(
-                f"Wire {self.core.get_path(wire)}, src: {src_pin_id}, dst: {dst_pin_id} "
+                f"Wire {self._get_path(wire)}, src: {self._get_path(src_pin)}, "
+                f"dst: {self._get_path(dst_pin)} "
             )
 
-            if not self._adj_list.get(src_pin_id):
-                self._adj_list[src_pin_id] = set()
-            if not self._adj_list.get(dst_pin_id):
-                self._adj_list[dst_pin_id] = set()
-
-            self._adj_list[src_pin_id].add(dst_pin_id)
-            self._adj_list[dst_pin_id].add(src_pin_id)
+            src_pin_id = self._get_pin_id(src_pin)
+            dst_pin_id = self._get_pin_id(dst_pin)
+            self._pin_nets.union(src_pin_id, dst_pin_id)
 
             for pin, pin_id in [(src_pin, src_pin_id), (dst_pin, dst_pin_id)]:
                 if self._is_junction_pin(pin):
-                    remaining_pin_ids = self._get_remaining_pin_ids(pin)
-                    self._junction_pin_ids.add(pin_id)
-                    for remaining_pin_id in remaining_pin_ids:
-                        self._adj_list[src_pin_id].add(remaining_pin_id)
-                        self._adj_list[dst_pin_id].add(remaining_pin_id)
-                        self._junction_pin_ids.add(remaining_pin_id)
+                    self._merge_junction_pins(pin, pin_id)
 
             if self._is_ground_pin(src_pin) or self._is_ground_pin(dst_pin):
                 self._ground_pins.add(src_pin_id)
-                self._ground_pins.add(dst_pin_id)
 
         self._log_info(
             f"Successfully identified all the pins for "
-            f'{self.core.get_attribute(circuit, "name")}'
-            f" with id {self.core.get_path(circuit)}"
+            f'{self._get_attribute(circuit, "name")}'
+            f" with id {self._get_path(circuit)}"
         )
 
-    def _expand_junction_adjacency(self):
-        """Expand the adjacency for pins connected to Junctions"""
-        for pin_id in list(self._adj_list.keys()):
-            self._visit_junctions(pin_id, set())
-
-    def _visit_junctions(self, pin_id, visited):
-        """Traverse the adjacency list of a pin to visit any connected Junctions"""
-        adj_pins = self._adj_list.get(pin_id, set())
-        for adj_pin_id in list(adj_pins):
-            if adj_pin_id in self._junction_pin_ids and adj_pin_id not in visited:
-                visited.add(adj_pin_id)
-                extra_pin_ids = self._adj_list.get(adj_pin_id, set())
-                for extra_pin_id in list(extra_pin_ids):
-                    self._adj_list[pin_id].add(extra_pin_id)
-                    self._visit_junctions(extra_pin_id, visited)
+    def _define_sub_circuits(
+        self, circuit: SnapshotNode
+    ) -> List[Tuple[SnapshotNode, SubCircuitNetlist]]:
+        """Define the sub-circuits for the child Circuits of a circuit"""
+        return [
+            (sub_circuit, self._define_sub_circuit(sub_circuit))
+            for sub_circuit in self._get_children_of_type(circuit, "Circuit")
+        ]
+
+    def _define_sub_circuit(self, circuit: SnapshotNode) -> SubCircuitNetlist:
+        """Returns the netlist of a Circuit, converting it if it isn't cached
+
+        The netlist is named after the (canonical) structure of the sub-circuit, rather
+        than the name of the Circuit, so the structurally identical Circuits share a
+        single definition. The netlists of the Circuit and of its sub-circuits are added
+        (once per definition) to the sub-circuit definitions of the conversion.
+        """
+        key = self._get_netlist_key(circuit)
+        netlists = self._cached_netlists.get(key)
+        if netlists is None:
+            sub_circuits = self._define_sub_circuits(circuit)
+            self._identify_nets(circuit, sub_circuits)
+            ports, grounded_pins = self._get_ports(circuit)
+            subckt = SubCircuit(self._get_attribute(circuit, "name"), *ports)
+            self._populate_circuit(circuit, sub_circuits, subckt)
+
+            structure = hashlib.sha1(
+                get_canonical_form(subckt)[0].encode("utf-8")
+            ).hexdigest()
+            name = f"subckt_{structure[:12]}"
+            graph = CircuitGraph.from_pyspice(subckt)
+            graph.name = name
+            netlist = SubCircuitNetlist(
+                key=key,
+                name=name,
+                text=(
+                    f".subckt {' '.join([name, *ports])}{os.linesep}"
+                    f"{Netlist.__str__(subckt)}.ends {name}{os.linesep}"
+                ),
+                graph=graph,
+                ports=list(ports.values()),
+                grounded_pins=grounded_pins,
+                dependencies=list(dict.fromkeys(n.key for _, n in sub_circuits)),
+                bases=self._get_inner_bases(circuit, sub_circuits),
+            )
+            self.netlist_cache.put(netlist)
+            netlists = self._cached_netlists[key] = [netlist]
+        else:
+            self._add_port_pins(circuit, netlists[-1])
+
+        for netlist in netlists:
+            self._sub_circuit_netlists.setdefault(netlist.name, netlist)
+        return netlists[-1]
+
+    def _add_port_pins(self, circuit: SnapshotNode, netlist: SubCircuitNetlist) -> None:
+        """Add the pins of a (not loaded) cached Circuit to the snapshot"""
+        for relid in [*chain.from_iterable(netlist.ports), *netlist.grounded_pins]:
+            path = f"{self._get_path(circuit)}/{relid}"
+            if path not in self.snapshot:
+                self.snapshot.add(
+                    SnapshotNode(path, "Pin", {}, [], {}, self._get_path(circuit))
+                )
 
-    def _assign_spice_node_labels_to_pins(self):
-        """Assign SPICE node labels to pins based on the adjacency list"""
-        component_pin_ids = []
-        junction_pin_ids = []
-        for pin_id in self._ground_pins:
-            self.pin_labels[pin_id] = "0"
-
-        for pin_id in self._adj_list:
-            if pin_id in self._junction_pin_ids:
-                junction_pin_ids.append(pin_id)
-            else:
-                component_pin_ids.append(pin_id)
+    def _identify_nets(
+        self,
+        circuit: SnapshotNode,
+        sub_circuits: List[Tuple[SnapshotNode, SubCircuitNetlist]],
+    ) -> None:
+        """Identify the nets of a circuit and assign their SPICE node labels"""
+        self._initialize(circuit)
+        self._identify_pins(circuit)
+        for sub_circuit, netlist in sub_circuits:
+            self._connect_ports(sub_circuit, netlist)
+        self._assign_spice_node_labels_to_pins()
+
+    def _connect_ports(
+        self, sub_circuit: SnapshotNode, netlist: SubCircuitNetlist
+    ) -> None:
+        """Merge the nets of the pins of a sub-circuit which share a port"""
+        for port in netlist.ports:
+            pin_ids = [self._get_port_pin_id(sub_circuit, relid) for relid in port]
+            for pin_id in pin_ids[1:]:
+                self._pin_nets.union(pin_ids[0], pin_id)
 
-        for pin_id in component_pin_ids + junction_pin_ids:
-            if pin_id in self.pin_labels:
-                for adj_pin in self._adj_list[pin_id]:
-                    self.pin_labels[adj_pin] = self.pin_labels[pin_id]
-            else:
-                current_label = None
-                for adj_pin in self._adj_list[pin_id]:
-                    if adj_pin in self.pin_labels:
-                        current_label = self.pin_labels[adj_pin]
+        for relid in netlist.grounded_pins:
+            self._ground_pins.add(self._get_port_pin_id(sub_circuit, relid))
+
+    def _get_port_pin_id(self, sub_circuit: SnapshotNode, relid: str) -> int:
+        """Returns the (integer) id of a pin of a sub-circuit, from its relative id"""
+        return self._get_pin_id(self.snapshot[f"{self._get_path(sub_circuit)}/{relid}"])
+
+    def _get_ports(self, circuit: SnapshotNode) -> Tuple[dict, List[str]]:
+        """Returns the external nodes of a circuit, from the nets of its pins
 
-                    if not current_label:
-                        self.nodes_count += 1
-                        current_label = f"N000{self.nodes_count}"
+        The pins (relative ids) are grouped by the SPICE node label of their net,
+        except for the ones connected to the ground, which are returned separately.
+        """
+        ports, grounded_pins = dict(), []
+        for pin in self._get_children_of_type(circuit, "Pin"):
+            pin_id = self._get_path(pin)
+            relid = pin_id.rsplit("/", 1)[1]
+            label = self._resolve_spice_node_label_for(pin_id)
+            if label == "0":
+                grounded_pins.append(relid)
+            else:
+                ports.setdefault(label, []).append(relid)
+        return ports, grounded_pins
+
+    def _get_pin_id(self, pin: SnapshotNode) -> int:
+        """Returns the (integer) id of a pin, in the order the pins are identified"""
+        pin_path = self._get_path(pin)
+        if pin_path not in self._pin_ids:
+            self._pin_ids[pin_path] = self._pin_nets.add()
+        return self._pin_ids[pin_path]
+
+    def _merge_junction_pins(self, pin: SnapshotNode, pin_id: int) -> None:
+        """Merge the net of a junction pin with the nets of the junction's other pins"""
+        self._junction_pin_ids.add(pin_id)
+        junction = self._get_parent(pin)
+        if self._get_path(junction) in self._junctions:
+            return
+
+        self._junctions.add(self._get_path(junction))
+        for junction_pin in self._get_children_of_type(junction, "Pin"):
+            junction_pin_id = self._get_pin_id(junction_pin)
+            self._junction_pin_ids.add(junction_pin_id)
+            self._pin_nets.union(pin_id, junction_pin_id)
 
-                self.pin_labels[pin_id] = current_label
+    def _assign_spice_node_labels_to_pins(self):
+        """Assign SPICE node labels to pins, one per net
 
-                for adj_pin in self._adj_list[pin_id]:
-                    self.pin_labels[adj_pin] = self.pin_labels[pin_id]
+        The nets with a ground pin are labeled '0'. The rest are numbered in the order
+        their pins were identified, with the pins of components before junction pins.
+        """
+        net_labels = {self._pin_nets.find(pin_id): "0" for pin_id in self._ground_pins}
+        pin_paths = list(self._pin_ids)
+        pin_ids = sorted(
+            range(len(pin_paths)), key=lambda x: x in self._junction_pin_ids
+        )
 
-    def _get_remaining_pin_ids(self, pin):
-        """Returns the remaining pin ids of the component containing this pin"""
-        parent = self.core.get_parent(pin)
-        pins = self._get_children_of_type(parent, "Pin")
-        pins.remove(pin)
-        return list(map(lambda node: self.core.get_path(node), pins))
+        for pin_id in pin_ids:
+            net = self._pin_nets.find(pin_id)
+            if net not in net_labels:
+                self.nodes_count += 1
+                net_labels[net] = f"N000{self.nodes_count}"
+            self.pin_labels[pin_paths[pin_id]] = net_labels[net]
 
-    def _is_junction_pin(self, pin: dict) -> bool:
+    def _is_junction_pin(self, pin: SnapshotNode) -> bool:
         """Returns if the pin is a junction pin"""
-        parent = self.core.get_parent(pin)
+        parent = self._get_parent(pin)
         return self.is_junction(node=parent)
 
-    def _is_ground_pin(self, pin: dict) -> bool:
+    def _is_ground_pin(self, pin: SnapshotNode) -> bool:
         """Returns if the pin is a ground pin"""
-        parent = self.core.get_parent(pin)
+        parent = self._get_parent(pin)
         return self.is_ground(node=parent)
 
-    def _is_circuit_pin(self, pin: dict) -> bool:
+    def _is_circuit_pin(self, pin: SnapshotNode) -> bool:
         """Returns if the pin is contained inside a circuit"""
-        parent = self.core.get_parent(pin)
+        parent = self._get_parent(pin)
         return self.is_circuit(node=parent)
 
-    def _get_parent_id(self, node: dict) -> str:
-        """Returns the parent id of a GME node"""
-        parent = self.core.get_parent(node)
-        return self.core.get_path(parent)
+    def _get_parent_id(self, node: SnapshotNode) -> str:
+        """Returns the parent id of a (snapshot) node"""
+        parent = self._get_parent(node)
+        return self._get_path(parent)
 
     def _populate_circuit(
-        self, circuit: dict, parent_circuit: Optional[Union[Circuit, SubCircuit]] = None
+        self,
+        circuit: SnapshotNode,
+        sub_circuits: List[Tuple[SnapshotNode, SubCircuitNetlist]],
+        parent_circuit: Union[Circuit, SubCircuit],
     ):
         """Populate the PySpice Circuit with components from the webgme Circuit
 
         Parameters
         ----------
-        circuit: dict
-            GME Node of type Circuit
-        parent_circuit: Optional[Union[Circuit, SubCircuit]], default=None
+        circuit: SnapshotNode
+            (Snapshot) node of type Circuit
+        sub_circuits: List[Tuple[SnapshotNode, SubCircuitNetlist]]
+            The child Circuits, along with the netlists of their sub-circuit definitions
+        parent_circuit: Union[Circuit, SubCircuit]
             The PySpice Circuit or SubCircuit object of which the components will be a part of
         """
+        self._labeler = ElementLabeler()
         components = self._get_children_except(
-            circuit, "Pin", "Wire", "Junction", "Ground"
+            circuit, "Pin", "Wire", "Junction", "Ground", "Circuit"
         )
-        sub_circuits = self._get_children_of_type(circuit, "Circuit")
-
-        for sub_circuit in sub_circuits:
-            exposed_nodes = self._get_external_spice_nodes_for(sub_circuit)
-            subckt = SubCircuit(
-                self.core.get_attribute(sub_circuit, "name"), *set(exposed_nodes)
-            )
-            parent_circuit.subcircuit(subckt)
-            self._populate_circuit(sub_circuit, subckt)
 
         components_map = {}
         for component in components:
-            component_id = self.core.get_path(component)
+            component_id = self._get_path(component)
             components_map[component_id] = dict()
             components_map[component_id]["node"] = component
             pins = self._get_children_of_type(component, "Pin")
             for pin in pins:
-                pin_id = self.core.get_path(pin)
-                pin_name = self.core.get_attribute(pin, "name")
+                pin_id = self._get_path(pin)
+                pin_name = self._get_attribute(pin, "name")
                 components_map[component_id][
                     pin_name
                 ] = self._resolve_spice_node_label_for(pin_id)
 
         for component in components_map.values():
             self._add_to_pyspice_circuit(component, parent_circuit)
+
+        for sub_circuit, netlist in sub_circuits:
+            parent_circuit.X(
+                self._labeler.next_label("X", self._get_attribute(sub_circuit, "name")),
+                netlist.name,
+                *(
+                    self._resolve_spice_node_label_for(
+                        f"{self._get_path(sub_circuit)}/{port[0]}"
+                    )
+                    for port in netlist.ports
+                ),
+            )
         self._log_info(
-            f"Circuit ({self.core.get_attribute(circuit, 'name')})'s components have been added."
+            f"Circuit ({self._get_attribute(circuit, 'name')})'s components have been added."
         )
 
     def _add_to_pyspice_circuit(
@@ -280,17 +1670,19 @@ class CircuitToPySpiceBase(PluginBase):
             self._is_capable_to_convert(component["node"])
         except PySpiceConversionError as e:
             self._log_error(str(e))
-            self.create_message(component["node"], str(e), severity="error")
+            self.create_message(
+                self.snapshot.to_gme_node(component["node"]), str(e), severity="error"
+            )
             raise e
 
-        if self.core.is_type_of(component["node"], self.META["Basic"]):
+        if self.is_basic(node=component["node"]):
             self._add_basic_elements(component, pyspice_ckt)
 
-        elif self.core.is_type_of(component["node"], self.META["Semiconductors"]):
+        elif self.is_semiconductors(node=component["node"]):
             self._add_semiconductors(component, pyspice_ckt)
 
         self._log_info(
-            f"Added element ({self.core.get_attribute(component['node'], 'name')}), "
+            f"Added element ({self._get_attribute(component['node'], 'name')}), "
             f"of type {self._get_meta_name(component['node'])} to the Circuit."
         )
 
@@ -301,75 +1693,75 @@ class CircuitToPySpiceBase(PluginBase):
         node = component["node"]
         if is_res := (self.is_resistor(node=node)) or self.is_conductor(node=node):
             pyspice_ckt.R(
-                get_next_label_for("R", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("R", self._get_attribute(node, "name")),
                 component["p"],
                 component["n"],
                 u_Ohm(
-                    self.core.get_attribute(node, "R")
+                    self._get_attribute(node, "R")
                     if is_res
-                    else 1 / self.core.get_attribute(node, "G")
+                    else 1 / self._get_attribute(node, "G")
                 ),
             )
         if self.is_inductor(node=node):
             pyspice_ckt.L(
-                get_next_label_for("L", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("L", self._get_attribute(node, "name")),
                 component["p"],
                 component["n"],
-                u_H(self.core.get_attribute(node, "L")),
+                u_H(self._get_attribute(node, "L")),
             )
         if self.is_capacitor(node=node):
             pyspice_ckt.Capacitor(
-                get_next_label_for("C", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("C", self._get_attribute(node, "name")),
                 component["p"],
                 component["n"],
-                capacitance=u_F(self.core.get_attribute(node, "C")),
+                capacitance=u_F(self._get_attribute(node, "C")),
             )
         if self.is_voltage(node=node):
             pyspice_ckt.V(
-                get_next_label_for("V", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("V", self._get_attribute(node, "name")),
                 component["p"],
                 component["n"],
-                self.core.get_attribute(node, "V"),
+                self._get_attribute(node, "V"),
             )
 
         if self.is_current(node=node):
             pyspice_ckt.I(
-                get_next_label_for("I", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("I", self._get_attribute(node, "name")),
                 component["p"],
                 component["n"],
-                self.core.get_attribute(node, "I"),
+                self._get_attribute(node, "I"),
             )
 
         if is_vcc := self.is_vcc(node=node) or self.is_vcv(node=node):
             pyspice_ckt.G(
-                get_next_label_for(
-                    "G" if is_vcc else "E", self.core.get_attribute(node, "name")
+                self._labeler.next_label(
+                    "G" if is_vcc else "E", self._get_attribute(node, "name")
                 ),
                 component["p2"],
                 component["n2"],
                 component["p1"],
                 component["n1"],
-                self.core.get_attribute(node, "transConductance" if is_vcc else "gain"),
+                self._get_attribute(node, "transConductance" if is_vcc else "gain"),
             )
 
         if is_ccc := self.is_ccc(node=node) or self.is_ccv(node=node):
-            voltage_label = get_next_label_for("V", "CCSourceVoltage")
+            voltage_label = self._labeler.next_label("V", "CCSourceVoltage")
             pyspice_ckt.V(voltage_label, component["p1"], component["n1"])
             if is_ccc:
                 pyspice_ckt.F(
-                    get_next_label_for("F", self.core.get_attribute(node, "name")),
+                    self._labeler.next_label("F", self._get_attribute(node, "name")),
                     component["p2"],
                     component["n2"],
                     source=voltage_label,
-                    current_gain=self.core.get_attribute(node, "gain"),
+                    current_gain=self._get_attribute(node, "gain"),
                 )
             else:
                 pyspice_ckt.H(
-                    get_next_label_for("H", self.core.get_attribute(node, "name")),
+                    self._labeler.next_label("H", self._get_attribute(node, "name")),
                     component["p2"],
                     component["n2"],
                     source=voltage_label,
-                    transresistance=self.core.get_attribute(node, "transResistance"),
+                    transresistance=self._get_attribute(node, "transResistance"),
                 )
 
         if any(
@@ -393,11 +1785,11 @@ class CircuitToPySpiceBase(PluginBase):
                 vs9 := self.is_ac_line(node=node),
             ]
         ):
-            attrs = self.core.get_valid_attribute_names(node)
+            attrs = self._get_valid_attribute_names(node)
             attrs.remove("name")
             class_name = self._get_meta_name(node)
             class_callable = getattr(pyspice_ckt, class_name)
-            ctor_kwargs = {attr: self.core.get_attribute(node, attr) for attr in attrs}
+            ctor_kwargs = {attr: self._get_attribute(node, attr) for attr in attrs}
 
             if self.is_piece_wise_linear_voltage_source(
                 node=node
@@ -410,9 +1802,9 @@ class CircuitToPySpiceBase(PluginBase):
                     ), self._log_error("Could not cast values to float")
 
             class_callable(
-                get_next_label_for(
+                self._labeler.next_label(
                     "V" if any([vs1, vs2, vs3, vs4, vs5, vs6, vs7, vs8, vs9]) else "I",
-                    self.core.get_attribute(node, "name"),
+                    self._get_attribute(node, "name"),
                 ),
                 component["p"],
                 component["n"],
@@ -432,7 +1824,7 @@ class CircuitToPySpiceBase(PluginBase):
             or self.is_z_diode(node=node)
         ):
             pyspice_ckt.D(
-                get_next_label_for("D", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("D", self._get_attribute(node, "name")),
                 component["p"],
                 component["n"],
                 model="DDummy",
@@ -440,7 +1832,7 @@ class CircuitToPySpiceBase(PluginBase):
 
         if self.is_npn(node=node) or self.is_pnp(node=node):
             pyspice_ckt.Q(
-                get_next_label_for("Q", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("Q", self._get_attribute(node, "name")),
                 component.get("Collector", component.get("C")),
                 component.get("Base", component.get("B")),
                 component.get("Emitter", component.get("E")),
@@ -449,7 +1841,7 @@ class CircuitToPySpiceBase(PluginBase):
 
         if self.is_nmos(node=node) or self.is_pmos(node=node):
             pyspice_ckt.M(
-                get_next_label_for("M", self.core.get_attribute(node, "name")),
+                self._labeler.next_label("M", self._get_attribute(node, "name")),
                 component.get("Drain", component.get("D")),
                 component.get("Gate", component.get("G")),
                 component.get("Bulk", component.get("B")),
@@ -457,22 +1849,6 @@ class CircuitToPySpiceBase(PluginBase):
                 model="MDummy",
             )
 
-    def _get_external_spice_nodes_for(self, circuit: dict) -> list:
-        """Get external exposed nodes for a sub-circuit/circuit
-
-        This function extracts pins of a circuit/sub-circuit to add to the PySpice Circuit
-        """
-        msg = "Provided node is not of type Circuit"
-        assert self.is_circuit(node=circuit), self._log_error(msg)
-
-        pins = self._get_children_of_type(circuit, "Pin")
-        external_spice_nodes = []
-        for pin in pins:
-            pin_id = self.core.get_path(pin)
-            spice_node_id = self._resolve_spice_node_label_for(pin_id)
-            external_spice_nodes.append(spice_node_id)
-        return external_spice_nodes
-
     def _resolve_spice_node_label_for(self, pin_id):
         """Return the SPICE node label for a particular pin"""
         if pin_id not in self.pin_labels:
@@ -481,35 +1857,71 @@ class CircuitToPySpiceBase(PluginBase):
 
         return self.pin_labels[pin_id]
 
-    def _get_meta_name(self, node: dict) -> str:
-        """From a GME Node, get its META name"""
-        meta_node = self.core.get_meta_type(node)
-        if meta_node:
-            return self.core.get_attribute(meta_node, "name")
+    def _get_meta_name(self, node: SnapshotNode) -> str:
+        """From a (snapshot) node, get its META name"""
+        return node.meta
 
-    # Helper Methods for gme nodes
-    def _get_children_of_type(self, node: dict, type_: str) -> List[dict]:
-        """Returns children of a GME node of specific type"""
+    # Helper Methods for (snapshot) nodes
+    def _get_children_of_type(
+        self, node: SnapshotNode, type_: str
+    ) -> List[SnapshotNode]:
+        """Returns children of a (snapshot) node of specific type"""
         return list(
             filter(
-                lambda x: self.core.get_meta_type(x) == self.META[type_],
-                self.core.load_children(node),
+                lambda x: self._get_meta_name(x) == type_,
+                self._get_children(node),
             )
         )
 
-    def _get_children_except(self, node: dict, *args: Iterable[str]) -> List[dict]:
-        """Returns children of a GME Node except provided as positional arguments"""
+    def _get_children_except(
+        self, node: SnapshotNode, *args: Iterable[str]
+    ) -> List[SnapshotNode]:
+        """Returns children of a (snapshot) node except provided as positional arguments"""
         assert (type(arg) == str for arg in args), "Please Provide a specific type"
         children = []
-        for child in self.core.load_children(node):
-            if all(self.core.get_meta_type(child) != self.META[arg] for arg in args):
+        for child in self._get_children(node):
+            if all(self._get_meta_name(child) != arg for arg in args):
                 children.append(child)
         return children
 
+    @staticmethod
+    def _get_path(node: SnapshotNode) -> str:
+        """Returns the path of a (snapshot) node"""
+        return node.path
+
+    def _get_parent(self, node: SnapshotNode) -> Optional[SnapshotNode]:
+        """Returns the parent of a (snapshot) node"""
+        return self.snapshot.get(node.parent)
+
+    def _get_children(self, node: SnapshotNode) -> List[SnapshotNode]:
+        """Returns the children of a (snapshot) node"""
+        return [self.snapshot[path] for path in node.children]
+
+    def _get_pointer(self, node: SnapshotNode, name: str) -> Optional[SnapshotNode]:
+        """Returns the target of a pointer of a (snapshot) node"""
+        return self.snapshot.get(node.pointers.get(name))
+
+    @staticmethod
+    def _get_attribute(node: SnapshotNode, name: str):
+        """Returns the value of an attribute of a (snapshot) node"""
+        return node.attributes.get(name)
+
+    @staticmethod
+    def _get_valid_attribute_names(node: SnapshotNode) -> List[str]:
+        """Returns the valid attribute names of a (snapshot) node"""
+        return list(node.valid_attributes)
+
+    def _flush(self, batch: CoreBatch) -> None:
+        """Flush a batch of core reads and keep track of the round-trips"""
+        if len(batch):
+            round_trips = batch.round_trips
+            batch.flush()
+            self.core_round_trips += batch.round_trips - round_trips
+
     def _is_capable_to_convert(self, node) -> bool:
         """Returns whether or not conversion is possible"""
         for skip in SKIP_NODES:
-            if self.core.is_type_of(node, self.META[skip]):
+            if self._is_type_of(node, skip):
                 raise PySpiceConversionError(
                     f"Node of type {skip} is not supported yet"
                 )
@@ -11,6 +11,11 @@ define([
     const COMMAND = 'python';
     const path = require('path');
     const SCRIPT_FILE = path.join(path.dirname(module.uri), 'run_python_plugin.py');
+    const WORKER_HOST = '127.0.0.1';
+    const WORKER_PORT = +process.env.PYTHON_PLUGIN_WORKER_PORT || null;
+    const WORKER_TOKEN = process.env.PYTHON_PLUGIN_WORKER_TOKEN || null;
+    const NODE_RESULTS = ['getParent', 'getBase', 'getMetaType', 'loadPointer', 'loadByPath'];
+    const NODE_LIST_RESULTS = ['loadChildren', 'loadOwnChildren', 'loadSubTree'];
 
     class PythonPluginBase extends PluginBase {
         constructor(pluginMetadata) {
@@ -36,12 +41,21 @@ define([
             this.logger.info(`zmq-server listening at port ${port}`);
 
             try {
-                await this.callScript(COMMAND, SCRIPT_FILE, port);
+                if (WORKER_PORT && !WORKER_TOKEN) {
+                    this.logger.warn('PYTHON_PLUGIN_WORKER_TOKEN is not set, so the python worker is not used');
+                }
+                if (WORKER_PORT && WORKER_TOKEN && await this.callWorker(WORKER_PORT, port)) {
+                    this.logger.info(`Plugin ran in the python worker at port ${WORKER_PORT}`);
+                } else {
+                    await this.callScript(COMMAND, SCRIPT_FILE, port);
+                }
+                await this.discardFileUploads();
                 await corezmq.stopServer();
                 callback(null, this.result);
             } catch (err) {
                 this.logger.error(err.stack);
-                corezmq.stopServer()
+                this.discardFileUploads()
+                    .then(() => corezmq.stopServer())
                     .finally(() => {
                         // Result success is false at invocation.
                         callback(err, this.result);
@@ -49,6 +63,198 @@ define([
             }
         }
 
+        async executeCoreBatch(calls) {
+            // Node arguments ({nodePath}) are resolved against the root of the current commit
+            // and node results are returned as paths, to be wrapped as node dicts in python
+            if (!this.batchNodes) {
+                this.batchNodes = {};
+            }
+
+            const loadNode = async nodePath => {
+                if (!this.batchNodes[nodePath]) {
+                    this.batchNodes[nodePath] = this.core.loadByPath(this.rootNode, nodePath);
+                }
+                return await this.batchNodes[nodePath];
+            };
+            const toPath = node => node ? this.core.getPath(node) : null;
+
+            return Promise.all(calls.map(async ([name, ...args]) => {
+                const coreArgs = await Promise.all(args.map(arg => {
+                    return (arg && arg.nodePath !== undefined) ? loadNode(arg.nodePath) : arg;
+                }));
+                const result = await this.core[name](...coreArgs);
+
+                if (NODE_RESULTS.includes(name)) {
+                    return toPath(result);
+                } else if (NODE_LIST_RESULTS.includes(name)) {
+                    return result.map(toPath);
+                }
+                return result === undefined ? null : result;
+            }));
+        }
+
+        async startFileUpload(name, addToResult = true) {
+            // Files written in chunks from python (BlobFileWriter) are spooled to a temporary
+            // file and streamed to the blob storage once finished
+            const fs = require('fs');
+            const os = require('os');
+            if (!this.fileUploads) {
+                this.fileUploads = {};
+                this.fileUploadCount = 0;
+            }
+
+            const dir = await fs.promises.mkdtemp(path.join(os.tmpdir(), 'python-plugin-'));
+            const id = `${++this.fileUploadCount}`;
+            this.fileUploads[id] = {name, dir, file: path.join(dir, 'upload'), addToResult};
+            await fs.promises.writeFile(this.fileUploads[id].file, '');
+            return id;
+        }
+
+        async appendFileUpload(id, chunk) {
+            const fs = require('fs');
+            await fs.promises.appendFile(this.getFileUpload(id).file, chunk, 'utf8');
+            return null;
+        }
+
+        async finishFileUpload(id) {
+            const fs = require('fs');
+            const upload = this.getFileUpload(id);
+            try {
+                const hash = await this.blobClient.putFile(
+                    upload.name,
+                    fs.createReadStream(upload.file)
+                );
+                if (upload.addToResult) {
+                    this.result.addArtifact(hash);
+                }
+                return hash;
+            } finally {
+                await this.discardFileUpload(id);
+            }
+        }
+
+        async saveArtifact(name, files) {
+            // Bundles files already in the blob storage (by name) without uploading them again
+            const artifact = this.blobClient.createArtifact(name);
+            await artifact.addMetadataHashes(files);
+            const hash = await artifact.save();
+            this.result.addArtifact(hash);
+            return hash;
+        }
+
+        async discardFileUpload(id) {
+            const fs = require('fs');
+            const upload = this.getFileUpload(id);
+            delete this.fileUploads[id];
+            await fs.promises.unlink(upload.file).catch(() => {});
+            await fs.promises.rmdir(upload.dir).catch(() => {});
+            return null;
+        }
+
+        async discardFileUploads() {
+            const ids = Object.keys(this.fileUploads || {});
+            await Promise.all(ids.map(id => this.discardFileUpload(id)));
+        }
+
+        getFileUpload(id) {
+            const upload = this.fileUploads && this.fileUploads[id];
+            if (!upload) {
+                throw new Error(`Unknown file upload: ${id}`);
+            }
+            return upload;
+        }
+
+        getPluginJob(port) {
+            return {
+                plugin_name: this.getId(),
+                port: port,
+                commit_hash: this.commitHash,
+                branch_name: this.branchName || null,
+                active_node_path: this.core.getPath(this.activeNode),
+                active_selection_paths: this.activeSelection.map(node => this.core.getPath(node)),
+                namespace: this.namespace,
+            };
+        }
+
+        async callWorker(workerPort, port) {
+            const net = require('net');
+            const job = this.getPluginJob(port);
+            // The worker only runs the jobs sent with its token
+            job.token = WORKER_TOKEN;
+
+            return new Promise((resolve, reject) => {
+                const socket = net.createConnection({host: WORKER_HOST, port: workerPort});
+                let connected = false,
+                    buffer = '',
+                    response = null;
+
+                // The worker sends the log records of the job, then its status, as JSON lines
+                const onLine = line => {
+                    let message;
+                    try {
+                        message = JSON.parse(line);
+                    } catch (err) {
+                        message = {
+                            success: false,
+                            error: `Invalid response from the python worker: ${line}`
+                        };
+                    }
+
+                    if (message.log) {
+                        const log = this.logger[message.log.level] || this.logger.info;
+                        log.call(this.logger, message.log.message);
+                    } else {
+                        response = message;
+                    }
+                };
+
+                socket.setEncoding('utf8');
+
+                socket.on('connect', () => {
+                    connected = true;
+                    socket.end(JSON.stringify(job) + '\n');
+                });
+
+                socket.on('data', data => {
+                    const lines = (buffer + data).split('\n');
+                    buffer = lines.pop();
+                    lines.filter(line => line).forEach(onLine);
+                });
+
+                socket.on('end', () => {
+                    if (buffer) {
+                        onLine(buffer);
+                    }
+                    const {success, error} = response || {
+                        success: false,
+                        error: 'No response from the python worker'
+                    };
+
+                    if (success) {
+                        if(this.result.getSuccess() === null) {
+                            this.result.setSuccess(true);
+                        }
+                        resolve(true);
+                    } else {
+                        this.logger.error(error);
+                        this.result.setSuccess(false);
+                        reject(new Error(`Python worker failed to run ${job.plugin_name}.`));
+                    }
+                });
+
+                socket.on('error', err => {
+                    if (!connected) {
+                        // No worker is listening, so fallback to spawning the script
+                        this.logger.warn(`Python worker unavailable at port ${workerPort}: ${err.message}`);
+                        resolve(false);
+                    } else {
+                        this.result.setSuccess(false);
+                        reject(err);
+                    }
+                });
+            });
+        }
+
         async callScript(program, scriptPath, port) {
             const cp = require('child_process');
             let options = {},
@@ -57,7 +263,7 @@ define([
                     this.getId(),
                     port,
                     `"${this.commitHash}"`,
-                    `"${this.branchName}"`,
+                    `"${this.branchName || ''}"`,
                     `"${this.core.getPath(this.activeNode)}"`,
                     `"${this.activeSelection.map(node => this.core.getPath(node)).join(',')}"`,
                     `"${this.namespace}"`,
@@ -4,88 +4,299 @@ plugin context via arguments. These can be modified to include more information
 Notes:
  - The current working directory when called from a plugin is the root of your webgme repo.
  - At the point of invocation of this plugin - it is assumed that a coreZMQ-server is running at 127.0.0.1:PORT.
+ - When started with `--worker WORKER_PORT [PLUGIN ...]`, the script runs as a long-lived worker which
+   keeps its imports warm and accepts plugin jobs (one JSON line per connection) at 127.0.0.1:WORKER_PORT.
+   Only the jobs with the token set in PYTHON_PLUGIN_WORKER_TOKEN (which is required) are run.
+   The listed plugins are imported at startup, the rest on their first job. The log records of a job
+   (those of the plugin's logger) are sent back as JSON lines to be logged by the plugin, followed by
+   the status of the job.
+ - Plugins are imported lazily. Set PYTHON_PLUGIN_IMPORT_BUDGET (seconds) to get a warning when the
+   imports exceed that budget.
 """
+import hmac
 import json
 import logging
+import os
+import socketserver
 import sys
+import time
+import traceback
+from importlib.machinery import ModuleSpec
 from importlib.util import module_from_spec, spec_from_file_location
 from pathlib import Path
+from types import ModuleType
 
 from webgme_bindings import WebGME
 
-WEBGME_SETUP = Path(f"{__file__}/../../../../webgme-setup.json").resolve()
+ROOT_DIR = Path(f"{__file__}/../../../..").resolve()
+WEBGME_SETUP = ROOT_DIR / "webgme-setup.json"
 IMPORT_MODULE_NAME = "electric_circuits.plugins"
+SHARED_MODULES = {
+    "electric_circuits.plugin_bases": ROOT_DIR
+    / "src/common/plugins/CircuitAnalysisBases.py",
+}
+IMPORT_BUDGET_ENV = "PYTHON_PLUGIN_IMPORT_BUDGET"
+WORKER_FLAG = "--worker"
+WORKER_HOST = "127.0.0.1"
+WORKER_TOKEN_ENV = "PYTHON_PLUGIN_WORKER_TOKEN"
 
 
-def _import_python_class(plugin_file: Path, class_name: str) -> type:
-    spec = spec_from_file_location(IMPORT_MODULE_NAME, plugin_file)
-    base_module = module_from_spec(spec)
-    spec.loader.exec_module(base_module)
+class PythonPluginRegistry:
+    """Resolves python plugins listed in webgme-setup.json and imports them on demand
 
-    return getattr(base_module, class_name)
+    Only the requested plugin's module is imported (once per process). The shared base
+    modules are imported before the first plugin and registered in `sys.modules`, so
+    that plugins reuse them instead of executing them again. Import times (in seconds)
+    are recorded per module in `import_times` and checked against `import_budget`.
 
+    The registry is also a finder on `sys.meta_path`, so that processes started fresh
+    (e.g. the spawned workers of a process pool, which re-run this script) can import
+    the plugin modules by name when unpickling their functions.
+    """
 
-def get_python_plugin_classes() -> dict:
-    plugin_classes = {}
-    with open(WEBGME_SETUP, "r") as webgme_setup:
-        plugins = json.load(webgme_setup)["components"]["plugins"]
+    def __init__(self, setup_file: Path = WEBGME_SETUP, import_budget: float = None):
+        self.setup_file = setup_file
+        self.import_budget = import_budget
+        self.import_times = {}
+        self._plugin_files = None
+        self._plugin_classes = {}
+        self._logger = logging.getLogger("PythonPluginRegistry")
 
-        for plugin_name in plugins:
-            plugin_file = Path(
-                f"{__file__}/../../../../{plugins[plugin_name]['src']}/{plugin_name}/__init__.py"
-            ).resolve()
+    @property
+    def plugin_files(self) -> dict:
+        """The `__init__.py` files of the python plugins in the current deployment"""
+        if self._plugin_files is None:
+            with open(self.setup_file, "r") as webgme_setup:
+                plugins = json.load(webgme_setup)["components"]["plugins"]
 
-            if plugin_file.exists():
-                plugin_classes[plugin_name] = _import_python_class(
-                    plugin_file, plugin_name
-                )
+            self._plugin_files = {}
+            for plugin_name in plugins:
+                plugin_file = Path(
+                    f"{ROOT_DIR}/{plugins[plugin_name]['src']}/{plugin_name}/__init__.py"
+                ).resolve()
+                if plugin_file.exists():
+                    self._plugin_files[plugin_name] = plugin_file
+
+        return self._plugin_files
 
-    return plugin_classes
+    def __contains__(self, plugin_name: str) -> bool:
+        return plugin_name in self.plugin_files
+
+    def get(self, plugin_name: str) -> type:
+        """Return the plugin class for `plugin_name`, importing its module if needed"""
+        if plugin_name not in self._plugin_classes:
+            if plugin_name not in self:
+                raise Exception(
+                    f"No Python Plugin named {plugin_name} available in the current deployment"
+                )
 
+            for module_name, module_file in SHARED_MODULES.items():
+                if module_name not in sys.modules:
+                    self._import_module(module_file, module_name)
 
-PLUGINS = get_python_plugin_classes()
+            plugin_module = self._import_module(
+                self.plugin_files[plugin_name], f"{IMPORT_MODULE_NAME}.{plugin_name}"
+            )
+            self._plugin_classes[plugin_name] = getattr(plugin_module, plugin_name)
 
-if len(PLUGINS) == 0:
-    raise Exception("No Python Plugins available in the current deployment")
+        return self._plugin_classes[plugin_name]
 
-logger = logging.getLogger(sys.argv[1])
+    def find_spec(self, module_name: str, path=None, target=None) -> ModuleSpec:
+        """Locate the shared modules, the plugin modules and their parent packages"""
+        if module_name in SHARED_MODULES:
+            return spec_from_file_location(module_name, SHARED_MODULES[module_name])
 
+        package_name, _, plugin_name = module_name.rpartition(".")
+        if package_name == IMPORT_MODULE_NAME and plugin_name in self:
+            return spec_from_file_location(module_name, self.plugin_files[plugin_name])
 
-logger.info("sys.args: {0}".format(sys.argv))
+        package_names = [IMPORT_MODULE_NAME, *SHARED_MODULES]
+        if any(f"{name}.".startswith(f"{module_name}.") for name in package_names):
+            return ModuleSpec(module_name, None, is_package=True)
 
-PORT = sys.argv[2]
-COMMIT_HASH = sys.argv[3].strip('"')
-BRANCH_NAME = sys.argv[4].strip('"')
-ACTIVE_NODE_PATH = sys.argv[5].strip('"')
-ACTIVE_SELECTION_PATHS = []
+        return None
 
-if sys.argv[6] != '""':
-    ACTIVE_SELECTION_PATHS = sys.argv[6].strip('"').split(",")
-    if ACTIVE_SELECTION_PATHS[0] == "":
-        ACTIVE_SELECTION_PATHS.pop(0)
+    def _import_module(self, module_file: Path, module_name: str) -> ModuleType:
+        start = time.perf_counter()
+        spec = spec_from_file_location(module_name, module_file)
+        module = module_from_spec(spec)
+        # Register the (empty) parent packages too, so that the functions and classes
+        # of the plugins can be pickled by reference, e.g. for a process pool
+        package_name = module_name.rpartition(".")[0]
+        while package_name and package_name not in sys.modules:
+            sys.modules[package_name] = ModuleType(package_name)
+            package_name = package_name.rpartition(".")[0]
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[module_name]
+            raise
 
-NAMESPACE = sys.argv[7].strip('"')
+        self.import_times[module_name] = time.perf_counter() - start
+        self._logger.info(
+            f"Imported {module_name} in {self.import_times[module_name]:.3f}s"
+        )
+        total_time = sum(self.import_times.values())
+        if self.import_budget is not None and total_time > self.import_budget:
+            self._logger.warning(
+                f"Plugin imports took {total_time:.3f}s, which exceeds the budget "
+                f"of {self.import_budget:.3f}s: {self.import_times}"
+            )
 
+        return module
 
-logger.debug("commit-hash: {0}".format(COMMIT_HASH))
-logger.debug("branch-name: {0}".format(BRANCH_NAME))
-logger.debug("active-node-path: {0}".format(ACTIVE_NODE_PATH))
-logger.debug("active-selection-paths: {0}".format(ACTIVE_SELECTION_PATHS))
-logger.debug("name-space: {0}".format(NAMESPACE))
 
-# Create an instance of WebGME and the plugin
-webgme = WebGME(PORT, logger)
-plugin = PLUGINS[sys.argv[1]](
-    webgme,
-    COMMIT_HASH,
-    BRANCH_NAME,
-    ACTIVE_NODE_PATH,
-    ACTIVE_SELECTION_PATHS,
-    NAMESPACE,
+IMPORT_BUDGET = os.environ.get(IMPORT_BUDGET_ENV)
+REGISTRY = PythonPluginRegistry(
+    import_budget=float(IMPORT_BUDGET) if IMPORT_BUDGET else None
 )
+sys.meta_path.append(REGISTRY)
+
+
+def parse_plugin_args(argv: list) -> dict:
+    """Build a plugin job from the command line arguments passed by PythonPluginBase.js"""
+    active_selection_paths = []
+
+    if argv[6] != '""':
+        active_selection_paths = argv[6].strip('"').split(",")
+        if active_selection_paths[0] == "":
+            active_selection_paths.pop(0)
+
+    return {
+        "plugin_name": argv[1],
+        "port": argv[2],
+        "commit_hash": argv[3].strip('"'),
+        "branch_name": argv[4].strip('"'),
+        "active_node_path": argv[5].strip('"'),
+        "active_selection_paths": active_selection_paths,
+        "namespace": argv[7].strip('"'),
+    }
+
+
+def run_plugin(job: dict) -> None:
+    """Connect to the coreZMQ-server of the job and run the requested plugin"""
+    logger = logging.getLogger(job["plugin_name"])
+
+    logger.debug("plugin-job: {0}".format(job))
+
+    # Create an instance of WebGME and the plugin
+    webgme = WebGME(job["port"], logger)
+    try:
+        plugin = REGISTRY.get(job["plugin_name"])(
+            webgme,
+            job["commit_hash"],
+            job["branch_name"],
+            job["active_node_path"],
+            job["active_selection_paths"],
+            job["namespace"],
+        )
+
+        # Do the work
+        plugin.main()
+    finally:
+        # Finally disconnect from the zmq-server
+        webgme.disconnect()
+
+
+class PluginWorkerServer(socketserver.TCPServer):
+    """Serves the plugin jobs sent with its token, as any local process can connect"""
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, RequestHandlerClass, token: str) -> None:
+        super().__init__(server_address, RequestHandlerClass)
+        self.token = token
+
+    def is_authorized(self, job: dict) -> bool:
+        token = str(job.get("token", "")).encode("utf-8")
+        return hmac.compare_digest(token, self.token.encode("utf-8"))
+
+
+class JobLogHandler(logging.Handler):
+    """Sends the log records of a plugin job to PythonPluginBase.js, as JSON lines
+
+    They are logged by the logger of the JS plugin, as is the output of the script
+    when the plugin is not run in the worker.
+    """
+
+    def __init__(self, stream) -> None:
+        super().__init__()
+        self.stream = stream
+        self.setFormatter(logging.Formatter("%(name)s - %(message)s"))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.ERROR:
+                level = "error"
+            elif record.levelno >= logging.WARNING:
+                level = "warn"
+            elif record.levelno >= logging.INFO:
+                level = "info"
+            else:
+                level = "debug"
+            log = {"level": level, "message": self.format(record)}
+            self.stream.write(f"{json.dumps({'log': log})}\n".encode("utf-8"))
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class PluginJobHandler(socketserver.StreamRequestHandler):
+    """Runs a single plugin job, sent as a JSON line, and replies with its status
+
+    The job is only run if it has the token of the server. The log records of the
+    plugin's logger are sent (as JSON lines) while it runs, before the status.
+    """
+
+    def handle(self) -> None:
+        response = {"success": True, "error": None}
+        try:
+            job = json.loads(self.rfile.readline())
+            if not self.server.is_authorized(job):
+                raise PermissionError("The plugin job has an invalid worker token")
+        except Exception:
+            response["success"] = False
+            response["error"] = traceback.format_exc()
+        else:
+            del job["token"]
+            logger = logging.getLogger(job["plugin_name"])
+            log_handler = JobLogHandler(self.wfile)
+            logger.addHandler(log_handler)
+            try:
+                run_plugin(job)
+            except Exception:
+                response["success"] = False
+                response["error"] = traceback.format_exc()
+            finally:
+                logger.removeHandler(log_handler)
+
+        if not response["success"]:
+            logging.getLogger("PythonPluginWorker").error(response["error"])
+        self.wfile.write(f"{json.dumps(response)}\n".encode("utf-8"))
+
+
+def serve(port: int, token: str, preload: list = ()) -> None:
+    """Run as a long-lived worker, keeping the plugins (and their imports) loaded"""
+    for plugin_name in preload:
+        REGISTRY.get(plugin_name)
+
+    with PluginWorkerServer((WORKER_HOST, port), PluginJobHandler, token) as server:
+        logging.getLogger("PythonPluginWorker").info(
+            f"Serving plugins {list(REGISTRY.plugin_files)} at {WORKER_HOST}:{port}"
+        )
+        server.serve_forever()
 
-# Do the work
-plugin.main()
 
-# Finally disconnect from the zmq-server
-webgme.disconnect()
+if __name__ == "__main__":
+    if sys.argv[1] == WORKER_FLAG:
+        if not os.environ.get(WORKER_TOKEN_ENV):
+            sys.exit(f"{WORKER_TOKEN_ENV} must be set to run the worker")
+        # The plugins' loggers keep their own levels, as when the script is run
+        logging.basicConfig()
+        for name in ("PythonPluginWorker", "PythonPluginRegistry"):
+            logging.getLogger(name).setLevel(logging.INFO)
+        serve(int(sys.argv[2]), os.environ[WORKER_TOKEN_ENV], sys.argv[3:])
+    else:
+        logging.getLogger(sys.argv[1]).info("sys.args: {0}".format(sys.argv))
+        run_plugin(parse_plugin_args(sys.argv))
@@ -1,5 +1,14 @@
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from importlib.util import module_from_spec, spec_from_file_location
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+from webgme_bindings import WebGME
 
 BASE_PLUGIN_PATH = Path(
     f"{__file__}/../../../../common/plugins/CircuitAnalysisBases.py"
@@ -8,19 +17,144 @@ BASE_PLUGIN_PATH = Path(
 IMPORT_MODULE_NAME = "electric_circuits.plugin_bases"
 BASE_PLUGIN_NAME = "CircuitToPySpiceBase"
 
-spec = spec_from_file_location(IMPORT_MODULE_NAME, BASE_PLUGIN_PATH)
+if IMPORT_MODULE_NAME in sys.modules:
+    base_module = sys.modules[IMPORT_MODULE_NAME]
+else:
+    spec = spec_from_file_location(IMPORT_MODULE_NAME, BASE_PLUGIN_PATH)
 
-base_module = module_from_spec(spec)
-spec.loader.exec_module(base_module)
+    base_module = module_from_spec(spec)
+    spec.loader.exec_module(base_module)
+    sys.modules[IMPORT_MODULE_NAME] = base_module
 
 PluginBase = getattr(base_module, BASE_PLUGIN_NAME)
+BlobFileWriter = getattr(base_module, "BlobFileWriter")
+save_artifact = getattr(base_module, "save_artifact")
+write_netlist = getattr(base_module, "write_netlist")
+
+# Kept for the lifetime of the process, so that the (python plugin) worker only
+# converts the sub-circuits which changed since the previous exports
+NETLIST_CACHE = base_module.NetlistCache()
+
+# The plugin instance of an export worker process, with its own connection to the core
+_worker_plugin = None
 
 
 class ConvertCircuitToNetlist(PluginBase):
     def main(self) -> None:
-        circuit = super().convert_to_pyspice(self.active_node)
-        output_filename = self.get_current_config().get("file_name")
-        if not output_filename:
-            output_filename = self.core.get_attribute(self.active_node, "name")
-        self.add_file(f"{output_filename}.cir", str(circuit))
-        self.result_set_success(True)
+        circuit_paths = self.get_selected_circuit_paths()
+        if circuit_paths:
+            self.result_set_success(self._export_circuits(circuit_paths))
+        else:
+            circuit = super().convert_to_pyspice(self.active_node, cache=NETLIST_CACHE)
+            output_filename = self.get_current_config().get("file_name")
+            if not output_filename:
+                output_filename = self.core.get_attribute(self.active_node, "name")
+            with BlobFileWriter(self, f"{output_filename}.cir") as netlist_file:
+                write_netlist(circuit, netlist_file)
+            self.result_set_success(True)
+
+    def _export_circuits(self, circuit_paths: List[str]) -> bool:
+        """Convert the circuits in a pool of worker processes and upload a single zip
+
+        Every worker process connects to the core itself and converts the circuits
+        assigned to it with its own plugin instance. The processes are started fresh
+        (forkserver or spawn) rather than forked, since the ZMQ connection of this
+        process cannot be inherited; they import this module by name, as registered by
+        run_python_plugin.py. The netlists are streamed to the blob storage by the
+        workers and bundled as an artifact here. Circuits which cannot be converted
+        are reported and skipped, and fail the export (once the others are uploaded).
+
+        Returns whether every circuit was exported.
+        """
+        config = self.get_current_config()
+        max_workers = config.get("max_workers") or os.cpu_count()
+        max_workers = min(max_workers, len(circuit_paths))
+        self._log_info(
+            f"Exporting {len(circuit_paths)} circuits with {max_workers} workers"
+        )
+
+        if max_workers > 1:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                mp_context = multiprocessing.get_context("forkserver")
+            else:
+                mp_context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers,
+                mp_context=mp_context,
+                initializer=_init_export_worker,
+                initargs=(
+                    self.core_address,
+                    self.commit_hash,
+                    self.branch_name,
+                    self.namespace,
+                ),
+            ) as pool:
+                results = list(pool.map(_export_circuit, circuit_paths))
+        else:
+            results = [self._export_circuit(path) for path in circuit_paths]
+
+        files = {}
+        for path, (name, netlist_hash, error) in zip(circuit_paths, results):
+            if error:
+                self._log_error(error)
+                self.create_message(
+                    self.core.load_by_path(self.root_node, path), error, "error"
+                )
+            else:
+                file_name = name
+                while f"{file_name}.cir" in files:
+                    file_name = f"{file_name}_{path.replace('/', '_')}"
+                files[f"{file_name}.cir"] = netlist_hash
+
+        if files:
+            artifact_name = config.get("file_name")
+            if not artifact_name:
+                artifact_name = self.core.get_attribute(self.active_node, "name")
+            save_artifact(self, artifact_name, files)
+        self._log_info(f"Exported {len(files)} of {len(circuit_paths)} circuits")
+
+        if len(files) < len(circuit_paths):
+            self.result_set_error(
+                f"{len(circuit_paths) - len(files)} of {len(circuit_paths)} circuits "
+                f"could not be exported"
+            )
+            return False
+        return True
+
+    def _export_circuit(
+        self, path: str
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Convert and upload the circuit at `path`
+
+        The netlist is streamed to the blob storage, but not added to the plugin
+        result. Returns the name of the circuit and the (metadata) hash of its netlist,
+        or the error (with None for both), so that a failing circuit doesn't stop the
+        export.
+        """
+        try:
+            node = self.core.load_by_path(self.root_node, path)
+            circuit = self.convert_to_pyspice(node, cache=NETLIST_CACHE)
+            with BlobFileWriter(
+                self, f"{circuit.title}.cir", add_to_result=False
+            ) as netlist_file:
+                write_netlist(circuit, netlist_file)
+        except Exception as e:
+            return None, None, f"Could not export the circuit ({path}): {e}"
+        return circuit.title, netlist_file.hash, None
+
+
+def _init_export_worker(
+    address: str, commit_hash: str, branch_name: str, namespace: str
+) -> None:
+    global _worker_plugin
+    logger = logging.getLogger(f"ConvertCircuitToNetlist[{os.getpid()}]")
+    webgme = WebGME(address=address, logger=logger)
+    # Disconnected when the worker process exits
+    multiprocessing.util.Finalize(webgme, webgme.disconnect, exitpriority=10)
+    _worker_plugin = ConvertCircuitToNetlist(
+        webgme, commit_hash, branch_name, "", None, namespace
+    )
+
+
+def _export_circuit(path: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    return _worker_plugin._export_circuit(path)
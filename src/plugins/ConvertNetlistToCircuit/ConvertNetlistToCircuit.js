@@ -35,25 +35,52 @@ define([
             return (await this.blobClient.getMetadata(metadataHash));
         }
 
-        async getZipFileContents(metadataHash) {
-            const zipMetadata = await this.getMetadata(metadataHash);
+        async loadZipFile(metadataHash) {
+            // The zip file is loaded once per import, until it is released. Its entries are
+            // only decompressed when requested, so that large archives can be streamed.
+            if (!this.zipFiles) {
+                this.zipFiles = {};
+            }
+
+            if (!this.zipFiles[metadataHash]) {
+                this.zipFiles[metadataHash] = (async () => {
+                    const zipMetadata = await this.getMetadata(metadataHash);
+
+                    if(zipMetadata.mime !== 'application/zip') {
+                        throw new Error('The provided file is not a zip file');
+                    }
 
-            if(zipMetadata.mime !== 'application/zip') {
-                throw new Error('The provided file is not a zip file');
+                    const zipFile = await this.blobClient.getObject(metadataHash);
+                    const zipLoader = new JSZip();
+                    return await zipLoader.loadAsync(zipFile);
+                })();
             }
 
-            const zipFile = await this.blobClient.getObject(metadataHash);
-            const zipLoader = new JSZip();
-            const zip = await zipLoader.loadAsync(zipFile);
-            let zipContents = {};
+            return this.zipFiles[metadataHash];
+        }
+
+        async getZipFileNames(metadataHash) {
+            const zip = await this.loadZipFile(metadataHash);
+            return Object.entries(zip.files)
+                .filter(([/*name*/, entry]) => !entry.dir)
+                .map(([name]) => name);
+        }
+
+        async getZipFileEntries(metadataHash, names) {
+            const zip = await this.loadZipFile(metadataHash);
+            const contents = [];
 
-            for(let [name, entry] of Object.entries(zip.files)) {
-                if(!entry.dir){
-                    zipContents[name] = await entry.async('text');
-                }
+            for(const name of names) {
+                contents.push(await zip.files[name].async('text'));
             }
 
-            return zipContents;
+            return contents;
+        }
+
+        async releaseZipFile(metadataHash) {
+            if (this.zipFiles) {
+                delete this.zipFiles[metadataHash];
+            }
         }
     }
 
@@ -1,16 +1,38 @@
 """
 This Plugin Takes in a Netlist and attempts to build an equivalent representation in WebGME.
+
+Parsed netlists are cached on disk, keyed by the SHA-256 of their text, so that importing
+the same netlists again skips parsing. The cache is stored in NETLIST_PARSE_CACHE_DIR
+(a directory in the system's temporary directory by default) and its size is bounded by
+NETLIST_PARSE_CACHE_SIZE (in MB, 256 by default, 0 disables the cache).
+
+A sample of the imported circuits (a fraction `validation_rate` of them, all of them when
+NODE_ENV is "test") is checked against the netlists they were created from.
+
+Large imports can be committed in chunks (every `commit_every` circuits, or once about
+`commit_max_objects` objects, i.e. nodes, were created), along with the number of
+netlists imported so far and the netlists which failed. Running the plugin again on the
+same netlist(s) after an interrupted import resumes it after the last chunk committed.
+By default, an import is a single commit.
+
+The nodes of every imported circuit are laid out in layers, following its nets from its
+pins and sources, and the circuits are placed on a square grid in the folder.
 """
-import itertools
 import logging
+import multiprocessing
 import os
 import sys
+import tempfile
+import zlib
 from builtins import isinstance
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from importlib.util import module_from_spec, spec_from_file_location
+from itertools import chain
 from pathlib import Path
-from typing import Callable, List, Optional, Tuple, Union
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
-from PySpice.Spice.BasicElement import SubCircuitElement
+import numpy as np
 from PySpice.Spice.Netlist import Circuit, SubCircuit
 from PySpice.Spice.Parser import SpiceParser
 from webgme_bindings import PluginBase
@@ -74,17 +96,22 @@ pyspice_to_gme_pins = {
     "output_minus": "n2",
 }
 
-GROUND_NODE_ID = 0
+# The layout of the imported circuits starts from these nodes, with this spacing (px)
+LAYOUT_SEED_TYPES = ("Pin", "Voltage", "Current")
+LAYOUT_ORIGIN = 50
+LAYOUT_SPACING = 200
+
+# The registry (of the folder) which holds the progress of the chunked imports
+IMPORT_PROGRESS_REGISTRY = "netlistImportProgress"
 
+# The number of zip file members fetched per request, when importing a zip file
+ZIP_BATCH_SIZE = 16
 
-def find_by_key(
-    input_list: List[dict], key: str, value: str
-) -> Optional[Tuple[dict, int]]:
-    """Utility method to find an element in a list of dictionary by a specific key"""
-    for element in input_list:
-        if element[key] == value:
-            return element, input_list.index(element)
-    raise ValueError(f"No Element with {key}={value} found in the list")
+PARSE_CACHE_DIR = os.environ.get(
+    "NETLIST_PARSE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "electric-circuits-netlist-cache"),
+)
+PARSE_CACHE_SIZE = float(os.environ.get("NETLIST_PARSE_CACHE_SIZE", 256)) * 1024 * 1024
 
 
 def import_from_path(import_path, module_name):
@@ -94,6 +121,29 @@ def import_from_path(import_path, module_name):
     return module
 
 
+BASE_PLUGIN_PATH = Path(
+    f"{__file__}/../../../../common/plugins/CircuitAnalysisBases.py"
+).resolve()
+IMPORT_MODULE_NAME = "electric_circuits.plugin_bases"
+
+if IMPORT_MODULE_NAME in sys.modules:
+    base_module = sys.modules[IMPORT_MODULE_NAME]
+else:
+    base_module = import_from_path(BASE_PLUGIN_PATH, IMPORT_MODULE_NAME)
+    sys.modules[IMPORT_MODULE_NAME] = base_module
+
+CircuitGraph = getattr(base_module, "CircuitGraph")
+DiskCache = getattr(base_module, "DiskCache")
+DisjointSet = getattr(base_module, "DisjointSet")
+
+
+class NetlistParseCache(DiskCache):
+    """An on-disk LRU cache of parsed netlists (circuit dicts), keyed by their text"""
+
+    # Bump when the format of the circuit dicts changes, to invalidate the cache
+    VERSION = 2
+
+
 class ConvertNetlistToCircuit(PluginBase):
     def main(self):
 
@@ -112,27 +162,72 @@ class ConvertNetlistToCircuit(PluginBase):
                 "name", None
             )
 
-            created_circuits = []
-            failures = []
+            num_created = 0
 
             if Path(input_netlist_filename).suffix == ".zip":
-                netlists = self._get_zip_file_contents(input_netlist_hash)
+                filenames = self._get_zip_file_names(input_netlist_hash)
             else:
-                netlists = dict()
-                netlists[input_netlist_filename] = self.get_file(input_netlist_hash)
-
-            pos_gen = self.get_position_generator(alternate_positions=False)
-            for filename, netlist_string in netlists.items():
-                try:
-                    pyspice_circuit = self._netlist_to_pyspice_circuit(
-                        netlist_string, filename
+                filenames = [input_netlist_filename]
+            num_netlists = len(filenames)
+
+            # Resume a chunked import of the same netlist(s), which did not finish
+            num_imported, failures = self._get_import_progress(input_netlist_hash)
+            if num_imported:
+                self.logger.info(
+                    f"Resuming the import of {input_netlist_filename} after "
+                    f"{num_imported} of {num_netlists} netlists"
+                )
+                filenames = filenames[num_imported:]
+
+            if Path(input_netlist_filename).suffix == ".zip":
+                netlists = self._iter_zip_file_contents(input_netlist_hash, filenames)
+            else:
+                netlists = [
+                    (filename, self.get_file(input_netlist_hash))
+                    for filename in filenames
+                ]
+
+            # A square grid of circuits, continued after those of an interrupted import
+            pos_gen = self.get_position_generator(
+                max_width=int(np.ceil(np.sqrt(num_netlists)) + 1) * 200,
+                alternate_positions=False,
+            )
+            for _ in range(num_netlists - len(filenames)):
+                pos_gen()
+            parsed_netlists = self._parse_netlists(netlists, len(filenames))
+            for filename, netlist, circuit_dict, error in parsed_netlists:
+                num_imported += 1
+                if error is not None:
+                    failures.append((filename, error))
+                else:
+                    gme_circuit = self._create_gme_circuit_from_dict(circuit_dict)
+                    if self.logger.isEnabledFor(logging.DEBUG):
+                        self.logger.debug(
+                            f"Created {self._circuit_dict_to_graph(circuit_dict)} "
+                            f"({self.core.get_path(gme_circuit)}) from {filename}"
+                        )
+                    self._set_position(gme_circuit, pos_gen)
+                    num_created += 1
+                    if os.environ.get("NODE_ENV") == "test":
+                        pyspice_circuit = self._netlist_to_pyspice_circuit(
+                            netlist, filename
+                        )
+                        self.assert_valid(gme_circuit, pyspice_circuit)
+                    elif self._should_validate(filename):
+                        self._validate_import(gme_circuit, circuit_dict, filename)
+                    self._num_uncommitted += 1
+
+                if num_imported < num_netlists and self._is_chunk_complete():
+                    self._set_import_progress(
+                        input_netlist_hash, num_imported, failures
                     )
-                except Exception as e:
-                    failures.append((filename, e))
-                    continue
-                gme_circuit = self._create_gme_circuit_from_pyspice(pyspice_circuit)
-                self._set_position(gme_circuit, pos_gen)
-                created_circuits.append((pyspice_circuit, gme_circuit))
+                    start_commit = [
+                        self._commit_results(
+                            start_commit,
+                            f"Imported {num_imported} of {num_netlists} netlists "
+                            f"from {input_netlist_filename}",
+                        )
+                    ]
 
             for filename, error in failures:
                 self.create_message(
@@ -143,27 +238,133 @@ class ConvertNetlistToCircuit(PluginBase):
                     "error",
                 )
 
-            if created_circuits:
-                self._commit_results(start_commit)
+            self.logger.info(
+                f"Netlist parse cache: {self._parse_cache.hits} hits, "
+                f"{self._parse_cache.misses} misses"
+            )
+            if self.num_validated:
+                self.logger.info(
+                    f"Validated {self.num_validated} of {num_created} circuits, "
+                    f"{self.num_invalid} not equivalent to their netlists"
+                )
+
+            resumed = num_netlists > len(filenames)
+            if self._num_uncommitted or self._num_commits or resumed:
+                message = "Successfully created the circuit"
+                if self._num_commits or resumed:
+                    message = (
+                        f"Imported {num_netlists} of {num_netlists} netlists "
+                        f"from {input_netlist_filename}"
+                    )
+                    self._set_import_progress(input_netlist_hash, None, [])
+                self._commit_results(start_commit, message)
+                self.create_message(
+                    self.active_node,
+                    self.core.get_path(self.active_node),
+                    self.core.get_children_paths(self.active_node),
+                )
                 self.result_set_success(True)
-                if os.environ.get("NODE_ENV") == "test":
-                    for (pyspice_circuit, gme_circuit) in created_circuits:
-                        self.assert_valid(gme_circuit, pyspice_circuit)
             else:
                 self.result_set_success(False)
 
     def _initialize(self) -> None:
         self._generate_positions = self.get_position_generator()
         self._pyspice_id_to_gme_node = {}
-        self._connected_pins = {}
+        self._pin_index = {}
+        self._meta_pin_relids = {}
+        self._connected_pins = DisjointSet()
+        self._pin_set_ids = {}
+        self._parse_cache = NetlistParseCache(PARSE_CACHE_DIR, PARSE_CACHE_SIZE)
+        self._meta_names = {node["nodePath"]: name for name, node in self.META.items()}
+        self._validation_rate = self.get_current_config().get("validation_rate", 0)
+        self.num_validated = 0
+        self.num_invalid = 0
+        config = self.get_current_config()
+        self._commit_every = config.get("commit_every", 0)
+        self._commit_max_objects = config.get("commit_max_objects", 0)
+        self._num_uncommitted = 0
+        self._num_commits = 0
+        self._num_uncommitted_nodes = 0
+
+    def _parse_netlists(
+        self, netlists: Iterable[Tuple[str, str]], num_netlists: int
+    ) -> Iterator[Tuple[str, str, Optional[dict], Optional[str]]]:
+        """Parse the netlists into circuit dicts, in a pool of worker processes
+
+        Parsing does not use the core, so the netlists of a zip file are parsed in
+        parallel (by `max_workers` processes, the number of CPUs by default) and only
+        the creation of the GME nodes is left to the plugin. Netlists found in the parse
+        cache are not parsed again. The netlists are consumed lazily, with at most two
+        netlists per worker being parsed at a time. Yields the filename, the netlist,
+        the circuit dict and the error message (if the netlist could not be parsed) of
+        every netlist, in order. The workers are started fresh (forkserver or spawn)
+        rather than forked, since the ZMQ connection of this process cannot be shared
+        with them; they import `parse_netlist` by name, as registered by
+        run_python_plugin.py.
+        """
+        max_workers = self.get_current_config().get("max_workers") or os.cpu_count()
+        max_workers = min(max_workers, num_netlists)
+
+        pool = None
+        if max_workers > 1:
+            self.logger.info(
+                f"Parsing {num_netlists} netlists with {max_workers} workers"
+            )
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                mp_context = multiprocessing.get_context("forkserver")
+            else:
+                mp_context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(max_workers, mp_context=mp_context)
+
+        try:
+            pending = deque()
+            for filename, netlist in netlists:
+                circuit_dict = self._parse_cache.get(netlist)
+                if circuit_dict is not None:
+                    parsed = (filename, circuit_dict, None)
+                elif pool is not None:
+                    parsed = pool.submit(parse_netlist, filename, netlist)
+                else:
+                    parsed = parse_netlist(filename, netlist)
+
+                pending.append((netlist, parsed, circuit_dict is not None))
+                if len(pending) >= 2 * max_workers:
+                    yield self._get_parsed_netlist(*pending.popleft())
+
+            while pending:
+                yield self._get_parsed_netlist(*pending.popleft())
+        finally:
+            if pool is not None:
+                for (_, parsed, _) in pending:
+                    if isinstance(parsed, Future):
+                        parsed.cancel()
+                pool.shutdown()
+
+    def _get_parsed_netlist(
+        self,
+        netlist: str,
+        parsed: Union[Future, Tuple[str, Optional[dict], Optional[str]]],
+        cached: bool,
+    ) -> Tuple[str, str, Optional[dict], Optional[str]]:
+        """Wait for a parsed netlist (if needed), cache it and name it after its file"""
+        if isinstance(parsed, Future):
+            parsed = parsed.result()
+        filename, circuit_dict, error = parsed
+
+        if circuit_dict is not None:
+            if not cached:
+                self._parse_cache.put(netlist, circuit_dict)
+            if not circuit_dict["name"]:
+                circuit_dict["name"] = Path(filename).stem
+        return filename, netlist, circuit_dict, error
 
-    def _circuit_to_dict(self, circuit: Union[Circuit, SubCircuit]) -> dict:
+    @staticmethod
+    def _circuit_to_dict(circuit: Union[Circuit, SubCircuit]) -> dict:
         """Return a PySpice Circuit from an input Netlist"""
-        return self._pyspice_circuit_to_dict(circuit)
+        return ConvertNetlistToCircuit._pyspice_circuit_to_dict(circuit)
 
-    def _netlist_to_pyspice_circuit(
-        self, netlist: str, filename: str = None
-    ) -> Circuit:
+    @staticmethod
+    def _netlist_to_pyspice_circuit(netlist: str, filename: str = None) -> Circuit:
         spice_parser = SpiceParser(source=netlist)
         spice_ckt = spice_parser.build_circuit()
         for sub_ckt in spice_parser.subcircuits:
@@ -178,11 +379,21 @@ class ConvertNetlistToCircuit(PluginBase):
         self, pyspice_circuit: Union[Circuit, SubCircuit]
     ) -> dict:
         """From a given PySpice Circuit, create a GME Circuit"""
-        circuit_dict = self._circuit_to_dict(pyspice_circuit)
-        gme_circuit = self._dict_to_gme(circuit_dict, self.active_node)
-        return gme_circuit
+        return self._create_gme_circuit_from_dict(
+            self._circuit_to_dict(pyspice_circuit)
+        )
 
-    def _pyspice_circuit_to_dict(self, spice_ckt: Union[Circuit, SubCircuit]) -> dict:
+    def _create_gme_circuit_from_dict(self, circuit_dict: dict) -> dict:
+        """From a given circuit dict, create a GME Circuit"""
+        # The element ids are only unique within a circuit (dict)
+        self._pyspice_id_to_gme_node = {}
+        self._pin_index = {}
+        self._connected_pins = DisjointSet()
+        self._pin_set_ids = {}
+        return self._dict_to_gme(circuit_dict, self.active_node)
+
+    @staticmethod
+    def _pyspice_circuit_to_dict(spice_ckt: Union[Circuit, SubCircuit]) -> dict:
         """Recursively build a dictionary of elements and pins for the circuit to a dictionary"""
         circuit_dict = {
             "type": "Circuit",
@@ -190,8 +401,8 @@ class ConvertNetlistToCircuit(PluginBase):
             "name": spice_ckt.title
             if isinstance(spice_ckt, Circuit)
             else spice_ckt.name,
-            "elements": self._get_elements_for(spice_ckt),
-            "nodes": self._get_element_nodes_for(spice_ckt),
+            "elements": ConvertNetlistToCircuit._get_elements_for(spice_ckt),
+            "nodes": ConvertNetlistToCircuit._get_element_nodes_for(spice_ckt),
             "subcircuits": [],
             "pins": [],
         }
@@ -216,7 +427,7 @@ class ConvertNetlistToCircuit(PluginBase):
                     circuit_dict["nodes"][node_id] = [pin_node_info]
 
         for sub_ckt in spice_ckt.subcircuits:
-            sub_ckt_dict = self._pyspice_circuit_to_dict(sub_ckt)
+            sub_ckt_dict = ConvertNetlistToCircuit._pyspice_circuit_to_dict(sub_ckt)
             circuit_dict["subcircuits"].append(sub_ckt_dict)
 
         for subckt_dict in circuit_dict["subcircuits"]:
@@ -226,11 +437,36 @@ class ConvertNetlistToCircuit(PluginBase):
 
         return circuit_dict
 
+    @staticmethod
+    def _circuit_dict_to_graph(circuit_dict: dict) -> CircuitGraph:
+        """Return the `CircuitGraph` of a circuit dict, as it is created in WebGME
+
+        The elements are typed by their META types and their pins are named after the
+        pins of these (so the sensing sources of the current controlled sources are
+        folded into them).
+        """
+        graph = CircuitGraph.from_elements(
+            circuit_dict["name"],
+            (
+                (
+                    element["name"],
+                    element["type"],
+                    [(pin["name"], pin["node"]) for pin in element["pins"]],
+                    "",
+                )
+                for element in circuit_dict["elements"]
+            ),
+            ports=[pin["node"] for pin in circuit_dict["pins"]],
+        )
+        graph.subcircuits = [
+            ConvertNetlistToCircuit._circuit_dict_to_graph(subckt_dict)
+            for subckt_dict in circuit_dict["subcircuits"]
+        ]
+        return graph
+
     def _dict_to_gme(self, circuit_dict: dict, parent_ckt: dict) -> None:
         """Convert PySpice circuit into WebGME Circuit"""
-        gme_ckt_node = self.core.create_child(
-            parent_ckt, self.META[circuit_dict["type"]]
-        )
+        gme_ckt_node = self._create_child(parent_ckt, self.META[circuit_dict["type"]])
 
         self.core.set_attribute(
             gme_ckt_node, "name", name := (circuit_dict["name"] or "Circuit")
@@ -239,105 +475,123 @@ class ConvertNetlistToCircuit(PluginBase):
         self._pyspice_id_to_gme_node[circuit_dict["id"]] = gme_ckt_node
 
         self._generate_positions = self.get_position_generator()
+        # The positions of the pins, elements and sub-circuits, in this order
+        next_position = iter(self._get_layout(circuit_dict)).__next__
 
-        self._add_external_pins(gme_ckt_node, circuit_dict["pins"])
+        self._add_external_pins(
+            gme_ckt_node, circuit_dict["pins"], circuit_dict["id"], next_position
+        )
 
         for element in circuit_dict["elements"]:
-            element_node = self.core.create_child(
-                gme_ckt_node, self.META[element["type"]]
-            )
+            element_node = self._create_child(gme_ckt_node, self.META[element["type"]])
 
-            self.core.set_registry(element_node, "position", self._generate_positions())
+            self.core.set_registry(element_node, "position", next_position())
             self.core.set_attribute(element_node, "name", name := element["name"])
             self._pyspice_id_to_gme_node[element["id"]] = element_node
             self.logger.debug(
-                f"Added node of type {element['type']} ({self.core.get_path(element_node)}) "
+                f"Added node of type {element['type']} ({element_node['nodePath']}) "
                 f"named {name}"
             )
 
             if element["type"] == "Circuit":
-                self._add_external_pins(element_node, element["pins"])
+                self._add_external_pins(element_node, element["pins"], element["id"])
+            else:
+                self._index_element_pins(element_node, element["type"], element["id"])
 
         for sub_ckt in circuit_dict["subcircuits"]:
-            self._dict_to_gme(sub_ckt, gme_ckt_node)
+            self._set_position(self._dict_to_gme(sub_ckt, gme_ckt_node), next_position)
 
         for pins in circuit_dict["nodes"].values():
             self._add_wires(pins, gme_ckt_node)
 
         return gme_ckt_node
 
-    def _add_external_pins(self, circuit: dict, pins: List[dict]) -> None:
-        """Add external pins to the GME Circuit"""
+    def _add_external_pins(
+        self,
+        circuit: dict,
+        pins: List[dict],
+        element_id: int,
+        position_generator: Optional[Callable] = None,
+    ) -> None:
+        """Add external pins to the GME Circuit (the element `element_id`)"""
         for pin in pins:
-            pin_node = self.core.create_child(circuit, self.META["Pin"])
+            pin_node = self._create_child(circuit, self.META["Pin"])
             self.core.set_attribute(pin_node, "name", pin["name"])
+            pin_path = pin_node["nodePath"]
+            self._pin_index[(element_id, pin["name"])] = (pin_node, pin_path)
             self.logger.debug(
-                f"Added node of type Pin ({self.core.get_path(pin_node)}) "
-                f"named {pin['name']}, Parent Id: {self.core.get_path(circuit)}"
+                f"Added node of type Pin ({pin_path}) "
+                f"named {pin['name']}, Parent Id: {circuit['nodePath']}"
             )
 
-            self._set_position(pin_node)
-
-    def _add_wires(self, pins: List[dict], gme_circuit: dict) -> None:
-        """Add Wires between connected pins"""
-        if not pins:
-            return
-        # Remove self loops
-        connected_pins = (
-            (src, dst)
-            for src, dst in itertools.product(pins, pins)
-            if pins.index(src) != pins.index(dst)
-        )
-
-        for src, dst in connected_pins:
-            try:
-                src_element = self._pyspice_id_to_gme_node[src["element_id"]]
-                src_pin = self._get_pin_by_name(src_element, src["pin_name"])
-                dst_element = self._pyspice_id_to_gme_node[dst["element_id"]]
-                dst_pin = self._get_pin_by_name(dst_element, dst["pin_name"])
-                if not self._path_exists(src_pin, dst_pin):
-                    wire = self.core.create_child(gme_circuit, self.META["Wire"])
-                    self._add_to_adjacency(src_pin, dst_pin)
-                    self.core.set_pointer(wire, "src", src_pin)
-                    self.core.set_pointer(wire, "dst", dst_pin)
-
-                    self.logger.debug(
-                        f"Added Wire ({self.core.get_path(wire)}) between "
-                        f"nodes ({self.core.get_path(src_pin)}, {self.core.get_path(dst_pin)})"
-                    )
+            self._set_position(pin_node, position_generator)
 
-            except KeyError:  # Some nodes `src` and `dst` might not exist yet
-                pass
+    def _index_element_pins(
+        self, element_node: dict, meta_type: str, element_id: int
+    ) -> None:
+        """Add the pins of a newly created element to the pin index
+
+        The pins are inherited from the META node of the element, so they have the same
+        relative ids as the pins of the META node and can be indexed without loading
+        the children of every element.
+        """
+        if meta_type not in self._meta_pin_relids:
+            self._meta_pin_relids[meta_type] = {
+                self.core.get_attribute(pin, "name"): self.core.get_relid(pin)
+                for pin in self._get_children_of_type(self.META[meta_type], "Pin")
+            }
 
-    def _add_to_adjacency(self, src: dict, dst: dict) -> None:
-        """Add connected pins to adjacency list"""
-        if not self._connected_pins.get(src_id := self.core.get_path(src)):
-            self._connected_pins[src_id] = {src_id}
+        for pin_name, relid in self._meta_pin_relids[meta_type].items():
+            pin_path = f"{element_node['nodePath']}/{relid}"
+            pin_node = {"rootId": element_node["rootId"], "nodePath": pin_path}
+            self._pin_index[(element_id, pin_name)] = (pin_node, pin_path)
 
-        self._connected_pins[src_id].add(dst_id := self.core.get_path(dst))
+    def _add_wires(self, pins: List[dict], gme_circuit: dict) -> None:
+        """Add Wires between connected pins
+
+        The pins are wired to the first pin of the net (a star), skipping the pins
+        which are already connected to it, so a net of k pins gets at most k-1 wires.
+        """
+        gme_pins = [
+            self._pin_index[(pin["element_id"], pin["pin_name"])]
+            for pin in pins
+            # Some elements might not exist yet
+            if pin["element_id"] in self._pyspice_id_to_gme_node
+        ]
 
-        if not self._connected_pins.get(dst_id):
-            self._connected_pins[dst_id] = {dst_id}
+        if not gme_pins:
+            return
 
-        self._connected_pins[dst_id].add(src_id)
+        (src_pin, src_id), *dst_pins = gme_pins
+        for dst_pin, dst_id in dst_pins:
+            if not self._path_exists(src_id, dst_id):
+                wire = self._create_child(gme_circuit, self.META["Wire"])
+                self._add_connection(src_id, dst_id)
+                self.core.set_pointer(wire, "src", src_pin)
+                self.core.set_pointer(wire, "dst", dst_pin)
+
+                self.logger.debug(
+                    f"Added Wire ({self.core.get_path(wire)}) between "
+                    f"nodes ({src_id}, {dst_id})"
+                )
 
-    def _path_exists(self, pin1: dict, pin2: dict) -> bool:
-        """Check if the pins are connected by a wire"""
-        exists = False
+    def _add_connection(self, src_id: str, dst_id: str) -> None:
+        """Merge the sets of pins connected to the pins `src_id` and `dst_id`"""
+        self._connected_pins.union(
+            self._get_pin_set_id(src_id), self._get_pin_set_id(dst_id)
+        )
 
-        if all(
-            [
-                (pin1_id := self.core.get_path(pin1)) in self._connected_pins,
-                (pin2_id := self.core.get_path(pin2)) in self._connected_pins,
-            ]
-        ):
-            exists = bool(
-                self._connected_pins[pin1_id].intersection(
-                    self._connected_pins[pin2_id]
-                )
-            )
+    def _path_exists(self, pin1_id: str, pin2_id: str) -> bool:
+        """Check if the pins are connected by a (path of) wire(s)"""
+        pin1_set = self._connected_pins.find(self._get_pin_set_id(pin1_id))
+        pin2_set = self._connected_pins.find(self._get_pin_set_id(pin2_id))
+        return pin1_set == pin2_set
 
-        return exists
+    def _get_pin_set_id(self, pin_id: str) -> int:
+        """Return the id of the pin `pin_id` in `_connected_pins`, adding it if needed"""
+        if (set_id := self._pin_set_ids.get(pin_id)) is None:
+            set_id = self._pin_set_ids[pin_id] = self._connected_pins.add()
+        return set_id
 
     def _set_position(
         self, node: dict, position_generator: Optional[Callable] = None
@@ -346,23 +600,8 @@ class ConvertNetlistToCircuit(PluginBase):
         if position_generator is None:
             position_generator = self._generate_positions
 
-        self.core.set_registry(node, "position", position_generator())
-        self.logger.debug(
-            f"Set position of node ({self.core.get_path(node)}) "
-            f"to {self.core.get_registry(node, 'position')}"
-        )
-
-    def _get_pin_by_name(self, element_node, pin_name):
-        """Get an element pin by its name"""
-        return list(
-            filter(
-                lambda node: (
-                    self.core.is_type_of(node, self.META["Pin"])
-                    and self.core.get_attribute(node, "name") == pin_name
-                ),
-                self.core.load_children(element_node),
-            )
-        ).pop()
+        self.core.set_registry(node, "position", position := position_generator())
+        self.logger.debug(f"Set position of node ({node['nodePath']}) to {position}")
 
     def _get_children_of_type(self, node: dict, type_: str) -> List[dict]:
         """Get Children of specific type for this GMENode"""
@@ -373,16 +612,45 @@ class ConvertNetlistToCircuit(PluginBase):
             )
         )
 
-    def _commit_results(self, start_commit: List[str]) -> None:
-        """Commit the nodes created by this plugin"""
+    def _create_child(self, parent: dict, meta_node: dict) -> dict:
+        """Create a node, counting the nodes created since the last commit"""
+        self._num_uncommitted_nodes += 1
+        return self.core.create_child(parent, meta_node)
+
+    def _is_chunk_complete(self) -> bool:
+        """Whether the circuits created since the last commit should be committed
+
+        That is every `commit_every` circuits or, if `commit_max_objects` is set, once
+        the nodes created since the last commit exceed it. Every created node is a new
+        object of the commit (along with their few, modified ancestors), so the chunks
+        are bounded without persisting each circuit.
+        """
+        if not self._num_uncommitted:
+            return False
+        if self._commit_every and self._num_uncommitted >= self._commit_every:
+            return True
+        if self._commit_max_objects:
+            return self._num_uncommitted_nodes >= self._commit_max_objects
+        return False
+
+    def _commit_results(
+        self, start_commit: List[str], message: str = "Successfully created the circuit"
+    ) -> str:
+        """Commit the nodes created by this plugin (since the last commit)
+
+        Returns the hash of the commit.
+        """
         persisted = self.core.persist(self.active_node)
         commit_result = self.project.make_commit(
             self.branch_name,
             start_commit,
             persisted["rootHash"],
             persisted["objects"],
-            "Successfully created the circuit",
+            message,
         )
+        self._num_uncommitted = 0
+        self._num_uncommitted_nodes = 0
+        self._num_commits += 1
 
         self.project.set_branch_hash(
             self.branch_name,
@@ -390,16 +658,48 @@ class ConvertNetlistToCircuit(PluginBase):
             self.project.get_branch_hash(self.branch_name),
         )
 
-        self.create_message(
-            self.active_node,
-            self.core.get_path(self.active_node),
-            self.core.get_children_paths(self.active_node),
-        )
-
         self.logger.info(
-            f"Successfully committed results to branch {self.branch_name}. "
-            f'The hash is {commit_result["hash"]}'
+            f"Successfully committed results to branch {self.branch_name} "
+            f'({message}). The hash is {commit_result["hash"]}'
+        )
+        return commit_result["hash"]
+
+    def _get_import_progress(
+        self, netlist_hash: str
+    ) -> Tuple[int, List[Tuple[str, str]]]:
+        """Return the number of netlists already imported by an unfinished import
+
+        Along with the (filename, error) of the netlists which failed to import so far,
+        to be reported once the import is finished. The progress of the chunked imports
+        is kept in the registry of the folder, by the hash of the input netlist (or zip
+        file), and committed along with the circuits, so that it always matches the
+        committed circuits.
+        """
+        progress = self.core.get_registry(self.active_node, IMPORT_PROGRESS_REGISTRY)
+        progress = (progress or {}).get(netlist_hash, {})
+        failures = [tuple(failure) for failure in progress.get("failures", [])]
+        return progress.get("imported", 0), failures
+
+    def _set_import_progress(
+        self,
+        netlist_hash: str,
+        num_imported: Optional[int],
+        failures: List[Tuple[str, str]],
+    ) -> None:
+        """Record the number of netlists imported (None once the import is finished)"""
+        progress = dict(
+            self.core.get_registry(self.active_node, IMPORT_PROGRESS_REGISTRY) or {}
         )
+        if num_imported is None:
+            if netlist_hash not in progress:
+                return
+            del progress[netlist_hash]
+        else:
+            progress[netlist_hash] = {
+                "imported": num_imported,
+                "failures": [list(failure) for failure in failures],
+            }
+        self.core.set_registry(self.active_node, IMPORT_PROGRESS_REGISTRY, progress)
 
     def _fail(self, err: str) -> None:
         """Add `err` to error message and fail"""
@@ -412,9 +712,29 @@ class ConvertNetlistToCircuit(PluginBase):
         """Returns metadata for given artifact hash from webGME BlobStorage"""
         return self._send({"name": "getMetadata", "args": [artifact_hash]})
 
-    def _get_zip_file_contents(self, artifact_hash: str) -> dict:
-        """Returns contents of a zip file from the WebGME BlobStorage as text"""
-        return self._send({"name": "getZipFileContents", "args": [artifact_hash]})
+    def _get_zip_file_names(self, artifact_hash: str) -> List[str]:
+        """Returns the names of the files in a zip file from the WebGME BlobStorage"""
+        return self._send({"name": "getZipFileNames", "args": [artifact_hash]})
+
+    def _iter_zip_file_contents(
+        self, artifact_hash: str, filenames: List[str]
+    ) -> Iterator[Tuple[str, str]]:
+        """Yields the contents (as text) of the files in a zip file, one at a time
+
+        The files are requested (and decompressed) in batches of `ZIP_BATCH_SIZE`, so
+        that only a few of them are in memory at once. The zip file is released by the
+        plugin once the last batch is read (or the import stops).
+        """
+        try:
+            for start in range(0, len(filenames), ZIP_BATCH_SIZE):
+                end = start + ZIP_BATCH_SIZE
+                batch = filenames[start:end]
+                contents = self._send(
+                    {"name": "getZipFileEntries", "args": [artifact_hash, batch]}
+                )
+                yield from zip(batch, contents)
+        finally:
+            self._send({"name": "releaseZipFile", "args": [artifact_hash]})
 
     @staticmethod
     def _get_elements_for(spice_ckt: Union[Circuit, SubCircuit]) -> List:
@@ -469,7 +789,7 @@ class ConvertNetlistToCircuit(PluginBase):
                             "node": 0,
                         }
                     ],
-                    "id": GROUND_NODE_ID,
+                    "id": ConvertNetlistToCircuit._get_ground_id(spice_ckt),
                 }
             )
             # fmt: on
@@ -483,47 +803,218 @@ class ConvertNetlistToCircuit(PluginBase):
         """Return elements in this circuit"""
         nodes = {}
 
+        # The (current) controlled sources, by the name of their controlling source
+        controlled_sources = {}
+        for element in spice_ckt.elements:
+            if hasattr(element, "source"):
+                controlled_sources.setdefault(element.source, []).append(element)
+
         for node in spice_ckt.nodes:
             nodes[node.name] = []
             for pin in node.pins:
-                nodes[node.name].append(
-                    {
-                        "element_id": id(pin.element),
-                        "pin_name": pyspice_to_gme_pins.get(pin.name, pin.name) + "2"
-                        if pin.element.__alias__ in ("F", "H")
-                        else pyspice_to_gme_pins.get(pin.name, pin.name),
-                    }
-                )
+                pin_name = pyspice_to_gme_pins.get(pin.name, pin.name)
+                if pin.element.__alias__ in ("F", "H"):
+                    pin_name += "2"
+
+                # The pins of a controlling voltage source are the (input) pins of
+                # the controlled sources, which replace it
+                controlled = None
                 if pin.element.__alias__ == "V":
-                    for element in spice_ckt.elements:
-                        if hasattr(element, "source") and pin.element.name[
-                            1:
-                        ] == getattr(element, "source"):
-                            nodes[node.name][-1]["element_id"] = id(element)
-                            nodes[node.name][-1]["pin_name"] += "1"
+                    controlled = controlled_sources.get(pin.element.name[1:])
+
+                if controlled:
+                    for element in controlled:
+                        nodes[node.name].append(
+                            {"element_id": id(element), "pin_name": pin_name + "1"}
+                        )
+                else:
+                    nodes[node.name].append(
+                        {"element_id": id(pin.element), "pin_name": pin_name}
+                    )
 
         if spice_ckt.has_ground_node():
             if not nodes.get("0"):
                 nodes["0"] = []
 
-            nodes["0"].append({"element_id": GROUND_NODE_ID, "pin_name": "p"})
+            nodes["0"].append(
+                {
+                    "element_id": ConvertNetlistToCircuit._get_ground_id(spice_ckt),
+                    "pin_name": "p",
+                }
+            )
 
         return nodes
 
+    @staticmethod
+    def _get_ground_id(spice_ckt: Union[Circuit, SubCircuit]) -> str:
+        """Return the element id of the Ground of a circuit
+
+        Every (sub-)circuit gets its own Ground, so its id must be unique across the
+        circuit dict.
+        """
+        return f"{id(spice_ckt)}/GND"
+
     @staticmethod
     def _remove_cc_sources(sources_list: List, elements: List) -> None:
         """Find and remove any voltage references to CCV Sources"""
-        src_indices = []
+        elements_by_name = {element["name"]: element for element in elements}
+        voltage_names = set()
         for source in sources_list:
-            voltage, index = find_by_key(elements, "name", source["source"])
-            source, _ = find_by_key(elements, "name", source["name"])
+            if (voltage := elements_by_name.get(source["source"])) is None:
+                raise ValueError(f"No Element with name={source['source']} found")
+            source = elements_by_name[source["name"]]
 
             for pin in voltage["pins"]:
                 source["pins"].append({"name": f"{pin['name']}1", "node": pin["node"]})
-            src_indices.append(index)
+            voltage_names.add(voltage["name"])
 
-        for index in src_indices:
-            elements.pop(index)
+        if voltage_names:
+            elements[:] = [
+                element for element in elements if element["name"] not in voltage_names
+            ]
+
+    @staticmethod
+    def _get_layout(circuit_dict: dict) -> List[dict]:
+        """Return the positions of the pins, elements and sub-circuits of a circuit dict
+
+        The circuit is laid out in layers, from its pins and sources, following its
+        nets (see `_get_layers`): every layer is placed in a column (or a few columns,
+        for the layers with more than `sqrt(n)` nodes) and ordered by the nodes of the
+        previous layer from which it was reached, so that connected nodes are close.
+        """
+        graph = CircuitGraph.from_elements(
+            circuit_dict["name"],
+            chain(
+                (
+                    (pin["name"], "Pin", [("p", pin["node"])], "")
+                    for pin in circuit_dict["pins"]
+                ),
+                (
+                    (
+                        element["name"],
+                        element["type"],
+                        [(pin["name"], pin["node"]) for pin in element["pins"]],
+                        "",
+                    )
+                    for element in circuit_dict["elements"]
+                ),
+                (
+                    (subckt_dict["name"], "Circuit", [], "")
+                    for subckt_dict in circuit_dict["subcircuits"]
+                ),
+            ),
+        )
+        is_seed = np.isin(
+            graph.element_types,
+            [
+                graph.types.index(type_name)
+                for type_name in LAYOUT_SEED_TYPES
+                if type_name in graph.types
+            ],
+        )
+        layers, order = ConvertNetlistToCircuit._get_layers(graph, is_seed)
+
+        # The rank of every node in its layer and the columns of the layers
+        num_nodes = len(layers)
+        max_rows = max(1, int(np.ceil(np.sqrt(num_nodes))))
+        sizes = np.bincount(layers)
+        ranks = np.empty(num_nodes, dtype=np.int64)
+        ranks[order] = np.arange(num_nodes) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        widths = -(-sizes // max_rows)
+        columns = np.cumsum(widths) - widths
+
+        x = LAYOUT_ORIGIN + LAYOUT_SPACING * (columns[layers] + ranks // max_rows)
+        y = LAYOUT_ORIGIN + LAYOUT_SPACING * (ranks % max_rows)
+        return [{"x": x, "y": y} for x, y in zip(x.tolist(), y.tolist())]
+
+    @staticmethod
+    def _get_layers(
+        graph: CircuitGraph, is_seed: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Assign the elements of a graph to layers, by a breadth-first search
+
+        The search starts from the seeds and follows the nets (except the ground, which
+        would connect most elements), one layer per step, with a vectorized step over
+        all the elements of a layer. The components which are not reached from the
+        seeds are searched next, from their first elements, and the elements which are
+        only connected to the ground are put in a last layer.
+
+        Returns the layer of every element and the elements ordered by layer and,
+        within a layer, by the rank of the element they were reached from.
+        """
+        num_elements = graph.num_elements
+        pin_elements = graph.pin_elements
+        net_offsets, net_pins = graph.net_pins()
+        is_followed_net = np.array(
+            [name != "0" for name in graph.net_names], dtype=bool
+        )
+        is_visited_net = ~is_followed_net
+        is_connected = np.zeros(num_elements, dtype=bool)
+        is_connected[pin_elements[is_followed_net[graph.pin_nets]]] = True
+
+        layers = np.full(num_elements, -1, dtype=np.int64)
+        order = []
+        frontier = np.flatnonzero(is_seed & is_connected)
+        while True:
+            while len(frontier):
+                layers[frontier] = len(order)
+                order.append(frontier)
+
+                # The nets of the layer, which were not visited yet, and the rank of
+                # the first element of the layer on each of them
+                pins, pin_ranks = _get_ranges(
+                    graph.pin_offsets[frontier], graph.pin_offsets[frontier + 1]
+                )
+                nets, first_pins = np.unique(graph.pin_nets[pins], return_index=True)
+                is_new = ~is_visited_net[nets]
+                nets, net_ranks = nets[is_new], pin_ranks[first_pins[is_new]]
+                is_visited_net[nets] = True
+
+                # The next layer: the elements on these nets, ordered by their rank
+                pins, pin_nets = _get_ranges(net_offsets[nets], net_offsets[nets + 1])
+                elements, ranks = pin_elements[net_pins[pins]], net_ranks[pin_nets]
+                is_new = layers[elements] < 0
+                elements, ranks = elements[is_new], ranks[is_new]
+                by_rank = np.lexsort((elements, ranks))
+                elements = elements[by_rank]
+                frontier = elements[np.sort(np.unique(elements, return_index=True)[1])]
+
+            unvisited = np.flatnonzero((layers < 0) & is_connected)
+            if not len(unvisited):
+                break
+            # Search the other components, from their first element, all at once
+            components = ConvertNetlistToCircuit._get_components(graph, is_followed_net)
+            first = np.unique(components[unvisited], return_index=True)[1]
+            frontier = unvisited[np.sort(first)]
+
+        if len(unconnected := np.flatnonzero(layers < 0)):
+            layers[unconnected] = len(order)
+            order.append(unconnected)
+
+        return layers, np.concatenate(order) if order else np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def _get_components(graph: CircuitGraph, is_followed_net: np.ndarray) -> np.ndarray:
+        """Return the connected component (its representative) of every element
+
+        The elements are connected by the nets for which `is_followed_net` is True.
+        """
+        components = DisjointSet()
+        for _ in range(graph.num_elements):
+            components.add()
+
+        net_offsets, net_pins = graph.net_pins()
+        net_elements = graph.pin_elements[net_pins].tolist()
+        net_offsets = net_offsets.tolist()
+        for net in np.flatnonzero(is_followed_net).tolist():
+            start, end = net_offsets[net] + 1, net_offsets[net + 1]
+            for element in net_elements[start:end]:
+                components.union(net_elements[start - 1], element)
+
+        return np.array(
+            [components.find(element) for element in range(graph.num_elements)],
+            dtype=np.int64,
+        )
 
     @staticmethod
     def get_position_generator(margin=200, max_width=800, alternate_positions=True):
@@ -546,58 +1037,192 @@ class ConvertNetlistToCircuit(PluginBase):
 
         return generate_positions
 
-    # Tests in Python Go here
+    def _should_validate(self, filename: str) -> bool:
+        """Whether an imported circuit is sampled for validation
+
+        A fraction `validation_rate` of the circuits is validated. The sample only
+        depends on the filenames, so that re-importing a netlist validates it again.
+        """
+        return zlib.crc32(filename.encode()) < self._validation_rate * 2**32
+
+    def _validate_import(
+        self, gme_circuit: dict, circuit_dict: dict, filename: str
+    ) -> None:
+        """Validate an imported circuit and report the differences found (if any)"""
+        errors = self.validate(gme_circuit, self._circuit_dict_to_graph(circuit_dict))
+        self.num_validated += 1
+        if errors:
+            self.num_invalid += 1
+            self.logger.warning(
+                f"Circuit {filename} is not equivalent to its netlist: {errors}"
+            )
+            self.create_message(
+                gme_circuit,
+                f"The circuit imported from {filename} is not equivalent to its "
+                f"netlist: {'; '.join(errors[:5])}"
+                + (f" (and {len(errors) - 5} more)" if len(errors) > 5 else ""),
+                "warning",
+            )
+
     def assert_valid(self, gme_circuit: dict, pyspice_circuit: Circuit) -> None:
         """Assert validity of created gme circuit"""
-        if hasattr(pyspice_circuit, "title"):
-            assert self.core.get_attribute(gme_circuit, "name") == pyspice_circuit.title
-
-        gme_subcircuits = self._get_children_of_type(gme_circuit, "Circuit")
-        sub_circuit_elements = [
-            element
-            for element in pyspice_circuit.elements
-            if isinstance(element, SubCircuitElement)
+        errors = self.validate(
+            gme_circuit,
+            self._circuit_dict_to_graph(self._circuit_to_dict(pyspice_circuit)),
+        )
+        assert not errors, "\n".join(errors)
+
+    def validate(self, gme_circuit: dict, graph: CircuitGraph) -> List[str]:
+        """Check that a created GME circuit is equivalent to its `CircuitGraph`
+
+        The children of the GME circuit and of its sub-circuit definitions (and the
+        pins of their elements) are read once and indexed by name, and the pins
+        connected by wires are merged in a disjoint set, so that a circuit is checked
+        with a number of core calls (and in a time) linear in its size. The circuit is
+        valid if it has the elements of the graph, with the same types, and its wires
+        connect the pins of every net of the graph, without connecting distinct nets.
+        As on import, the nets of a sub-circuit definition are the nets of the same
+        name in its parent, if any.
+
+        Returns the differences found, if any.
+        """
+        errors, pins, graph_pins, wires = [], {}, [], []
+        self._read_circuit(gme_circuit, graph, {}, pins, graph_pins, wires, errors)
+
+        pin_ids = {path: pin_id for pin_id, path in enumerate(pins.values())}
+        connected_pins = DisjointSet()
+        for _ in pin_ids:
+            connected_pins.add()
+        for src, dst in wires:
+            if src not in pin_ids or dst not in pin_ids:
+                errors.append(f"Wire ({src}, {dst}) is not connected to a known pin")
+            else:
+                connected_pins.union(pin_ids[src], pin_ids[dst])
+
+        # Every net of the graph is a single set of connected pins (and vice versa)
+        net_sets, set_nets = {}, {}
+        for key, net in graph_pins:
+            if (path := pins.get(key)) is None:
+                errors.append(f"Pin {key[2]} of {key[1] or key[0]} is missing")
+                continue
+            pin_set = connected_pins.find(pin_ids[path])
+            if net_sets.setdefault(net, pin_set) != pin_set:
+                errors.append(f"Net {net[1]} of {net[0]} is not connected to {path}")
+            if (other_net := set_nets.setdefault(pin_set, net)) != net:
+                errors.append(
+                    f"Nets {net[1]} of {net[0]} and {other_net[1]} of {other_net[0]} "
+                    f"are connected"
+                )
+
+        return list(dict.fromkeys(errors))
+
+    def _read_circuit(
+        self,
+        gme_circuit: dict,
+        graph: CircuitGraph,
+        parent_nets: dict,
+        pins: dict,
+        graph_pins: list,
+        wires: list,
+        errors: list,
+    ) -> None:
+        """Read a GME circuit (and its definitions) for `validate`
+
+        Adds the paths of the pins of the circuit to `pins`, keyed by the path of the
+        circuit, the name of their element (None for the external pins) and their name,
+        the pins of the graph along with their net to `graph_pins`, the wires to `wires`
+        and the elements which differ from the graph to `errors`.
+        """
+        circuit_path = gme_circuit["nodePath"]
+        if (name := self.core.get_attribute(gme_circuit, "name")) != (
+            graph.name or "Circuit"
+        ):
+            errors.append(f"Circuit {circuit_path} is named {name}, not {graph.name}")
+
+        nets = [
+            parent_nets.get(net_name, (circuit_path, net_name))
+            for net_name in graph.net_names
         ]
-        assert len(gme_subcircuits) == len(list(pyspice_circuit.subcircuits)) + len(
-            sub_circuit_elements
-        ), len(gme_subcircuits)
-
-        # Check Ground
-        if pyspice_circuit.has_ground_node():
-            assert len(self._get_children_of_type(gme_circuit, "Ground")) == 1
-
-        for wire in self._get_children_of_type(gme_circuit, "Wire"):
-            src = self.core.load_pointer(wire, "src")
-            dst = self.core.load_pointer(wire, "dst")
-            src_parent = self.core.get_parent(src)
-            dst_parent = self.core.get_parent(dst)
-            src_node = None
-            dst_node = None
-            for element in pyspice_circuit.elements:
-                if self.core.get_attribute(src_parent, "name") in element.name:
-                    for pin in element.pins:
-                        if pyspice_to_gme_pins.get(pin.name) and pyspice_to_gme_pins[
-                            pin.name
-                        ] == self.core.get_attribute(src, "name"):
-                            src_node = pin.node.name
-
-                if self.core.get_attribute(dst_parent, "name") in element.name:
-                    for pin in element.pins:
-                        if pyspice_to_gme_pins.get(pin.name) and pyspice_to_gme_pins[
-                            pin.name
-                        ] == self.core.get_attribute(dst, "name"):
-                            dst_node = pin.node.name
-
-                if src_node and dst_node:
-                    assert (
-                        src_node == dst_node
-                    ), f"Nodes Mismatch ({src_node}, {dst_node})"
-                    break
-
-        for sub_circuit in gme_subcircuits:
-            if (
-                subckt_name := self.core.get_attribute(sub_circuit, "name")
-            ) in pyspice_circuit._subcircuits:
-                self.assert_valid(
-                    sub_circuit, pyspice_circuit._subcircuits[subckt_name]
+        for index, net in enumerate(graph.ports.tolist()):
+            graph_pins.append(((circuit_path, None, f"p{index + 1}"), nets[net]))
+        pin_names = [graph.pin_names[pin] for pin in graph.pin_name_ids.tolist()]
+        pin_nets = graph.pin_nets.tolist()
+        offsets = graph.pin_offsets.tolist()
+        for index, element in enumerate(graph.elements):
+            for pin in range(offsets[index], offsets[index + 1]):
+                graph_pins.append(
+                    ((circuit_path, element.name, pin_names[pin]), nets[pin_nets[pin]])
+                )
+
+        expected_types = {
+            element.name: graph.types[type_id]
+            for element, type_id in zip(graph.elements, graph.element_types.tolist())
+        }
+        subgraphs = {
+            subgraph.name or "Circuit": subgraph for subgraph in graph.subcircuits
+        }
+        elements, definitions = {}, []
+        for child in self.core.load_children(gme_circuit):
+            meta_name = self._meta_names.get(self.core.get_meta_type(child)["nodePath"])
+            if meta_name == "Wire":
+                wires.append(
+                    (
+                        self.core.get_pointer_path(child, "src"),
+                        self.core.get_pointer_path(child, "dst"),
+                    )
+                )
+            elif meta_name == "Pin":
+                pin_name = self.core.get_attribute(child, "name")
+                pins[(circuit_path, None, pin_name)] = child["nodePath"]
+            else:
+                name = self.core.get_attribute(child, "name")
+                if name in expected_types and name not in elements:
+                    elements[name] = (child, meta_name)
+                else:
+                    definitions.append((child, name))
+
+        for name, expected_type in expected_types.items():
+            if name not in elements:
+                errors.append(f"Element {name} is missing in {circuit_path}")
+                continue
+            element, meta_name = elements[name]
+            if meta_name != expected_type:
+                errors.append(f"Element {name} is a {meta_name}, not a {expected_type}")
+            for pin in self.core.load_children(element):
+                pin_name = self.core.get_attribute(pin, "name")
+                pins[(circuit_path, name, pin_name)] = pin["nodePath"]
+
+        nets = dict(zip(graph.net_names, nets))
+        for child, name in definitions:
+            if (subgraph := subgraphs.pop(name, None)) is None:
+                errors.append(f"Unexpected node {name} ({child['nodePath']})")
+            else:
+                self._read_circuit(
+                    child, subgraph, nets, pins, graph_pins, wires, errors
                 )
+        for name in subgraphs:
+            errors.append(f"Sub-circuit {name} is missing in {circuit_path}")
+
+
+def _get_ranges(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the concatenation of the ranges [starts[i], ends[i]) and their indices i"""
+    lengths = ends - starts
+    indices = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) + (starts - offsets)[indices], indices
+
+
+def parse_netlist(
+    filename: str, netlist: str
+) -> Tuple[str, Optional[dict], Optional[str]]:
+    """Parse a netlist into a (picklable) circuit dict, in a worker process
+
+    Returns the filename, the circuit dict and the error message, if the netlist
+    could not be parsed.
+    """
+    try:
+        # Not named after the file, so that the circuit dict only depends on the netlist
+        pyspice_circuit = ConvertNetlistToCircuit._netlist_to_pyspice_circuit(netlist)
+        return filename, ConvertNetlistToCircuit._circuit_to_dict(pyspice_circuit), None
+    except Exception as e:
+        return filename, None, str(e)
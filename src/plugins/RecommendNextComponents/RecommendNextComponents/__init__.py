@@ -1,8 +1,18 @@
+import gc
+import hashlib
 import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from importlib.util import module_from_spec, spec_from_file_location
+from itertools import chain
 from os import path
 from pathlib import Path
-from typing import Union
+from types import ModuleType
+from typing import Dict, List, Tuple, Union
 
 from PySpice.Spice.Netlist import Circuit, SubCircuit
 
@@ -12,6 +22,16 @@ BASE_PLUGIN_PATH = Path(
     f"{script_dir}/../../../common/plugins/CircuitAnalysisBases.py"
 ).resolve()
 IMPORT_MODULE_NAME = "electric_circuits.plugin_bases"
+MODEL_MEMORY_BUDGET = (
+    float(os.environ.get("RECOMMENDATION_MODEL_MEMORY_BUDGET", 1024)) * 1024 * 1024
+)
+RECOMMENDATION_CACHE_DIR = os.environ.get(
+    "RECOMMENDATION_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "electric-circuits-recommendations"),
+)
+RECOMMENDATION_CACHE_SIZE = (
+    float(os.environ.get("RECOMMENDATION_CACHE_SIZE", 64)) * 1024 * 1024
+)
 
 
 def import_from_path(path, module_name):
@@ -21,8 +41,18 @@ def import_from_path(path, module_name):
     return module
 
 
-base_module = import_from_path(BASE_PLUGIN_PATH, IMPORT_MODULE_NAME)
+if IMPORT_MODULE_NAME in sys.modules:
+    base_module = sys.modules[IMPORT_MODULE_NAME]
+else:
+    base_module = import_from_path(BASE_PLUGIN_PATH, IMPORT_MODULE_NAME)
+    sys.modules[IMPORT_MODULE_NAME] = base_module
+
 AnalyzeCircuitPlugin = getattr(base_module, "AnalyzeCircuit")
+CircuitGraph = getattr(base_module, "CircuitGraph")
+DiskCache = getattr(base_module, "DiskCache")
+NetlistCache = getattr(base_module, "NetlistCache")
+PySpiceConversionError = getattr(base_module, "PySpiceConversionError")
+get_canonical_form = getattr(base_module, "get_canonical_form")
 
 PYSPICE_TO_GME_TYPE = {
     "SubCircuitElement": "Circuit",
@@ -65,20 +95,309 @@ def load_model(name):
     return model
 
 
+def get_model_fingerprint(name: str) -> str:
+    """Returns a hash of the files of the model `name` (names, sizes and mtimes)
+
+    The helpers shared by the models (models/utils.py) count as files of every model.
+    """
+    models_dir = Path(f"{script_dir}/models").resolve()
+    model_dir = models_dir / name
+    files = sorted(
+        file
+        for file in chain(model_dir.rglob("*"), [models_dir / "utils.py"])
+        if file.is_file() and "__pycache__" not in file.parts
+    )
+    stats = [
+        (str(file.relative_to(models_dir)), stat.st_size, stat.st_mtime_ns)
+        for (file, stat) in ((file, file.stat()) for file in files)
+    ]
+    return hashlib.sha256(json.dumps(stats).encode()).hexdigest()
+
+
+def get_model_mtime(name: str) -> Tuple[int, int]:
+    """Returns the modification times of the directory of the model `name` and utils.py
+
+    A cheap check for changes of the model: adding, removing or replacing a file of the
+    model (e.g. moving a new checkpoint in place) updates the time of its directory.
+    """
+    models_dir = Path(f"{script_dir}/models").resolve()
+    return (
+        (models_dir / name).stat().st_mtime_ns,
+        (models_dir / "utils.py").stat().st_mtime_ns,
+    )
+
+
+def get_memory_footprint(value, visited: set = None) -> int:
+    """Returns the size (in bytes) of the arrays and tensors held by `value`
+
+    Arrays (`nbytes`) and tensors (`element_size() * nelement()`) are counted once,
+    along with those of modules (their `state_dict()`) and of dicts, lists and tuples.
+    """
+    visited = set() if visited is None else visited
+    if id(value) in visited or isinstance(value, (type, ModuleType)):
+        return 0
+    visited.add(id(value))
+
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        return value.element_size() * value.nelement()
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if callable(getattr(value, "state_dict", None)):
+        return get_memory_footprint(dict(value.state_dict()), visited)
+    if isinstance(value, dict):
+        return sum(get_memory_footprint(item, visited) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(get_memory_footprint(item, visited) for item in value)
+    return 0
+
+
+class ModelStats:
+    __slots__ = ("load_time", "memory", "fingerprint", "mtime", "hits")
+
+    def __init__(
+        self, load_time: float, memory: int, fingerprint: str, mtime: Tuple[int, int]
+    ) -> None:
+        self.load_time = load_time
+        self.memory = memory
+        self.fingerprint = fingerprint
+        self.mtime = mtime
+        self.hits = 0
+
+
+class ModelRegistry:
+    """A (thread-safe) registry of the loaded models, which evicts the least recently used
+
+    Every model is loaded once per process and shared by the requests, which must not
+    modify it. The memory footprint of a model is estimated from the arrays and tensors
+    of its module (see `get_memory_footprint`). When the total exceeds `memory_budget`
+    (in bytes), the least recently used models are evicted, except for the one requested.
+    The load time and footprint of every loaded model are kept in `stats`, along with
+    the fingerprint of its files, taken when it is loaded: a model is loaded again when
+    its files change. The files are only fingerprinted again when the modification time
+    of the model's directory changes or when a reload is requested.
+    """
+
+    def __init__(self, memory_budget: float = MODEL_MEMORY_BUDGET) -> None:
+        self.memory_budget = memory_budget
+        self.stats: Dict[str, ModelStats] = {}
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._models
+
+    @property
+    def memory(self) -> int:
+        """The memory footprint (in bytes) of the models currently loaded"""
+        return sum(self.stats[name].memory for name in self._models)
+
+    def get(self, name: str, reload: bool = False) -> ModuleType:
+        """Return the model `name`, loading it (and evicting others) if needed
+
+        If `reload`, the files of a loaded model are checked for changes (e.g. files
+        modified in place, which don't change the modification time of its directory).
+        """
+        with self._lock:
+            mtime = get_model_mtime(name)
+            if name in self._models:
+                stats = self.stats[name]
+                if (not reload and stats.mtime == mtime) or (
+                    stats.fingerprint == get_model_fingerprint(name)
+                ):
+                    stats.mtime = mtime
+                    stats.hits += 1
+                    self._models.move_to_end(name)
+                    return self._models[name]
+
+            self._models.pop(name, None)
+            fingerprint = get_model_fingerprint(name)
+            start = time.perf_counter()
+            model = load_model(name)
+            load_time = time.perf_counter() - start
+            self.stats[name] = ModelStats(
+                load_time, get_memory_footprint(vars(model)), fingerprint, mtime
+            )
+            self._models[name] = model
+
+            evicted = False
+            while len(self._models) > 1 and self.memory > self.memory_budget:
+                self._models.popitem(last=False)
+                evicted = True
+            if evicted:
+                gc.collect()
+
+            return model
+
+
+class RecommendationCache(DiskCache):
+    """An on-disk LRU cache of the recommendations of the models, keyed by the circuits
+
+    The key of an entry is the model (its name and the fingerprint of its files, see
+    `get_model_fingerprint`) and the canonical form of the circuit (see
+    `get_canonical_form`). Relabeling the circuit (or its elements) thus hits the
+    cache, and changing a model (e.g. its checkpoint) misses it. The pins on the nodes
+    of the circuit are stored as `{"node": <canonical index>}`.
+    """
+
+    # Bump when the format of the recommendations changes, to invalidate the cache
+    VERSION = 2
+
+    def get_key(
+        self, model_key: str, circuit: Union[Circuit, SubCircuit]
+    ) -> Tuple[str, List[str]]:
+        """Returns the key of the recommendations for `circuit` and its nodes (in order)"""
+        form, nodes = get_canonical_form(circuit)
+        return f"{model_key}\n{form}", list(nodes)
+
+    def _get_name(self, key: Tuple[str, List[str]]) -> str:
+        return key[0]
+
+    def _dump(self, key: Tuple[str, List[str]], recommendations: list) -> list:
+        node_indices = {node: i for (i, node) in enumerate(key[1])}
+        return [
+            (
+                [
+                    {
+                        **node,
+                        "pins": [
+                            {"node": node_indices[pin]} if pin in node_indices else pin
+                            for pin in node.get("pins", [])
+                        ],
+                    }
+                    for node in new_nodes
+                ],
+                prob,
+            )
+            for (new_nodes, prob) in recommendations
+        ]
+
+    def _load(self, key: Tuple[str, List[str]], recommendations: list) -> list:
+        nodes = key[1]
+        return [
+            (
+                [
+                    {
+                        **node,
+                        "pins": [
+                            nodes[pin["node"]] if isinstance(pin, dict) else pin
+                            for pin in node.get("pins", [])
+                        ],
+                    }
+                    for node in new_nodes
+                ],
+                prob,
+            )
+            for (new_nodes, prob) in recommendations
+        ]
+
+
+# Kept for the lifetime of the process, so that the (python plugin) worker only loads
+# every model once
+MODEL_REGISTRY = ModelRegistry()
+RECOMMENDATION_CACHE = RecommendationCache(
+    RECOMMENDATION_CACHE_DIR, RECOMMENDATION_CACHE_SIZE
+)
+
+
 def sort_dict(d):
     sorted_keys = sorted(d.items(), key=lambda k: -k[1])
     return dict(sorted_keys)
 
 
 class RecommendNextComponents(AnalyzeCircuitPlugin):
-    """Runs a mock implementation for recommending components to be added to the Circuit"""
+    """Runs a mock implementation for recommending components to be added to the Circuit
+
+    When run on an ElectricCircuitsFolder (or a selection of Circuits), the components
+    are recommended for all the Circuits at once and written to a single file, keyed by
+    the path of the Circuits.
+    """
+
+    def main(self) -> None:
+        circuit_paths = self.get_selected_circuit_paths()
+        if circuit_paths:
+            self._recommend_for_circuits(circuit_paths)
+            self.result_set_success(True)
+        else:
+            super().main()
 
     def run_analytics(
         self, circuit: Union[Circuit, SubCircuit], pin_labels: dict
     ) -> None:
-        model_name = self.get_current_config().get("model")
-        model = load_model(model_name)
-        recommendations = model.analyze(circuit)
+        (recommendations,) = self._recommend([circuit], [pin_labels])
+        self.add_file("recommendations.json", json.dumps(recommendations, indent=2))
+
+    def _recommend_for_circuits(self, circuit_paths: List[str]) -> None:
+        circuits, pin_labels, recommended_paths = [], [], []
+        cache = NetlistCache()
+        for circuit_path in circuit_paths:
+            node = self.core.load_by_path(self.root_node, circuit_path)
+            try:
+                circuits.append(self.convert_to_pyspice(node, cache=cache))
+            except PySpiceConversionError as e:
+                error = f"Could not convert the circuit ({circuit_path}): {e}"
+                self._log_error(error)
+                self.create_message(node, error, "error")
+                continue
+            pin_labels.append(self.pin_labels)
+            recommended_paths.append(circuit_path)
+
+        recommendations = self._recommend(circuits, pin_labels)
+        self.add_file(
+            "recommendations.json",
+            json.dumps(dict(zip(recommended_paths, recommendations)), indent=2),
+        )
+        self._log_info(
+            f"Recommended components for {len(circuits)} of {len(circuit_paths)} circuits"
+        )
+
+    def _recommend(
+        self, circuits: List[Union[Circuit, SubCircuit]], pin_labels: List[dict]
+    ) -> List[list]:
+        """Recommend components for the circuits, with a single run of the model
+
+        Only the circuits whose recommendations aren't cached are analyzed. Models
+        which cannot analyze many circuits at once (no `analyze_all`) are run on every
+        circuit in turn.
+        """
+        config = self.get_current_config()
+        model_name = config.get("model")
+        model = MODEL_REGISTRY.get(model_name, reload=config.get("reload_model", False))
+        stats = MODEL_REGISTRY.stats[model_name]
+        self._log_info(
+            f"{'Reused' if stats.hits else 'Loaded'} model {model_name} "
+            f"(loaded in {stats.load_time:.3f}s, {stats.memory / 2 ** 20:.1f}MB)"
+        )
+
+        model_key = f"{model_name}/{stats.fingerprint}"
+        keys = [
+            RECOMMENDATION_CACHE.get_key(model_key, circuit) for circuit in circuits
+        ]
+        results = [RECOMMENDATION_CACHE.get(key) for key in keys]
+        missed = [i for (i, result) in enumerate(results) if result is None]
+        self._log_info(
+            f"Recommendation cache hits: {len(circuits) - len(missed)}, "
+            f"misses: {len(missed)}"
+        )
+
+        circuits = [circuits[i] for i in missed]
+        graphs = [CircuitGraph.from_pyspice(circuit) for circuit in circuits]
+        if hasattr(model, "analyze_all"):
+            analyzed = model.analyze_all(circuits, graphs) if circuits else []
+        else:
+            analyzed = [
+                model.analyze(circuit, graph)
+                for circuit, graph in zip(circuits, graphs)
+            ]
+        for (i, recommendations) in zip(missed, analyzed):
+            RECOMMENDATION_CACHE.put(keys[i], recommendations)
+            results[i] = recommendations
+
+        return [
+            self._resolve_recommendations(recommendations, labels)
+            for recommendations, labels in zip(results, pin_labels)
+        ]
+
+    def _resolve_recommendations(self, recommendations: list, pin_labels: dict) -> list:
         valid_recommendations = (
             (nodes, prob)
             for (nodes, prob) in recommendations
@@ -88,8 +407,7 @@ class RecommendNextComponents(AnalyzeCircuitPlugin):
             ([self._resolve_node(n, pin_labels) for n in nodes], p)
             for (nodes, p) in valid_recommendations
         ]
-        recommendations = sorted(recommendations, key=lambda k: -k[1])
-        self.add_file("recommendations.json", json.dumps(recommendations, indent=2))
+        return sorted(recommendations, key=lambda k: -k[1])
 
     def _resolve_node(self, node: dict, pin_labels: dict) -> str:
         inverse_pin_labels = {v: k for (k, v) in pin_labels.items()}
@@ -1,32 +1,40 @@
-from collections import Counter
 from itertools import chain
 from typing import Union
 
 from PySpice.Spice.Netlist import Circuit, SubCircuit
 
 
-def new_element(element_cls, circuit: Union[Circuit, SubCircuit]):
-    existing = next((element for element in all_elements(circuit)))
+def new_element(type_name: str, graph):
+    existing, index = next(
+        (
+            (subgraph, index)
+            for subgraph in all_graphs(graph)
+            for index, type_id in enumerate(subgraph.element_types.tolist())
+            if subgraph.types[type_id] != subgraph.INSTANCE_TYPE
+        ),
+        (graph, None),
+    )
+    if index is None:
+        return {"type": type_name, "pins": []}
+
+    start, end = existing.pin_offsets[index], existing.pin_offsets[index + 1]
     return {
-        "type": element_cls.__name__,
-        "pins": [pin.node.name for pin in existing.pins],
+        "type": type_name,
+        "pins": [existing.net_names[net] for net in existing.pin_nets[start:end]],
     }
 
 
-def all_elements(circuit: Union[Circuit, SubCircuit]):
-    return chain(
-        (element for element in circuit.elements),
-        *[all_elements(subckt) for subckt in circuit.subcircuits],
-    )
+def all_graphs(graph):
+    return chain([graph], *[all_graphs(subckt) for subckt in graph.subcircuits])
 
 
-def analyze(circuit: Union[Circuit, SubCircuit]):
-    component_counts = Counter(type(element) for element in all_elements(circuit))
+def analyze(circuit: Union[Circuit, SubCircuit], graph):
+    component_counts = graph.expanded_type_counts()
 
     total = sum(component_counts.values())
 
     recommendations = [
-        ([new_element(element, circuit)], count / total)
-        for (element, count) in component_counts.items()
+        ([new_element(type_name, graph)], count / total)
+        for (type_name, count) in component_counts.items()
     ]
     return recommendations
@@ -1,7 +1,6 @@
 import random
-from itertools import takewhile
+from importlib.util import module_from_spec, spec_from_file_location
 from os import path
-from tempfile import TemporaryDirectory
 
 import numpy as np
 import spice_completion.datasets as datasets
@@ -17,13 +16,24 @@ from spice_completion.datasets import helpers as h
 from torch.utils.data import DataLoader
 
 script_dir = path.dirname(path.realpath(__file__))
-SPICE_NODE_INDEX = h.component_types.index(Node)
+COMPONENT_TYPES = [t for t in h.component_types[1:] if t is not Node]
 
 
 def local_file(name):
     return path.join(script_dir, name)
 
 
+def import_from_path(import_path, module_name):
+    spec = spec_from_file_location(module_name, import_path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The helpers shared by the models (loaded along with every model)
+utils = import_from_path(local_file("../utils.py"), "utils")
+
+
 def without_lines(filename, fn):
     with open(filename, "r") as f:
         contents = "".join([line for line in f.readlines() if not fn(line)])
@@ -71,40 +81,52 @@ def component(index, component_pin_dict):
     return {"type": datasets.helpers.component_index_name(index), "pins": pins}
 
 
-def analyze(circuit):
-    with TemporaryDirectory() as td:
-        netlist_path = path.join(td, "circuit.net")
-        with open(netlist_path, "w") as f:
-            netlist = str(circuit)
-            f.write(netlist)
+def analyze(circuit, graph=None):
+    return analyze_all([circuit])[0]
 
-        return analyze_file(netlist_path, circuit)
 
+def analyze_all(circuits, graphs=None):
+    """Recommend components for every circuit, with a single pass of each model"""
+    circuit_graphs = [
+        utils.components_as_graph(h.components(circuit)) for circuit in circuits
+    ]
+    preds = predict_component_types(circuit_graphs)
+    component_pins = connect_components(circuit_graphs)
+    # remove the unknown category
+    distributions = torch.nn.functional.softmax(preds, dim=-1)[:, 1:].tolist()
+    return [
+        [([component(i + 1, pins)], prob) for (i, prob) in enumerate(distribution)]
+        for (distribution, pins) in zip(distributions, component_pins)
+    ]
 
-def get_edge_idx(graph_size, node_features):
-    proto_idx = torch.tensor(range(graph_size - 1, node_features.shape[0], graph_size))
-    spice_node_idx = (node_features[:, SPICE_NODE_INDEX].nonzero()).flatten()
-    spice_node_count = len(
-        list(takewhile(lambda idx: idx < graph_size, spice_node_idx.tolist()))
-    )
-    proto_idx = proto_idx.repeat_interleave(spice_node_count)
-    return torch.stack([proto_idx.long(), spice_node_idx])
 
+def connect_components(circuit_graphs):
+    """Return a dictionary of nodes to use for each possible added node, per circuit
 
-def connect_components(filename, batch, components):
-    """ Return a dictionary of nodes to use for each possible added node"""
-    source = next(h.valid_netlist_sources([filename]))
-    (components, adj) = h.netlist_as_graph(source)
-    adj = np.pad(adj, ((0, 1), (0, 1)))
+    Only the two most probable nodes are kept for every type of added node.
+    """
     graphs = []
+    edges, edge_circuits, edge_nodes = [], [], []
     epsilon = 0.0
-    component_types = (t for t in h.component_types[1:] if t is not Node)
-    for ComponentType in component_types:
-        new_comps = components[:]
-        new_comps.append(ComponentType.__new__(ComponentType))
-        graph = datasets.LinkDataset.load_graph(new_comps, adj)
-        graph.x = (graph.x - link_mean) / (link_stddev + epsilon)
-        graphs.append(graph)
+    offset = 0
+    for (circuit_index, (components, adj)) in enumerate(circuit_graphs):
+        adj = np.pad(adj, ((0, 1), (0, 1)))
+        spice_nodes = np.array(
+            [i for (i, node) in enumerate(components) if isinstance(node, Node)],
+            dtype=np.int64,
+        )
+        for ComponentType in COMPONENT_TYPES:
+            new_comps = components[:]
+            new_comps.append(ComponentType.__new__(ComponentType))
+            graph = datasets.LinkDataset.load_graph(new_comps, adj)
+            graph.x = (graph.x - link_mean) / (link_stddev + epsilon)
+            graphs.append(graph)
+            # Link the new component to every SPICE node of its circuit
+            proto_idx = np.full_like(spice_nodes, offset + len(components))
+            edges.append(np.stack([proto_idx, offset + spice_nodes]))
+            edge_circuits.append(np.full_like(spice_nodes, circuit_index))
+            edge_nodes.append(spice_nodes)
+            offset += len(new_comps)
 
     graphs = h.to_deepsnap(graphs)
     cfg.merge_from_other_cfg(link_cfg)
@@ -123,36 +145,37 @@ def connect_components(filename, batch, components):
     batch.to(torch.device(cfg.device))
 
     node_features = (batch.node_feature.cpu() * (link_stddev + epsilon)) + link_mean
-    graph_size = len(components) + 1
-    batch.edge_label_index = get_edge_idx(graph_size, node_features)
+    batch.edge_label_index = torch.from_numpy(np.concatenate(edges, axis=1))
     logits, _ = link_model(batch)
-    probs = torch.sigmoid(logits)
+    probs = torch.sigmoid(logits).detach().cpu().numpy().reshape(-1).astype(float)
     # Resolve the edge label indices to types and stuff
     component_types = (node_features[batch.edge_label_index[0]] > 0.99).nonzero()[:, 1]
-    node_instances = (components[i % graph_size] for i in batch.edge_label_index[1])
-    component_dict = {}
-    for (component_type, node, prob) in zip(
-        component_types.tolist(), node_instances, probs.tolist()
-    ):
-        if component_type not in component_dict:
-            component_dict[component_type] = []
-        component_dict[component_type].append((node.name, prob))
-
-    for (k, v) in component_dict.items():
-        v.sort(key=lambda e: -e[1])
-    return component_dict
-
-
-def analyze_file(filename, circuit):
-    spice_dataset = datasets.omitted(
-        [filename],
-        min_edge_count=5,
-        train=False,
-        resample=False,
-        mean=mean,
-        std=stddev,
-    )
-    graphs = h.to_deepsnap(spice_dataset)
+    num_types = node_features.shape[1]
+    groups = np.concatenate(edge_circuits) * num_types + component_types.numpy()
+    groups, counts, top_edges = utils.top_edges_by_group(groups, probs, 2)
+    sections = np.cumsum(counts)[:-1]
+    top_nodes = np.split(np.concatenate(edge_nodes)[top_edges], sections)
+    top_probs = np.split(probs[top_edges], sections)
+
+    component_dicts = [{} for _ in circuit_graphs]
+    for (group, nodes, node_probs) in zip(groups.tolist(), top_nodes, top_probs):
+        circuit_index, component_type = divmod(group, num_types)
+        components = circuit_graphs[circuit_index][0]
+        component_dicts[circuit_index][component_type] = [
+            (components[i].name, prob)
+            for (i, prob) in zip(nodes.tolist(), node_probs.tolist())
+        ]
+    return component_dicts
+
+
+def predict_component_types(circuit_graphs):
+    graphs = []
+    for (components, adj) in circuit_graphs:
+        graph = datasets.LinkDataset.load_graph(components, adj)
+        graph.x = (graph.x - mean) / stddev
+        graph.y = torch.tensor([0])  # the label (the omitted component) is unknown
+        graphs.append(graph)
+    graphs = h.to_deepsnap(graphs)
     cfg.merge_from_other_cfg(gclass_cfg)
     dataset = GraphDataset(
         graphs,
@@ -165,29 +188,22 @@ def analyze_file(filename, circuit):
     dataset._num_graph_labels = len(datasets.helpers.component_types)
 
     loader = DataLoader(
-        dataset, batch_size=1, collate_fn=Batch.collate(), pin_memory=False
+        dataset, batch_size=len(graphs), collate_fn=Batch.collate(), pin_memory=False
     )
     batch = next(iter(loader))
     batch.to(torch.device(cfg.device))
     pred, true = model(batch)
+    return pred.reshape(len(graphs), -1)
 
-    batch = next(iter(loader))
-    batch.to(torch.device(cfg.device))
-    component_pins = connect_components(filename, batch, h.components(circuit))
-    distribution = list(
-        enumerate(torch.nn.functional.softmax(pred.squeeze()).tolist())
-    )[
-        1:
-    ]  # remove the unknown category
-    predictions = [([component(i, component_pins)], prob) for (i, prob) in distribution]
-    return predictions
+
+def analyze_file(filename):
+    contents = next(h.valid_netlist_sources([filename]))
+    parser = SpiceParser(source=contents)
+    return analyze(parser.build_circuit())
 
 
 if __name__ == "__main__":
     import json
     import sys
 
-    filename = sys.argv[1]
-    contents = next(h.valid_netlist_sources([filename]))
-    parser = SpiceParser(source=contents)
-    print(json.dumps(analyze_file(filename, parser.build_circuit())))
+    print(json.dumps(analyze_file(sys.argv[1])))
@@ -1,6 +1,6 @@
 import random
+from importlib.util import module_from_spec, spec_from_file_location
 from os import path
-from tempfile import TemporaryDirectory
 
 import numpy as np
 import torch
@@ -11,11 +11,12 @@ from graphgym.model_builder import create_model
 from graphgym.utils.device import auto_select_device
 from PySpice.Spice.Netlist import Node
 from PySpice.Spice.Parser import SpiceParser
-from spice_completion.datasets import PrototypeLinkDataset
+from spice_completion.datasets import LinkDataset
 from spice_completion.datasets import helpers as h
 from torch.utils.data import DataLoader
 
 SPICE_NODE_INDEX = h.component_types.index(Node)
+PROTOTYPE_TYPES = [t for t in h.component_types[1:] if t is not Node]
 script_dir = path.dirname(path.realpath(__file__))
 
 
@@ -23,6 +24,17 @@ def local_file(name):
     return path.join(script_dir, name)
 
 
+def import_from_path(import_path, module_name):
+    spec = spec_from_file_location(module_name, import_path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The helpers shared by the models (loaded along with every model)
+utils = import_from_path(local_file("../utils.py"), "utils")
+
+
 def without_lines(filename, fn):
     with open(filename, "r") as f:
         contents = "".join([line for line in f.readlines() if not fn(line)])
@@ -36,6 +48,8 @@ config_str = without_lines(
 config = cfg.load_cfg(config_str)
 cfg.merge_from_other_cfg(config)
 assert_cfg(cfg)
+# graphgym's cfg is global and shared with the other models loaded in the process
+link_cfg = cfg.clone()
 
 # Set Pytorch environment
 torch.set_num_threads(cfg.num_threads)
@@ -67,63 +81,76 @@ def component(index, edges):
 
 
 def get_proto_node_edges(node_features):
-    proto_nodes = node_features[:, -1].nonzero()
-    spice_nodes = (node_features[:, SPICE_NODE_INDEX].nonzero()).flatten()[
-        0:-1
-    ]  # last node is proto node (remove it!)
-    proto_idx = (
-        torch.ones((proto_nodes.shape[0], spice_nodes.shape[0])) * proto_nodes
-    ).flatten()
+    is_proto_node = node_features[:, -1] > 0.99
+    proto_nodes = is_proto_node.nonzero().flatten()
+    is_spice_node = (node_features[:, SPICE_NODE_INDEX] > 0.99) & ~is_proto_node
+    spice_nodes = is_spice_node.nonzero().flatten()
+    proto_idx = proto_nodes.repeat_interleave(spice_nodes.shape[0])
     spice_node_idx = spice_nodes.repeat(proto_nodes.shape[0])
     return torch.stack([proto_idx.long(), spice_node_idx])
 
 
 def interpret_results(edges, node_features, probs, components):
-    proto_ids = edges[0]
-    node_types = (node_features[:, 0:-1] > 0.99).nonzero()[:, 1]
-    proto_edges = {}
-    for (i, p_id) in enumerate(proto_ids):
-        is_unknown_type = node_types[p_id] == 0
-        if is_unknown_type:
-            continue
-        node_id = edges[1][i].item()
-        prob = probs[i].item()
-        p_id = p_id.item()
-        if p_id not in proto_edges:
-            proto_edges[p_id] = []
-
-        proto_edges[p_id].append((node_id, prob))
-
-    proto_top_edges = [
-        (k, zip(*sorted(edges, key=lambda e: -e[1])[0:2]))
-        for (k, edges) in proto_edges.items()
-    ]
+    node_types = (node_features[:, 0:-1] > 0.99).nonzero()[:, 1].numpy()
+    proto_ids, node_ids = edges.cpu().numpy()
+    probs = probs.detach().cpu().numpy().reshape(-1).astype(float)
+    is_known_type = node_types[proto_ids] != 0
+    proto_ids, node_ids = proto_ids[is_known_type], node_ids[is_known_type]
+    probs = probs[is_known_type]
+    if probs.shape[0] == 0:
+        return []
+
+    protos, counts, top_edges = utils.top_edges_by_group(proto_ids, probs, 2)
+    starts = np.cumsum(counts) - counts
+    mean_probs = np.add.reduceat(probs[top_edges], starts) / counts
+    top_nodes = np.split(node_ids[top_edges], starts[1:])
     protos_w_probs = [
-        (
-            component(node_types[k], (node(e, components) for e in edges)),
-            sum(probs) / len(probs),
+        (component(node_type, (node(e, components) for e in nodes.tolist())), prob)
+        for (node_type, nodes, prob) in zip(
+            node_types[protos].tolist(), top_nodes, mean_probs.tolist()
         )
-        for (k, (edges, probs)) in proto_top_edges
     ]
     return protos_w_probs
 
 
-def analyze(circuit):
-    with TemporaryDirectory() as td:
-        netlist_path = path.join(td, "circuit.net")
-        with open(netlist_path, "w") as f:
-            netlist = str(circuit)
-            f.write(netlist)
+def load_prototype_graph(components, adj):
+    """Return the graph of the components along with a prototype node for every type
 
-        return analyze_file(netlist_path, circuit)
-
-
-def analyze_file(filename, circuit):
-    netlists = [filename]
-    dataset = PrototypeLinkDataset(netlists, mean=mean, std=stddev, train=False)
-    graphs = h.to_deepsnap(dataset)
+    The prototype nodes are disconnected and flagged by an additional (last) feature.
+    Returns the graph (normalized) and its (unnormalized) node features.
+    """
+    prototypes = [
+        ComponentType.__new__(ComponentType) for ComponentType in PROTOTYPE_TYPES
+    ]
+    adj = np.pad(adj, ((0, len(prototypes)), (0, len(prototypes))))
+    graph = LinkDataset.load_graph(components + prototypes, adj)
+    is_proto_node = graph.x.new_zeros((graph.x.shape[0], 1))
+    num_components = len(components)
+    is_proto_node[num_components:] = 1
+    node_features = torch.cat([graph.x, is_proto_node], dim=1)
+    graph.x = (node_features - mean) / stddev
+    return graph, node_features
+
+
+def analyze(circuit, graph=None):
+    return analyze_all([circuit])[0]
+
+
+def analyze_all(circuits, graphs=None):
+    """Recommend components for every circuit, with a single pass of the model"""
+    circuit_components, prototype_graphs, node_features, edges = [], [], [], []
+    for circuit in circuits:
+        components, adj = utils.components_as_graph(h.components(circuit))
+        graph, features = load_prototype_graph(components, adj)
+        circuit_components.append(components)
+        prototype_graphs.append(graph)
+        node_features.append(features)
+        edges.append(get_proto_node_edges(features))
+
+    prototype_graphs = h.to_deepsnap(prototype_graphs)
+    cfg.merge_from_other_cfg(link_cfg)
     ds_dataset = GraphDataset(
-        graphs,
+        prototype_graphs,
         task=cfg.dataset.task,
         edge_train_mode=cfg.dataset.edge_train_mode,
         edge_message_ratio=cfg.dataset.edge_message_ratio,
@@ -131,25 +158,37 @@ def analyze_file(filename, circuit):
         minimum_node_per_graph=0,
     )
     loader = DataLoader(
-        ds_dataset, batch_size=1, collate_fn=Batch.collate(), pin_memory=False
+        ds_dataset,
+        batch_size=len(prototype_graphs),
+        collate_fn=Batch.collate(),
+        pin_memory=False,
     )
 
     batch = next(iter(loader))
     batch.to(torch.device(cfg.device))
-    node_features = dataset.unnormalize(batch.node_feature.cpu())
-    batch.edge_label_index = get_proto_node_edges(node_features)
+    offsets = np.cumsum([0] + [features.shape[0] for features in node_features])
+    batch.edge_label_index = torch.cat(
+        [graph_edges + int(offset) for (graph_edges, offset) in zip(edges, offsets)],
+        dim=1,
+    )
     logits, _ = model(batch)
-    probs = torch.sigmoid(logits)
-    return interpret_results(
-        batch.edge_label_index, node_features, probs, h.components(circuit)
+    probs = torch.split(
+        torch.sigmoid(logits).cpu(), [graph_edges.shape[1] for graph_edges in edges]
     )
+    return [
+        interpret_results(*results)
+        for results in zip(edges, node_features, probs, circuit_components)
+    ]
+
+
+def analyze_file(filename):
+    contents = next(h.valid_netlist_sources([filename]))
+    parser = SpiceParser(source=contents)
+    return analyze(parser.build_circuit())
 
 
 if __name__ == "__main__":
     import json
     import sys
 
-    filename = sys.argv[1]
-    contents = next(h.valid_netlist_sources([filename]))
-    parser = SpiceParser(source=contents)
-    print(json.dumps(analyze_file(filename, parser.build_circuit())))
+    print(json.dumps(analyze_file(sys.argv[1])))
@@ -0,0 +1,56 @@
+import numpy as np
+from PySpice.Spice.BasicElement import SubCircuitElement
+from PySpice.Spice.Netlist import Node
+
+
+def components_as_graph(components):
+    """Return the components (elements and SPICE nodes) and their adjacency matrix
+
+    This is the in-memory equivalent of `helpers.netlist_as_graph` (which parses the
+    netlist of a circuit), given the components of the circuit (`helpers.components`):
+    every element is adjacent to the SPICE nodes of its pins. The sub-circuit instances
+    (X elements) and the nodes only they connect are left out, as in the netlists the
+    models were trained on (and in the circuits exported before the sub-circuits were
+    shared, which were flat).
+    """
+    elements = [
+        element
+        for element in components
+        if not isinstance(element, (Node, SubCircuitElement))
+    ]
+    connected = {pin.node.name for element in elements for pin in element.pins}
+    components = [
+        component
+        for component in components
+        if not isinstance(component, SubCircuitElement)
+        and (not isinstance(component, Node) or component.name in connected)
+    ]
+    node_indices = {
+        node.name: i for (i, node) in enumerate(components) if isinstance(node, Node)
+    }
+    adj = np.zeros((len(components), len(components)))
+    for (i, element) in enumerate(components):
+        if not isinstance(element, Node):
+            nodes = [
+                node_indices[pin.node.name]
+                for pin in element.pins
+                if pin.node.name in node_indices
+            ]
+            adj[i, nodes] = 1
+            adj[nodes, i] = 1
+    return components, adj
+
+
+def top_edges_by_group(groups, probs, k):
+    """Return the (at most) k most probable edges of every group
+
+    The edges are sorted by group and then by decreasing probability, keeping ties in
+    the order of the edges (as a stable sort would). Returns the groups (sorted), the
+    number of top edges of every group and the indices of these edges, in that order.
+    """
+    order = np.lexsort((-probs, groups))
+    groups, starts, counts = np.unique(
+        groups[order], return_index=True, return_counts=True
+    )
+    ranks = np.arange(order.shape[0]) - np.repeat(starts, counts)
+    return groups, np.minimum(counts, k), order[ranks < k]
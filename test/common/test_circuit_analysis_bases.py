@@ -0,0 +1,322 @@
+import sys
+from collections import Counter
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+import numpy as np
+from PySpice.Spice.Netlist import Circuit, SubCircuit
+
+BASE_PLUGIN_PATH = (
+    Path(__file__).parent / "../../src/common/plugins/CircuitAnalysisBases.py"
+).resolve()
+IMPORT_MODULE_NAME = "electric_circuits.plugin_bases"
+
+if IMPORT_MODULE_NAME in sys.modules:
+    bases = sys.modules[IMPORT_MODULE_NAME]
+else:
+    spec = spec_from_file_location(IMPORT_MODULE_NAME, BASE_PLUGIN_PATH)
+    bases = module_from_spec(spec)
+    spec.loader.exec_module(bases)
+    sys.modules[IMPORT_MODULE_NAME] = bases
+
+
+def stage_subcircuit(name):
+    """A sub-circuit with a resistor and a capacitor, as the ones of a filter array"""
+    subckt = SubCircuit(name, "in", "out")
+    subckt.R(1, "in", "out", 1000)
+    subckt.C(1, "out", subckt.gnd, 1e-9)
+    return subckt
+
+
+def to_netlist(subckt):
+    """The `SubCircuitNetlist` of a sub-circuit, as defined by `CircuitToPySpiceBase`"""
+    return bases.SubCircuitNetlist(
+        key=subckt.name,
+        name=subckt.name,
+        text=str(subckt),
+        graph=bases.CircuitGraph.from_pyspice(subckt),
+        ports=[],
+        grounded_pins=[],
+        dependencies=[],
+        bases={},
+    )
+
+
+def test_from_elements():
+    graph = bases.CircuitGraph.from_elements(
+        "Divider",
+        [
+            ("R1", "Resistor", [("p", "in"), ("n", "out")], "1k"),
+            ("R2", "Resistor", [("p", "out"), ("n", "0")], "2k"),
+            ("V1", "Voltage", [("p", "in"), ("n", "0")], "5"),
+        ],
+        ports=["in", "out"],
+    )
+
+    assert (graph.num_elements, graph.num_pins, graph.num_nets) == (3, 6, 3)
+    assert graph.types == ["Resistor", "Voltage"]
+    assert graph.pin_names == ["p", "n"]
+    assert graph.net_names == ["in", "out", "0"]
+    assert graph.pin_offsets.tolist() == [0, 2, 4, 6]
+    assert graph.pin_nets.tolist() == [0, 1, 1, 2, 0, 2]
+    assert graph.ports.tolist() == [0, 1]
+    assert graph.type_counts() == {"Resistor": 2, "Voltage": 1}
+    assert graph.pin_elements.tolist() == [0, 0, 1, 1, 2, 2]
+
+
+def test_net_pins_and_adjacency():
+    graph = bases.CircuitGraph.from_elements(
+        "Divider",
+        [
+            ("R1", "Resistor", [("p", "in"), ("n", "out")], ""),
+            ("R2", "Resistor", [("p", "out"), ("n", "0")], ""),
+        ],
+    )
+
+    offsets, pins = graph.net_pins()
+    assert offsets.tolist() == [0, 1, 3, 4]
+    assert pins.tolist() == [0, 1, 2, 3]
+
+    offsets, neighbors = graph.adjacency()
+    assert offsets.tolist() == [0, 2, 4, 5, 7, 8]
+    # R1 -> in, out; R2 -> out, 0; in -> R1; out -> R1, R2; 0 -> R2
+    assert neighbors.tolist() == [2, 3, 3, 4, 0, 0, 1, 1]
+
+
+def test_dict_round_trip():
+    circuit = Circuit("Filter")
+    circuit.V(1, "in", circuit.gnd, 5)
+    circuit.X("stage", "stage", "in", "out")
+    circuit.subcircuit(stage_subcircuit("stage"))
+    graph = bases.CircuitGraph.from_pyspice(circuit)
+
+    copy = bases.CircuitGraph.from_dict(graph.to_dict())
+
+    assert copy.to_dict() == graph.to_dict()
+    assert list(copy.iter_elements()) == list(graph.iter_elements())
+    assert list(copy.subcircuits[0].iter_elements()) == [
+        ("R1", "Resistor", [("plus", "in"), ("minus", "out")], "1000"),
+        ("C1", "Capacitor", [("plus", "out"), ("minus", "0")], "1e-09"),
+    ]
+
+
+def test_from_pyspice_names_the_instance_pins():
+    circuit = Circuit("Filter")
+    circuit.X("stage", "stage", "in", "out")
+    graph = bases.CircuitGraph.from_pyspice(circuit)
+
+    assert list(graph.iter_elements()) == [
+        ("Xstage", "SubCircuitElement", [("p1", "in"), ("p2", "out")], "stage")
+    ]
+
+
+def test_from_pyspice_uses_the_graphs_of_the_text_only_definitions():
+    circuit = Circuit("Filter")
+    circuit.X("stage", "stage", "in", "out")
+    netlist = to_netlist(stage_subcircuit("stage"))
+    circuit.subcircuit(netlist)
+
+    graph = bases.CircuitGraph.from_pyspice(circuit)
+
+    assert graph.subcircuits == [netlist.graph]
+
+
+def baseline_type_counts(circuit):
+    """The element counts of the example model before the sub-circuits were shared
+
+    Every child Circuit was a (nested) SubCircuit of its own, without instances.
+    """
+
+    def all_elements(circuit):
+        yield from circuit.elements
+        for subckt in circuit.subcircuits:
+            yield from all_elements(subckt)
+
+    return dict(Counter(type(element).__name__ for element in all_elements(circuit)))
+
+
+def test_expanded_type_counts_match_the_nested_sub_circuits():
+    # Filter: V1, RL and two stages, one of which has a nested stage of its own
+    nested = Circuit("Filter")
+    nested.V(1, "in", nested.gnd, 5)
+    nested.R("L", "out", nested.gnd, 50)
+    first = stage_subcircuit("Stage0")
+    second = stage_subcircuit("Stage1")
+    second.subcircuit(stage_subcircuit("Inner"))
+    nested.subcircuit(first)
+    nested.subcircuit(second)
+
+    shared = Circuit("Filter")
+    shared.V(1, "in", shared.gnd, 5)
+    shared.R("L", "out", shared.gnd, 50)
+    shared.X("Stage0_1", "stage", "in", "mid")
+    shared.X("Stage1_2", "stage_with_inner", "mid", "out")
+    stage_with_inner = stage_subcircuit("stage_with_inner")
+    stage_with_inner.X("Inner_1", "stage", "in", "out")
+    shared.subcircuit(to_netlist(stage_subcircuit("stage")))
+    shared.subcircuit(to_netlist(stage_with_inner))
+
+    graph = bases.CircuitGraph.from_pyspice(shared)
+
+    assert graph.expanded_type_counts() == baseline_type_counts(nested)
+    assert graph.expanded_type_counts() == {
+        "Resistor": 4,
+        "Capacitor": 3,
+        "VoltageSource": 1,
+    }
+    assert graph.type_counts()["SubCircuitElement"] == 2
+
+
+def test_expanded_type_counts_keep_the_unknown_instances():
+    circuit = Circuit("Filter")
+    circuit.X("stage", "missing", "in", "out")
+    circuit.R(1, "in", "out", 1)
+
+    graph = bases.CircuitGraph.from_pyspice(circuit)
+
+    assert graph.expanded_type_counts() == {"SubCircuitElement": 1, "Resistor": 1}
+
+
+def test_empty_graph():
+    graph = bases.CircuitGraph.from_elements("Empty", [])
+
+    assert graph.type_counts() == {}
+    assert graph.expanded_type_counts() == {}
+    assert graph.adjacency()[0].tolist() == [0]
+    assert np.array_equal(graph.pin_elements, np.zeros(0))
+
+
+def test_disjoint_set():
+    sets = bases.DisjointSet()
+    ids = [sets.add() for _ in range(6)]
+
+    assert ids == [0, 1, 2, 3, 4, 5]
+    assert len(sets) == 6
+    assert [sets.find(i) for i in ids] == ids
+
+    sets.union(0, 1)
+    sets.union(2, 3)
+    sets.union(3, 4)
+
+    assert sets.find(0) == sets.find(1)
+    assert sets.find(2) == sets.find(3) == sets.find(4)
+    assert sets.find(0) != sets.find(2)
+    assert sets.find(5) == 5
+
+
+def test_disjoint_set_union_by_size():
+    sets = bases.DisjointSet()
+    for _ in range(4):
+        sets.add()
+    sets.union(1, 2)
+    sets.union(1, 3)
+
+    # The larger set's representative is kept, whatever the order of the arguments
+    assert sets.union(0, 2) == sets.find(1)
+    assert sets.sizes[sets.find(0)] == 4
+    assert sets.union(3, 0) == sets.find(1)
+
+
+def test_disjoint_set_path_halving():
+    sets = bases.DisjointSet()
+    for _ in range(5):
+        sets.add()
+    # A chain 4 -> 3 -> 2 -> 1 -> 0, as union by size never builds it
+    sets.parents[:] = [0, 0, 1, 2, 3]
+
+    assert sets.find(4) == 0
+    # Every other node of the path is linked to its grandparent
+    assert sets.parents == [0, 0, 0, 2, 2]
+
+
+def divider_subcircuit(element_names, node_name="mid"):
+    """A divider with a capacitor to ground, with the elements in the given order"""
+    subckt = SubCircuit("divider", "top", "bottom")
+    elements = {
+        "R1": lambda name: subckt.R(name, "top", node_name, 100),
+        "R2": lambda name: subckt.R(name, node_name, "bottom", 200),
+        "C1": lambda name: subckt.C(name, node_name, subckt.gnd, 1e-9),
+    }
+    for name, label in element_names:
+        elements[name](label)
+    return subckt
+
+
+def test_canonical_form_ignores_the_labels_and_the_order():
+    form, nodes = bases.get_canonical_form(
+        divider_subcircuit([("R1", 1), ("R2", 2), ("C1", 1)])
+    )
+    other_form, other_nodes = bases.get_canonical_form(
+        divider_subcircuit([("C1", 7), ("R2", 5), ("R1", 3)], node_name="x")
+    )
+
+    assert form == other_form
+    assert nodes == {"0": "0", "top": "P0", "bottom": "P1", "mid": "N3"}
+    assert other_nodes == {"0": "0", "top": "P0", "bottom": "P1", "x": "N3"}
+    assert form.splitlines() == [
+        "2",
+        "C0 N3 0 1e-09",
+        "R1 P0 N3 100",
+        "R2 N3 P1 200",
+    ]
+
+
+def test_canonical_form_differs_for_different_structures():
+    form, _ = bases.get_canonical_form(
+        divider_subcircuit([("R1", 1), ("R2", 2), ("C1", 1)])
+    )
+    swapped = SubCircuit("divider", "bottom", "top")
+    swapped.R(1, "top", "mid", 100)
+    swapped.R(2, "mid", "bottom", 200)
+    swapped.C(1, "mid", swapped.gnd, 1e-9)
+
+    assert bases.get_canonical_form(swapped)[0] != form
+
+
+def ring(element_names, grounded="n3"):
+    # Equal resistors from the port to n1, in a ring n1 -> n2 -> n3 and n1 -> n4 -> n3
+    # and from a node to ground, with the elements in the given order
+    subckt = SubCircuit("ring", "port")
+    nodes = {
+        "R1": ("port", "n1"),
+        "R2": ("n1", "n2"),
+        "R3": ("n2", "n3"),
+        "R4": ("n1", "n4"),
+        "R5": ("n4", "n3"),
+        "R6": (grounded, subckt.gnd),
+    }
+    for name in element_names:
+        subckt.R(name[1:], *nodes[name], 100)
+    return subckt
+
+
+def test_canonical_form_breaks_the_ties_of_symmetric_circuits():
+    orders = [
+        ["R1", "R2", "R3", "R4", "R5", "R6"],
+        ["R6", "R5", "R4", "R3", "R2", "R1"],
+        ["R3", "R1", "R5", "R2", "R6", "R4"],
+        ["R4", "R3", "R6", "R1", "R2", "R5"],
+    ]
+    forms = {bases.get_canonical_form(ring(order))[0] for order in orders}
+
+    # The two halves of the ring (through n2 and n4) are interchangeable
+    assert len(forms) == 1
+    assert bases.get_canonical_form(ring(orders[0], "n2"))[0] not in forms
+
+
+def test_canonical_form_of_parallel_elements():
+    def parallel(num_resistors, capacitor_first):
+        subckt = SubCircuit("parallel", "a", "b")
+        if capacitor_first:
+            subckt.C(1, "a", "b", 1e-9)
+        for i in range(num_resistors):
+            subckt.R(i, "a", "b", 100)
+        if not capacitor_first:
+            subckt.C(1, "a", "b", 1e-9)
+        return subckt
+
+    # Identical elements are only tried once
+    form, _ = bases.get_canonical_form(parallel(20, False), max_leaves=1)
+
+    assert form == bases.get_canonical_form(parallel(20, True))[0]
+    assert form != bases.get_canonical_form(parallel(19, True))[0]
@@ -84,32 +84,44 @@ describe('ConvertCircuitToNetlist', function () {
         )).map(child => core.getAttribute(child, 'name'));
     }
 
-    async function assertValidNetlist(netlist, circuitNode) {
-        assert(circuitNode);
-        const pySpiceProcess = spawnSync('python', [PYSPICE_SCRIPT, netlist]);
-        const netlistJSON = JSON.parse(pySpiceProcess.stdout.toString());
+    async function assertValidCircuit(circuitJSON, circuitNode, definitions, used) {
+        const elements = await getElementNamesFor(circuitNode);
+        assert(arrayEquals(elements.sort(), Object.keys(circuitJSON.nodes).sort()));
 
         const subCircuits = await testFixture.getChildrenOfType(
             core,
             circuitNode,
             'Circuit'
         );
-
-        const elements = await getElementNamesFor(circuitNode);
+        const subCircuitNames = subCircuits.map(subCircuit => core.getAttribute(subCircuit, 'name'));
+        assert(arrayEquals(subCircuitNames.sort(), Object.keys(circuitJSON.instances).sort()));
 
         for (let subCircuit of subCircuits) {
             const subCircuitName = core.getAttribute(subCircuit, 'name');
-            const subCircuitInNetlist = netlistJSON.sub_circuits
-                .find(sub_ckt => sub_ckt.name === subCircuitName);
+            const definitionName = circuitJSON.instances[subCircuitName];
+            assert(definitions[definitionName], `${definitionName} is not defined`);
+            used.add(definitionName);
+            await assertValidCircuit(definitions[definitionName], subCircuit, definitions, used);
+        }
+    }
 
-            const subCircuitElements = await getElementNamesFor(subCircuit);
+    async function assertValidNetlist(netlist, circuitNode) {
+        assert(circuitNode);
+        const pySpiceProcess = spawnSync('python', [PYSPICE_SCRIPT, netlist]);
+        const netlistJSON = JSON.parse(pySpiceProcess.stdout.toString());
 
-            assert(subCircuitInNetlist);
-            assert(arrayEquals(subCircuitElements.sort(), Object.keys(subCircuitInNetlist.nodes).sort()));
+        // The definitions are flat (top-level) and shared by the identical sub-circuits
+        const definitions = {};
+        for (let subCircuit of netlistJSON.sub_circuits) {
+            assert(!definitions[subCircuit.name], `${subCircuit.name} is defined twice`);
+            assert(subCircuit.sub_circuits.length === 0);
+            definitions[subCircuit.name] = subCircuit;
         }
 
-        assert(subCircuits.length === netlistJSON.sub_circuits.length);
-        assert(arrayEquals(elements.sort(), Object.keys(netlistJSON.nodes).sort()));
+        const used = new Set();
+        await assertValidCircuit(netlistJSON, circuitNode, definitions, used);
+        assert(used.size === netlistJSON.sub_circuits.length);
+        return netlistJSON;
     }
 
     describe('conversion', function (){
@@ -120,4 +132,50 @@ describe('ConvertCircuitToNetlist', function () {
             });
         });
     });
+
+    describe('sub-circuits', function () {
+        let circuitPath;
+
+        before(async function () {
+            // Outer (a PeakDetector) has PDCircuit, First (a PeakDetector) and Second,
+            // a PeakDetector with yet another PeakDetector (Nested) inside
+            const gmeCore = new testFixture.WebGME.Core(project, {globConf: gmeConfig, logger});
+            const commitObject = await project.getCommitObject(context.commitHash);
+            const root = await gmeCore.loadRoot(commitObject.root);
+            const peakDetector = await gmeCore.loadByPath(root, testFixture.CIRCUITS.PeakDetector);
+            const outer = gmeCore.copyNode(peakDetector, gmeCore.getParent(peakDetector));
+            const first = gmeCore.copyNode(peakDetector, outer);
+            const second = gmeCore.copyNode(peakDetector, outer);
+            const nested = gmeCore.copyNode(peakDetector, second);
+            gmeCore.setAttribute(outer, 'name', 'Outer');
+            gmeCore.setAttribute(first, 'name', 'First');
+            gmeCore.setAttribute(second, 'name', 'Second');
+            gmeCore.setAttribute(nested, 'name', 'Nested');
+            circuitPath = gmeCore.getPath(outer);
+
+            const persisted = gmeCore.persist(root);
+            const result = await project.makeCommit(
+                'master',
+                [context.commitHash],
+                persisted.rootHash,
+                persisted.objects,
+                'Add nested and repeated sub-circuits'
+            );
+            context.commitHash = result.hash;
+        });
+
+        it('Should define the nested and repeated sub-circuits once', async () => {
+            const netlist = await runPluginAndReturnNetlist(circuitPath);
+            const netlistJSON = await assertValidNetlist(netlist, plugin.activeNode);
+            const instances = netlistJSON.instances;
+            const secondInstances = netlistJSON.sub_circuits
+                .find(subCircuit => subCircuit.name === instances.Second)
+                .instances;
+
+            assert.equal(secondInstances.Nested, instances.First);
+            assert.equal(secondInstances.PDCircuit, instances.PDCircuit);
+            // PDCircuit, First (and Nested) and Second
+            assert.equal(netlistJSON.sub_circuits.length, 3);
+        });
+    });
 });
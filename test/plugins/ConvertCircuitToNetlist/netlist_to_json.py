@@ -2,6 +2,7 @@ import json
 import re
 import sys
 
+from PySpice.Spice.BasicElement import SubCircuitElement
 from PySpice.Spice.Netlist import Circuit, SubCircuit
 from PySpice.Spice.Parser import SpiceParser
 
@@ -20,14 +21,19 @@ class NetListJSON:
         return json.dumps(ckt_json)
 
     def get_json(self, ckt, initial):
+        elements = [ckt.element(element_name) for element_name in ckt.element_names]
         initial.update(
             {
                 "name": ckt.name if isinstance(ckt, SubCircuit) else ckt.title,
                 "nodes": {
-                    self._get_webgme_name(element_name): self._get_nodes_for(
-                        ckt.element(element_name)
-                    )
-                    for element_name in ckt.element_names
+                    self._get_webgme_name(element.name): self._get_nodes_for(element)
+                    for element in elements
+                    if not isinstance(element, SubCircuitElement)
+                },
+                "instances": {
+                    self._get_webgme_name(element.name): element.subcircuit_name
+                    for element in elements
+                    if isinstance(element, SubCircuitElement)
                 },
             }
         )
@@ -22,6 +22,7 @@ describe('ConvertNetlistToCircuit', function () {
 
     let gmeAuth,
         storage,
+        project,
         context,
         pluginConfig,
         plugin;
@@ -40,7 +41,7 @@ describe('ConvertNetlistToCircuit', function () {
 
         const importResult = await testFixture.importProject(storage, importParam);
         const commitHash = importResult.commitHash;
-        const project = importResult.project;
+        project = importResult.project;
 
         plugin = await manager.initializePlugin(pluginName);
         context = {
@@ -97,4 +98,87 @@ describe('ConvertNetlistToCircuit', function () {
             assert(pluginMessages.some(m => m.startsWith('Conversion failed for netlists/not_a_netlist.net')));
         });
     });
+
+    describe('chunked zip file circuit conversion', () => {
+        const PROGRESS_REGISTRY = 'netlistImportProgress';
+        const zipName = path.basename(testFixture.TEST_NETLISTS_ZIP);
+        let gmeCore,
+            inputHash;
+
+        before(async function () {
+            gmeCore = new testFixture.WebGME.Core(project, {globConf: gmeConfig, logger});
+            inputHash = await plugin.blobClient.putFile(
+                zipName,
+                readFileSync(testFixture.TEST_NETLISTS_ZIP)
+            );
+        });
+
+        async function loadFolder() {
+            const commitObject = await project.getCommitObject(
+                await project.getBranchHash('master')
+            );
+            const root = await gmeCore.loadRoot(commitObject.root);
+            return await gmeCore.loadByPath(root, testFixture.TEST_CIRCUITS_FOLDER);
+        }
+
+        async function runChunkedImport(config) {
+            context.commitHash = await project.getBranchHash('master');
+            await manager.configurePlugin(
+                plugin,
+                Object.assign({input_netlist: inputHash}, config),
+                context
+            );
+            return await manager.runPluginMain(plugin);
+        }
+
+        it('should commit the circuits in chunks', async () => {
+            const numCircuits = gmeCore.getChildrenPaths(await loadFolder()).length;
+            const pluginResult = await runChunkedImport({commit_every: 3});
+            assert(pluginResult.success);
+
+            const messages = (await project.getHistory('master', 3))
+                .map(commit => commit.message);
+            assert.deepEqual(messages, [
+                `Imported 9 of 9 netlists from ${zipName}`,
+                `Imported 6 of 9 netlists from ${zipName}`,
+                `Imported 3 of 9 netlists from ${zipName}`,
+            ]);
+
+            const folder = await loadFolder();
+            assert.equal(gmeCore.getChildrenPaths(folder).length, numCircuits + 8);
+            assert.deepEqual(gmeCore.getRegistry(folder, PROGRESS_REGISTRY), {});
+        });
+
+        it('should resume an interrupted import and report its failures', async () => {
+            // An import of the zip file interrupted after 7 of its 9 netlists
+            const folder = await loadFolder();
+            const root = gmeCore.getRoot(folder);
+            const numCircuits = gmeCore.getChildrenPaths(folder).length;
+            gmeCore.setRegistry(folder, PROGRESS_REGISTRY, {
+                [inputHash]: {
+                    imported: 7,
+                    failures: [['netlists/interrupted.net', 'not a netlist']],
+                },
+            });
+            const persisted = gmeCore.persist(root);
+            await project.makeCommit(
+                'master',
+                [await project.getBranchHash('master')],
+                persisted.rootHash,
+                persisted.objects,
+                `Imported 7 of 9 netlists from ${zipName}`
+            );
+
+            const pluginResult = await runChunkedImport({commit_every: 3});
+            assert(pluginResult.success);
+
+            // RLC.cir and not_a_netlist.net
+            const resumedFolder = await loadFolder();
+            assert.equal(gmeCore.getChildrenPaths(resumedFolder).length, numCircuits + 1);
+            assert.deepEqual(gmeCore.getRegistry(resumedFolder, PROGRESS_REGISTRY), {});
+            const pluginMessages = pluginResult.messages.map(m => m.message);
+            assert(pluginMessages.some(m => m.startsWith('Conversion failed for netlists/interrupted.net')));
+            assert(pluginMessages.some(m => m.startsWith('Conversion failed for netlists/not_a_netlist.net')));
+        });
+    });
 });
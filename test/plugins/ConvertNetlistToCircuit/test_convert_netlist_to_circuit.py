@@ -0,0 +1,350 @@
+import logging
+import os
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PLUGIN_PATH = (
+    Path(__file__).parent
+    / "../../../src/plugins/ConvertNetlistToCircuit/ConvertNetlistToCircuit/__init__.py"
+).resolve()
+IMPORT_MODULE_NAME = "electric_circuits.plugins.ConvertNetlistToCircuit"
+
+spec = spec_from_file_location(IMPORT_MODULE_NAME, PLUGIN_PATH)
+plugin_module = module_from_spec(spec)
+spec.loader.exec_module(plugin_module)
+ConvertNetlistToCircuit = plugin_module.ConvertNetlistToCircuit
+NetlistParseCache = plugin_module.NetlistParseCache
+
+NETLIST = """.title RC
+V1 in 0 10
+R1 in out 1k
+C1 out 0 1u
+"""
+
+
+class FakeCore:
+    """The registry and persistence of the folder the netlists are imported to"""
+
+    def __init__(self):
+        self.registry = {}
+        self.num_persists = 0
+        self.num_persisted = 0
+        self.num_created = 0
+
+    def get_registry(self, node, name):
+        return self.registry.get(name)
+
+    def set_registry(self, node, name, value):
+        self.registry[name] = value
+
+    def create_child(self, parent, meta_node):
+        self.num_created += 1
+        return {"rootId": "", "nodePath": f"{parent['nodePath']}/{self.num_created}"}
+
+    def persist(self, node):
+        objects = {f"#{i}": {} for i in range(self.num_persisted, self.num_created)}
+        self.num_persists += 1
+        self.num_persisted = self.num_created
+        return {"rootHash": f"#root{self.num_persists}", "objects": objects}
+
+
+class FakeProject:
+    def __init__(self):
+        self.commits = []
+
+    def make_commit(self, branch_name, parents, root_hash, objects, message):
+        self.commits.append((root_hash, objects, message))
+        return {"hash": f"#commit{len(self.commits)}"}
+
+    def get_branch_hash(self, branch_name):
+        return f"#commit{len(self.commits) - 1}"
+
+    def set_branch_hash(self, branch_name, new_hash, old_hash):
+        pass
+
+
+@pytest.fixture
+def plugin():
+    plugin = ConvertNetlistToCircuit.__new__(ConvertNetlistToCircuit)
+    plugin.core = FakeCore()
+    plugin.project = FakeProject()
+    plugin.logger = logging.getLogger(__name__)
+    plugin.branch_name = "master"
+    plugin.active_node = {"rootId": "", "nodePath": "/0"}
+    plugin._commit_every = 0
+    plugin._commit_max_objects = 0
+    plugin._num_uncommitted = 0
+    plugin._num_uncommitted_nodes = 0
+    plugin._num_commits = 0
+    return plugin
+
+
+def test_import_progress_keeps_the_failures(plugin):
+    failures = [("netlists/a.net", "Invalid netlist")]
+    plugin._set_import_progress("#zip", 4, failures)
+    plugin._set_import_progress("#other", 2, [])
+
+    assert plugin._get_import_progress("#zip") == (4, failures)
+    assert plugin._get_import_progress("#new") == (0, [])
+
+    plugin._set_import_progress("#zip", None, [])
+
+    assert plugin._get_import_progress("#zip") == (0, [])
+    assert plugin._get_import_progress("#other") == (2, [])
+
+
+def create_circuit(plugin, num_nodes=10):
+    circuit = plugin._create_child(plugin.active_node, {})
+    for _ in range(num_nodes - 1):
+        plugin._create_child(circuit, {})
+    plugin._num_uncommitted += 1
+
+
+def test_chunks_of_commit_every_circuits(plugin):
+    plugin._commit_every = 2
+
+    completed = []
+    for _ in range(5):
+        create_circuit(plugin)
+        completed.append(plugin._is_chunk_complete())
+        if completed[-1]:
+            plugin._commit_results(["#commit0"])
+
+    assert completed == [False, True, False, True, False]
+    # Only the commits persist the circuits
+    assert plugin.core.num_persists == 2
+
+
+def test_chunks_of_commit_max_objects(plugin):
+    plugin._commit_max_objects = 25
+
+    completed = []
+    for _ in range(5):
+        create_circuit(plugin)
+        completed.append(plugin._is_chunk_complete())
+        if completed[-1]:
+            plugin._commit_results(["#commit0"])
+
+    assert completed == [False, False, True, False, False]
+    assert plugin.core.num_persists == 1
+
+
+def test_commits_persist_once_per_chunk(plugin):
+    create_circuit(plugin)
+    create_circuit(plugin)
+    plugin._commit_results(["#commit0"])
+    create_circuit(plugin, num_nodes=5)
+    plugin._commit_results(["#commit1"])
+
+    assert plugin.core.num_persists == 2
+    # Every commit only ships the objects created since the previous one
+    root_hashes, objects, _ = zip(*plugin.project.commits)
+    assert root_hashes == ("#root1", "#root2")
+    assert [len(chunk) for chunk in objects] == [20, 5]
+    assert (plugin._num_uncommitted, plugin._num_uncommitted_nodes) == (0, 0)
+
+
+def test_no_chunks_by_default(plugin):
+    for _ in range(1000):
+        create_circuit(plugin)
+        assert not plugin._is_chunk_complete()
+
+    assert plugin.core.num_persists == 0
+
+
+def test_zip_file_is_released_after_the_last_batch(plugin):
+    filenames = [f"netlists/{i}.net" for i in range(plugin_module.ZIP_BATCH_SIZE + 1)]
+    requests = []
+
+    def send(request):
+        requests.append((request["name"], request["args"]))
+        if request["name"] == "getZipFileEntries":
+            return [NETLIST for _ in request["args"][1]]
+
+    plugin._send = send
+    contents = plugin._iter_zip_file_contents("#zip", filenames)
+
+    assert [filename for filename, _ in contents] == filenames
+    assert requests == [
+        ("getZipFileEntries", ["#zip", filenames[:-1]]),
+        ("getZipFileEntries", ["#zip", filenames[-1:]]),
+        ("releaseZipFile", ["#zip"]),
+    ]
+
+
+def circuit_dict(name):
+    return {"name": name, "elements": {"R1": {"type": "Resistor"}}}
+
+
+def test_parse_cache_round_trip(tmp_path):
+    cache = NetlistParseCache(tmp_path, 1024 * 1024)
+
+    assert cache.get(NETLIST) is None
+    cache.put(NETLIST, circuit_dict("RC"))
+
+    assert cache.get(NETLIST) == circuit_dict("RC")
+    assert NetlistParseCache(tmp_path, 1024 * 1024).get(NETLIST) == circuit_dict("RC")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_parse_cache_evicts_the_least_recently_used_entries(tmp_path):
+    netlists = [f"{NETLIST}R{i} out 0 1k\n" for i in range(4)]
+    cache = NetlistParseCache(tmp_path, 1024 * 1024)
+    for i, netlist in enumerate(netlists[:3]):
+        cache.put(netlist, circuit_dict(f"RC{i}"))
+    entry_size = sum(path.stat().st_size for path in tmp_path.iterdir()) / 3
+    # The entries were used in the order 1, 2, 0
+    for i, netlist in enumerate(netlists[:3]):
+        os.utime(cache._get_path(netlist), (0, [3, 1, 2][i]))
+
+    # Room for two entries and a half, so adding a fourth one evicts the two least
+    # recently used ones (down to 90%)
+    cache = NetlistParseCache(tmp_path, 2.5 * entry_size)
+    cache.put(netlists[3], circuit_dict("RC3"))
+
+    assert cache.get(netlists[1]) is None
+    assert cache.get(netlists[2]) is None
+    assert cache.get(netlists[0]) == circuit_dict("RC0")
+    assert cache.get(netlists[3]) == circuit_dict("RC3")
+
+
+def test_parse_cache_is_invalidated_by_a_version_bump(tmp_path):
+    class NextNetlistParseCache(NetlistParseCache):
+        VERSION = NetlistParseCache.VERSION + 1
+
+    NetlistParseCache(tmp_path, 1024 * 1024).put(NETLIST, circuit_dict("RC"))
+
+    assert NextNetlistParseCache(tmp_path, 1024 * 1024).get(NETLIST) is None
+
+
+def test_parse_cache_skips_corrupt_entries(tmp_path):
+    cache = NetlistParseCache(tmp_path, 1024 * 1024)
+    cache.put(NETLIST, circuit_dict("RC"))
+    cache._get_path(NETLIST).write_bytes(b"not compressed JSON")
+
+    assert cache.get(NETLIST) is None
+    assert cache.misses == 1
+
+    cache.put(NETLIST, circuit_dict("RC"))
+    assert cache.get(NETLIST) == circuit_dict("RC")
+
+
+def element(name, type_name, *nodes):
+    return {
+        "name": name,
+        "type": type_name,
+        "pins": [{"name": f"p{i}", "node": node} for i, node in enumerate(nodes)],
+    }
+
+
+def test_layers_follow_the_nets_from_the_seeds():
+    graph = plugin_module.CircuitGraph.from_elements(
+        "Layers",
+        [
+            ("in", "Pin", [("p", "in")], ""),
+            ("R1", "Resistor", [("p", "in"), ("n", "b")], ""),
+            ("R2", "Resistor", [("p", "in"), ("n", "a")], ""),
+            ("R3", "Resistor", [("p", "a"), ("n", "0")], ""),
+            ("R4", "Resistor", [("p", "b"), ("n", "0")], ""),
+            # Another component, not reached from the pin
+            ("R5", "Resistor", [("p", "x"), ("n", "y")], ""),
+            ("R6", "Resistor", [("p", "y"), ("n", "0")], ""),
+            # Only connected to the ground
+            ("C1", "Capacitor", [("p", "0"), ("n", "0")], ""),
+        ],
+    )
+    is_seed = np.array([True] + [False] * 7)
+
+    layers, order = ConvertNetlistToCircuit._get_layers(graph, is_seed)
+
+    assert layers.tolist() == [0, 1, 1, 2, 2, 3, 4, 5]
+    # R4 is reached from R1, which comes before R2 (from which R3 is reached)
+    assert order.tolist() == [0, 1, 2, 4, 3, 5, 6, 7]
+
+
+def test_layers_without_seeds():
+    graph = plugin_module.CircuitGraph.from_elements(
+        "Layers",
+        [
+            ("R1", "Resistor", [("p", "a"), ("n", "b")], ""),
+            ("R2", "Resistor", [("p", "b"), ("n", "0")], ""),
+        ],
+    )
+
+    layers, order = ConvertNetlistToCircuit._get_layers(graph, np.zeros(2, dtype=bool))
+
+    assert layers.tolist() == [0, 1]
+    assert order.tolist() == [0, 1]
+
+
+def test_layout():
+    circuit_dict = {
+        "name": "Fan",
+        "pins": [{"name": "in", "node": "in"}],
+        "elements": [element(f"R{i}", "Resistor", "in", f"n{i}") for i in range(1, 6)],
+        "subcircuits": [{"name": "stage"}],
+    }
+
+    positions = ConvertNetlistToCircuit._get_layout(circuit_dict)
+
+    # 7 nodes, so at most 3 rows: the 5 resistors take two columns, and the
+    # sub-circuit (without connections) the last one
+    assert [(position["x"], position["y"]) for position in positions] == [
+        (50, 50),
+        (250, 50),
+        (250, 250),
+        (250, 450),
+        (450, 50),
+        (450, 250),
+        (650, 50),
+    ]
+
+
+def test_layout_of_an_empty_circuit():
+    circuit_dict = {"name": "Empty", "pins": [], "elements": [], "subcircuits": []}
+
+    assert ConvertNetlistToCircuit._get_layout(circuit_dict) == []
+
+
+def test_remove_cc_sources():
+    elements = [
+        element("V1", "Voltage", "in", "0"),
+        element("Vsense", "Voltage", "in", "a"),
+        element("R1", "Resistor", "a", "0"),
+        element("F1", "CCC", "out", "0"),
+        element("H1", "CCV", "out2", "0"),
+    ]
+    sources = [
+        {"name": "F1", "source": "Vsense"},
+        {"name": "H1", "source": "Vsense"},
+    ]
+
+    ConvertNetlistToCircuit._remove_cc_sources(sources, elements)
+
+    # The sensing voltage source is replaced by the pins of the sources
+    assert [element["name"] for element in elements] == ["V1", "R1", "F1", "H1"]
+    for source in elements[2:]:
+        assert source["pins"][2:] == [
+            {"name": "p01", "node": "in"},
+            {"name": "p11", "node": "a"},
+        ]
+
+
+def test_remove_cc_sources_without_sources():
+    elements = [element("R1", "Resistor", "a", "0")]
+
+    ConvertNetlistToCircuit._remove_cc_sources([], elements)
+
+    assert elements == [element("R1", "Resistor", "a", "0")]
+
+
+def test_remove_cc_sources_with_a_missing_voltage_source():
+    elements = [element("F1", "CCC", "out", "0")]
+
+    with pytest.raises(ValueError, match="Vsense"):
+        ConvertNetlistToCircuit._remove_cc_sources(
+            [{"name": "F1", "source": "Vsense"}], elements
+        )
@@ -0,0 +1,215 @@
+import sys
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PySpice.Spice.Netlist import Circuit, SubCircuit
+
+PLUGIN_PATH = (
+    Path(__file__).parent
+    / "../../../src/plugins/RecommendNextComponents/RecommendNextComponents"
+).resolve()
+BASE_PLUGIN_PATH = (
+    Path(__file__).parent / "../../../src/common/plugins/CircuitAnalysisBases.py"
+).resolve()
+IMPORT_MODULE_NAME = "electric_circuits.plugin_bases"
+
+
+def import_from_path(import_path, module_name):
+    spec = spec_from_file_location(module_name, import_path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+if IMPORT_MODULE_NAME in sys.modules:
+    bases = sys.modules[IMPORT_MODULE_NAME]
+else:
+    bases = import_from_path(BASE_PLUGIN_PATH, IMPORT_MODULE_NAME)
+    sys.modules[IMPORT_MODULE_NAME] = bases
+
+example = import_from_path(PLUGIN_PATH / "models/example/__init__.py", "example")
+utils = import_from_path(PLUGIN_PATH / "models/utils.py", "utils")
+
+
+def stage_subcircuit(name):
+    subckt = SubCircuit(name, "in", "out")
+    subckt.R(1, "in", "out", 1000)
+    subckt.C(1, "out", subckt.gnd, 1e-9)
+    return subckt
+
+
+def test_example_counts_the_elements_of_every_sub_circuit_instance():
+    circuit = Circuit("Filter")
+    circuit.V(1, "in", circuit.gnd, 5)
+    circuit.X("Stage0_1", "stage", "in", "mid")
+    circuit.X("Stage1_2", "stage", "mid", "out")
+    subckt = stage_subcircuit("stage")
+    circuit.subcircuit(
+        bases.SubCircuitNetlist(
+            key="stage",
+            name="stage",
+            text=str(subckt),
+            graph=bases.CircuitGraph.from_pyspice(subckt),
+            ports=[],
+            grounded_pins=[],
+            dependencies=[],
+            bases={},
+        )
+    )
+
+    recommendations = example.analyze(circuit, bases.CircuitGraph.from_pyspice(circuit))
+
+    # As before the sub-circuits were shared: V1 and two (nested) stages
+    assert {
+        element["type"]: probability for ([element], probability) in recommendations
+    } == {"VoltageSource": 0.2, "Resistor": 0.4, "Capacitor": 0.4}
+    assert all(element["pins"] == ["in", "0"] for ([element], _) in recommendations)
+
+
+def test_top_edges_by_group():
+    groups = np.array([2, 0, 2, 0, 2, 1, 2])
+    probs = np.array([0.5, 0.1, 0.9, 0.3, 0.5, 0.7, 0.2])
+
+    groups, counts, top_edges = utils.top_edges_by_group(groups, probs, 2)
+
+    assert groups.tolist() == [0, 1, 2]
+    assert counts.tolist() == [2, 1, 2]
+    # The ties (edges 0 and 4, in group 2) are kept in the order of the edges
+    assert top_edges.tolist() == [3, 1, 5, 2, 0]
+
+
+def test_top_edges_by_group_with_k_larger_than_the_groups():
+    groups = np.array([1, 0, 1])
+    probs = np.array([0.2, 0.4, 0.8])
+
+    groups, counts, top_edges = utils.top_edges_by_group(groups, probs, 5)
+
+    assert groups.tolist() == [0, 1]
+    assert counts.tolist() == [1, 2]
+    assert top_edges.tolist() == [1, 2, 0]
+
+
+def test_top_edges_by_group_without_edges():
+    groups, counts, top_edges = utils.top_edges_by_group(
+        np.zeros(0, dtype=np.int64), np.zeros(0), 2
+    )
+
+    assert groups.shape == counts.shape == top_edges.shape == (0,)
+
+
+def rc_filter():
+    circuit = Circuit("RC")
+    circuit.V(1, "in", circuit.gnd, 5)
+    circuit.R(1, "in", "out", 1000)
+    circuit.C(1, "out", circuit.gnd, 1e-9)
+    circuit.R(2, "out", circuit.gnd, 50)
+    return circuit
+
+
+def test_components_as_graph():
+    circuit = rc_filter()
+    components = [*circuit.elements, *circuit.nodes]
+
+    components, adj = utils.components_as_graph(components)
+
+    names = [component.name for component in components]
+    assert names == ["V1", "R1", "C1", "R2", "0", "in", "out"]
+    assert adj.tolist() == [
+        [0, 0, 0, 0, 1, 1, 0],
+        [0, 0, 0, 0, 0, 1, 1],
+        [0, 0, 0, 0, 1, 0, 1],
+        [0, 0, 0, 0, 1, 0, 1],
+        [1, 0, 1, 1, 0, 0, 0],
+        [1, 1, 0, 0, 0, 0, 0],
+        [0, 1, 1, 1, 0, 0, 0],
+    ]
+
+
+def test_components_as_graph_leaves_out_the_sub_circuit_instances():
+    circuit = rc_filter()
+    circuit.X("Stage_1", "stage", "out", "inner")
+    components = [*circuit.elements, *circuit.nodes]
+
+    components, adj = utils.components_as_graph(components)
+
+    # As the flat circuit exported before the sub-circuits were shared
+    flat_components, flat_adj = utils.components_as_graph(
+        [*rc_filter().elements, *rc_filter().nodes]
+    )
+    assert [c.name for c in components] == [c.name for c in flat_components]
+    assert np.array_equal(adj, flat_adj)
+
+
+@pytest.fixture
+def netlist_file(tmp_path):
+    circuit = rc_filter()
+    netlist_path = tmp_path / "circuit.net"
+    netlist_path.write_text(str(circuit))
+    return circuit, str(netlist_path)
+
+
+def test_components_as_graph_matches_the_parsed_netlist(netlist_file):
+    h = pytest.importorskip("spice_completion.datasets.helpers")
+    circuit, netlist_path = netlist_file
+    source = next(h.valid_netlist_sources([netlist_path]))
+
+    components, adj = utils.components_as_graph(h.components(circuit))
+    parsed_components, parsed_adj = h.netlist_as_graph(source)
+
+    assert [type(c) for c in components] == [type(c) for c in parsed_components]
+    assert [c.name for c in components] == [c.name for c in parsed_components]
+    assert np.array_equal(adj, parsed_adj)
+
+
+def test_graphconv_features_match_the_netlist_dataset(netlist_file):
+    datasets = pytest.importorskip("spice_completion.datasets")
+    graphconv = import_from_path(PLUGIN_PATH / "models/graphconv/__init__.py", "gc")
+    circuit, netlist_path = netlist_file
+
+    # The input of the classification model, as read from the exported netlist
+    (expected,) = datasets.omitted(
+        [netlist_path],
+        min_edge_count=5,
+        train=False,
+        resample=False,
+        mean=graphconv.mean,
+        std=graphconv.stddev,
+    )
+    components, adj = utils.components_as_graph(datasets.helpers.components(circuit))
+    graph = datasets.LinkDataset.load_graph(components, adj)
+    features = (graph.x - graphconv.mean) / graphconv.stddev
+
+    assert np.allclose(np.asarray(features), np.asarray(expected.x))
+    assert np.array_equal(np.asarray(graph.edge_index), np.asarray(expected.edge_index))
+
+
+def test_node_link_pred_features_match_the_netlist_dataset(netlist_file):
+    datasets = pytest.importorskip("spice_completion.datasets")
+    node_link_pred = import_from_path(
+        PLUGIN_PATH / "models/node_link_pred/__init__.py", "node_link_pred"
+    )
+    circuit, netlist_path = netlist_file
+
+    # The input of the link model, as read from the exported netlist
+    dataset = datasets.PrototypeLinkDataset(
+        [netlist_path],
+        mean=node_link_pred.mean,
+        std=node_link_pred.stddev,
+        train=False,
+    )
+    (expected,) = dataset
+    components, adj = utils.components_as_graph(datasets.helpers.components(circuit))
+    graph, node_features = node_link_pred.load_prototype_graph(components, adj)
+
+    assert np.allclose(
+        np.asarray(node_features), np.asarray(dataset.unnormalize(expected.x))
+    )
+    assert np.array_equal(np.asarray(graph.edge_index), np.asarray(expected.edge_index))
+    assert np.array_equal(
+        np.asarray(node_link_pred.get_proto_node_edges(node_features)),
+        np.asarray(
+            node_link_pred.get_proto_node_edges(dataset.unnormalize(expected.x))
+        ),
+    )
@@ -0,0 +1,85 @@
+import os
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+import pytest
+
+PLUGIN_PATH = (
+    Path(__file__).parent
+    / "../../../src/plugins/RecommendNextComponents/RecommendNextComponents/__init__.py"
+).resolve()
+IMPORT_MODULE_NAME = "electric_circuits.plugins.RecommendNextComponents"
+
+spec = spec_from_file_location(IMPORT_MODULE_NAME, PLUGIN_PATH)
+plugin_module = module_from_spec(spec)
+spec.loader.exec_module(plugin_module)
+ModelRegistry = plugin_module.ModelRegistry
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """A model (`model`) which counts its loads, with the fingerprints taken"""
+    (tmp_path / "models/model").mkdir(parents=True)
+    (tmp_path / "models/utils.py").write_text("")
+    (tmp_path / "models/model/__init__.py").write_text("WEIGHTS = [1]\n")
+    monkeypatch.setattr(plugin_module, "script_dir", str(tmp_path))
+
+    loads, fingerprints = [], []
+    load_model = plugin_module.load_model
+    get_model_fingerprint = plugin_module.get_model_fingerprint
+    monkeypatch.setattr(
+        plugin_module, "load_model", lambda name: loads.append(name) or load_model(name)
+    )
+    monkeypatch.setattr(
+        plugin_module,
+        "get_model_fingerprint",
+        lambda name: fingerprints.append(name) or get_model_fingerprint(name),
+    )
+    return tmp_path / "models/model", loads, fingerprints
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_models_are_fingerprinted_once_per_load(model_dir):
+    _, loads, fingerprints = model_dir
+    registry = ModelRegistry()
+
+    model = registry.get("model")
+    assert registry.get("model") is model
+    assert registry.get("model") is model
+
+    assert (loads, fingerprints) == (["model"], ["model"])
+    assert registry.stats["model"].hits == 2
+
+
+def test_models_are_loaded_again_when_their_directory_changes(model_dir):
+    path, loads, fingerprints = model_dir
+    registry = ModelRegistry()
+    registry.get("model")
+
+    touch(path, path.stat().st_mtime_ns + 10**9)
+    registry.get("model")
+    # The files are unchanged, so the model is reused
+    assert (loads, fingerprints) == (["model"], ["model"] * 2)
+
+    (path / "model.ckpt").write_text("weights")
+    touch(path, path.stat().st_mtime_ns + 10**9)
+    registry.get("model")
+    assert loads == ["model"] * 2
+
+
+def test_models_changed_in_place_are_loaded_again_on_reload(model_dir):
+    path, loads, _ = model_dir
+    registry = ModelRegistry()
+    assert registry.get("model").WEIGHTS == [1]
+
+    mtime_ns = path.stat().st_mtime_ns
+    (path / "__init__.py").write_text("WEIGHTS = [2, 3]\n")
+    touch(path / "__init__.py", mtime_ns + 10**9)
+    touch(path, mtime_ns)
+
+    assert registry.get("model").WEIGHTS == [1]
+    assert registry.get("model", reload=True).WEIGHTS == [2, 3]
+    assert loads == ["model"] * 2